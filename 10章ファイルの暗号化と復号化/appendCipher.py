@@ -0,0 +1,216 @@
+import argparse, hashlib, json, os, sys
+import caesarCipher, transpositionEncrypt, transpositionDecrypt, cipherMetrics, fileUtil
+
+# 伸びていくファイル（ログなど）を、前回から増えた分だけ暗号化して暗号文の後ろに足していく.
+# 転置式暗号の並びは全体の長さで決まるので、増えた分は独立したブロックとして封をする.
+# 暗号文はブロックの並びで、各ブロックは暗号化しないヘッダー b'CIPHERA1 <長さ>\n' と暗号化した中身からなる.
+# どこまで暗号化したかは状態ファイル（暗号文の名前 + '.state'）に書く. 暗号文を書いて fsync してから状態を書くので、
+# 途中で落ちても次に動かしたとき状態ファイルの大きさまで暗号文を切り詰めてやり直せる.
+# 状態ファイルには暗号文の大きさと末尾のハッシュも書き、足す前に暗号文がそれと合っているかを確かめる.
+# 状態ファイルの無い暗号文や、状態と合わない暗号文には足さない（--restart で最初から暗号化し直す）.
+#   python appendCipher.py append app.log app.log.encrypted --key 10
+#   python appendCipher.py decrypt app.log.encrypted app.log.decrypted --key 10
+
+VERSION = 1
+MAGIC = b'CIPHERA1'
+STATE_SUFFIX = '.state'
+TAIL_SIZE = 4096
+CHUNK_SIZE = 1024 * 1024
+
+def getStateFilename(outputFilename):
+    return outputFilename + STATE_SUFFIX
+
+def translate(cipher, key, mode, data):
+    if cipher == 'caesar':
+        return caesarCipher.translateBytes(key, data, mode)
+    elif cipher == 'transposition':
+        if mode == 'encrypt':
+            return transpositionEncrypt.encryptMessage(key, data)
+        return transpositionDecrypt.decryptMessage(key, data)
+    raise ValueError("cipher must be 'transposition' or 'caesar', not %r" % (cipher,))
+
+def getTailHash(fileObj, offset):
+    # 暗号化し終えた部分の最後の TAIL_SIZE バイトのハッシュ. ファイルが書き換えられていないかを安く確かめる
+    start = max(0, offset - TAIL_SIZE)
+    fileObj.seek(start)
+    return hashlib.sha256(fileObj.read(offset - start)).hexdigest()
+
+def newState(cipher, key):
+    return {'version': VERSION, 'cipher': cipher, 'key': key, 'inputOffset': 0, 'outputSize': 0, 'blocks': 0, 'tailHash': None, 'outputTailHash': None}
+
+def loadState(outputFilename, cipher, key):
+    # 状態ファイルが無ければ None
+    stateFilename = getStateFilename(outputFilename)
+    if not os.path.exists(stateFilename):
+        return None
+
+    fileObj = open(stateFilename)
+    state = json.load(fileObj)
+    fileObj.close()
+    if state.get('version') != VERSION:
+        raise ValueError('%s has an unsupported state version' % (stateFilename))
+    if state['cipher'] != cipher or state['key'] != key:
+        raise ValueError('%s was encrypted with a different cipher or key' % (outputFilename))
+    return state
+
+def checkOutput(outputFilename, state):
+    # 状態ファイルと暗号文が食い違っていれば ValueError. 暗号文が状態より長いのは、
+    # 前回が状態を書く前に落ちたときなので許す（足す前にそこまで切り詰める）
+    if state is None:
+        if os.path.exists(outputFilename) and os.path.getsize(outputFilename) > 0:
+            raise ValueError('%s exists but has no state file; remove it or encrypt from scratch' % (outputFilename))
+        return
+    if not os.path.exists(outputFilename) or os.path.getsize(outputFilename) < state['outputSize']:
+        raise ValueError('%s is missing or shorter than its state file says; encrypt from scratch' % (outputFilename))
+    if state.get('outputTailHash') is not None:
+        fileObj = open(outputFilename, 'rb')
+        tailHash = getTailHash(fileObj, state['outputSize'])
+        fileObj.close()
+        if tailHash != state['outputTailHash']:
+            raise ValueError('%s does not match its state file; encrypt from scratch' % (outputFilename))
+
+def canResume(outputFilename, cipher, key):
+    # 状態ファイルがあり、暗号文もそれと合っていれば True（前回の続きに足せる）
+    try:
+        state = loadState(outputFilename, cipher, key)
+        if state is None:
+            return False
+        checkOutput(outputFilename, state)
+    except ValueError:
+        return False
+    return True
+
+def saveState(state, outputFilename):
+    fileUtil.writeAtomically(getStateFilename(outputFilename), json.dumps(state, indent=1) + '\n')
+
+def appendFile(inputFilename, outputFilename, cipher, key, minBytes=1, maxBlockSize=None, restart=False):
+    # 増えた分を暗号化して outputFilename の後ろに足す. 足したバイト数を返す（minBytes に満たなければ何もしない）.
+    # maxBlockSize を渡すと、大きく増えた分をその大きさのブロックに分ける.
+    # restart が True なら、前の暗号文と状態を捨てて最初から暗号化する
+    if restart:
+        if os.path.exists(getStateFilename(outputFilename)):
+            os.remove(getStateFilename(outputFilename))
+        if os.path.exists(outputFilename):
+            os.remove(outputFilename)
+    state = loadState(outputFilename, cipher, key)
+    checkOutput(outputFilename, state)
+    if state is None:
+        state = newState(cipher, key)
+        mode = 'w+b'
+    else:
+        mode = 'r+b'
+
+    inputFileObj = open(inputFilename, 'rb')
+    try:
+        inputFileObj.seek(0, os.SEEK_END)
+        inputSize = inputFileObj.tell()
+        offset = state['inputOffset']
+        if inputSize < offset or (offset and getTailHash(inputFileObj, offset) != state['tailHash']):
+            raise ValueError('%s was truncated or rewritten; encrypt it again from scratch' % (inputFilename))
+        if inputSize - offset < minBytes:
+            return 0
+
+        # 前回が状態を書く前に落ちていたら、その後ろに書きかけた分を捨てる
+        outputFileObj = open(outputFilename, mode)
+        try:
+            outputFileObj.truncate(state['outputSize'])
+            outputFileObj.seek(state['outputSize'])
+
+            inputFileObj.seek(offset)
+            blockSize = maxBlockSize or inputSize - offset
+            while offset < inputSize:
+                with cipherMetrics.stage('seal', bytes=min(blockSize, inputSize - offset)):
+                    data = inputFileObj.read(min(blockSize, inputSize - offset))
+                    outputFileObj.write(b'%s %d\n' % (MAGIC, len(data)))
+                    outputFileObj.write(translate(cipher, key, 'encrypt', data))
+                    offset += len(data)
+                    state['blocks'] += 1
+            outputFileObj.flush()
+            os.fsync(outputFileObj.fileno())
+            state['outputSize'] = outputFileObj.tell()
+            state['outputTailHash'] = getTailHash(outputFileObj, state['outputSize'])
+        finally:
+            outputFileObj.close()
+
+        added = offset - state['inputOffset']
+        state['inputOffset'] = offset
+        state['tailHash'] = getTailHash(inputFileObj, offset)
+        saveState(state, outputFilename)
+        return added
+    finally:
+        inputFileObj.close()
+
+def iterBlocks(fileObj):
+    # (ヘッダーを含めた位置, 暗号化した中身) を順に返す
+    while True:
+        position = fileObj.tell()
+        header = fileObj.readline()
+        if not header:
+            return
+        fields = header.split()
+        if len(fields) != 2 or fields[0] != MAGIC:
+            raise ValueError('broken block header at byte %d' % (position))
+        length = int(fields[1])
+        data = fileObj.read(length)
+        if len(data) != length:
+            raise ValueError('block at byte %d is truncated' % (position))
+        yield position, data
+
+def decryptFile(inputFilename, outputFilename, cipher, key):
+    # ブロックを一つずつ復号して書くので、メモリに載るのは一番大きなブロックだけ
+    inputFileObj = open(inputFilename, 'rb')
+    outputFileObj = open(outputFilename, 'wb')
+    blocks = 0
+    try:
+        for position, data in iterBlocks(inputFileObj):
+            outputFileObj.write(translate(cipher, key, 'decrypt', data))
+            blocks += 1
+    finally:
+        inputFileObj.close()
+        outputFileObj.close()
+    return blocks
+
+def hasHeader(filename):
+    fileObj = open(filename, 'rb')
+    header = fileObj.read(len(MAGIC) + 1)
+    fileObj.close()
+    return header == MAGIC + b' '
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally encrypt a growing file as sealed blocks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    append = commands.add_parser('append')
+    append.add_argument('input')
+    append.add_argument('output')
+    append.add_argument('--key', type=int, required=True)
+    append.add_argument('--cipher', choices=['transposition', 'caesar'], default='transposition')
+    append.add_argument('--min-bytes', type=int, default=1, help='do nothing until at least this many new bytes exist')
+    append.add_argument('--max-block-size', type=int, help='split large appends into blocks of this size')
+    append.add_argument('--restart', action='store_true', help='discard the existing output and its state and encrypt from scratch')
+
+    decrypt = commands.add_parser('decrypt')
+    decrypt.add_argument('input')
+    decrypt.add_argument('output')
+    decrypt.add_argument('--key', type=int, required=True)
+    decrypt.add_argument('--cipher', choices=['transposition', 'caesar'], default='transposition')
+
+    options = parser.parse_args()
+
+    if not os.path.exists(options.input):
+        print("The file %s dose not exist. Quitting..." % (options.input))
+        sys.exit()
+
+    if options.command == 'append':
+        try:
+            added = appendFile(options.input, options.output, options.cipher, options.key, options.min_bytes, options.max_block_size, options.restart)
+        except ValueError as error:
+            print(error)
+            sys.exit(1)
+        print("Sealed %s new bytes of %s into %s." % (added, options.input, options.output))
+    elif options.command == 'decrypt':
+        blocks = decryptFile(options.input, options.output, options.cipher, options.key)
+        print("Decrypted %s blocks of %s into %s." % (blocks, options.input, options.output))
+
+if __name__ == '__main__':
+    main()
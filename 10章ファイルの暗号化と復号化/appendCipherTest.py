@@ -0,0 +1,178 @@
+import os, shutil, sys, tempfile
+import appendCipher
+
+# 伸びていくファイルに少しずつ足していった暗号文が、復号すると元のファイルと同じになること、
+# 途中で落ちたあとは続きから足せて、状態ファイルと合わなくなった暗号文や書き換えられた入力には足さないことを確かめる.
+#   python appendCipherTest.py
+#   python -m pytest appendCipherTest.py
+
+CIPHERS = [('transposition', 8), ('caesar', 13)]
+# 空の追加や1バイト、ブロックの大きさの前後の伸び方
+GROWTH = [0, 1, 7, 8, 9, 100, 0, 4096, 5000]
+
+def main():
+    for test in [testAppendRoundTrip, testMaxBlockSize, testMinBytes, testResumeAfterCrash, testRefusesMismatchedOutput, testRefusesRewrittenInput, testRefusesOtherKey, testBrokenBlocks]:
+        test()
+        print('%s passed.' % (test.__name__))
+    print('Append cipher test passed.')
+
+def getData(length, seed=0):
+    return bytes(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz .,!?\n'[(index * 7 + seed) % 58] for index in range(length))
+
+def appendData(filename, data):
+    fileObj = open(filename, 'ab')
+    fileObj.write(data)
+    fileObj.close()
+
+def readFile(filename):
+    fileObj = open(filename, 'rb')
+    data = fileObj.read()
+    fileObj.close()
+    return data
+
+def writeFile(filename, data):
+    fileObj = open(filename, 'wb')
+    fileObj.write(data)
+    fileObj.close()
+
+def runInDirectory(check):
+    # 一時的なディレクトリで check(入力, 暗号文, 復号したもの) を呼ぶ
+    directory = tempfile.mkdtemp()
+    try:
+        check(os.path.join(directory, 'app.log'), os.path.join(directory, 'app.log.encrypted'), os.path.join(directory, 'app.log.decrypted'))
+    finally:
+        shutil.rmtree(directory)
+
+def decrypt(outputFilename, decryptedFilename, cipher, key):
+    appendCipher.decryptFile(outputFilename, decryptedFilename, cipher, key)
+    return readFile(decryptedFilename)
+
+def expectValueError(call, what):
+    try:
+        call()
+    except ValueError:
+        pass
+    else:
+        assert False, '%s was accepted' % (what)
+
+def testAppendRoundTrip():
+    for cipher, key in CIPHERS:
+        def check(inputFilename, outputFilename, decryptedFilename):
+            writeFile(inputFilename, b'')
+            written = b''
+            blocks = 0
+            for seed, length in enumerate(GROWTH):
+                data = getData(length, seed)
+                appendData(inputFilename, data)
+                written += data
+                assert appendCipher.appendFile(inputFilename, outputFilename, cipher, key) == length, (cipher, length)
+                if length:
+                    blocks += 1
+                    assert decrypt(outputFilename, decryptedFilename, cipher, key) == written, (cipher, length)
+                assert appendCipher.canResume(outputFilename, cipher, key) == (len(written) > 0)
+            state = appendCipher.loadState(outputFilename, cipher, key)
+            assert state['blocks'] == blocks and state['inputOffset'] == len(written), state
+            assert state['outputSize'] == os.path.getsize(outputFilename), state
+        runInDirectory(check)
+
+def testMaxBlockSize():
+    def check(inputFilename, outputFilename, decryptedFilename):
+        data = getData(1000)
+        writeFile(inputFilename, data)
+        appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8, maxBlockSize=300)
+        inputFileObj = open(outputFilename, 'rb')
+        lengths = [len(block) for position, block in appendCipher.iterBlocks(inputFileObj)]
+        inputFileObj.close()
+        assert lengths == [300, 300, 300, 100], lengths
+        assert decrypt(outputFilename, decryptedFilename, 'transposition', 8) == data
+    runInDirectory(check)
+
+def testMinBytes():
+    # minBytes に満たない間は何も書かず、溜まったら一つのブロックにまとめて足す
+    def check(inputFilename, outputFilename, decryptedFilename):
+        writeFile(inputFilename, getData(10))
+        assert appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8, minBytes=20) == 0
+        assert not os.path.exists(outputFilename)
+        appendData(inputFilename, getData(15, 1))
+        assert appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8, minBytes=20) == 25
+        assert appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8, minBytes=20) == 0
+        assert decrypt(outputFilename, decryptedFilename, 'transposition', 8) == readFile(inputFilename)
+    runInDirectory(check)
+
+def testResumeAfterCrash():
+    # 状態を書く前に落ちると暗号文だけが長くなっている. 次に足すときは、状態の大きさまで切り詰めてから足す
+    def check(inputFilename, outputFilename, decryptedFilename):
+        writeFile(inputFilename, getData(100))
+        appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8)
+        appendData(outputFilename, b'CIPHERA1 50\nhalf-written')
+        assert appendCipher.canResume(outputFilename, 'transposition', 8)
+        appendData(inputFilename, getData(50, 1))
+        assert appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8) == 50
+        assert decrypt(outputFilename, decryptedFilename, 'transposition', 8) == readFile(inputFilename)
+    runInDirectory(check)
+
+def testRefusesMismatchedOutput():
+    # 状態ファイルと合わなくなった暗号文には足さず、暗号文も状態も書き換えない. --restart なら最初からやり直せる
+    def check(inputFilename, outputFilename, decryptedFilename):
+        writeFile(inputFilename, getData(5000))
+        appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8)
+        appendData(inputFilename, getData(10, 1))
+        encrypted = readFile(outputFilename)
+        stateFilename = appendCipher.getStateFilename(outputFilename)
+        state = readFile(stateFilename)
+
+        # 最後のバイトの書き換え・1バイト短くなったもの・末尾の TAIL_SIZE バイトの中での書き換え
+        for position in [len(encrypted) - 1, None, len(encrypted) - 100]:
+            if position is None:
+                broken = encrypted[:-1]
+            else:
+                broken = encrypted[:position] + bytes([encrypted[position] ^ 1]) + encrypted[position + 1:]
+            writeFile(outputFilename, broken)
+            assert not appendCipher.canResume(outputFilename, 'transposition', 8)
+            expectValueError(lambda: appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8), 'a mismatched output')
+            assert readFile(outputFilename) == broken and readFile(stateFilename) == state
+
+        os.remove(outputFilename)
+        expectValueError(lambda: appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8), 'a missing output')
+        os.remove(stateFilename)
+        writeFile(outputFilename, encrypted)
+        expectValueError(lambda: appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8), 'an output without a state file')
+
+        assert appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8, restart=True) == 5010
+        assert decrypt(outputFilename, decryptedFilename, 'transposition', 8) == readFile(inputFilename)
+    runInDirectory(check)
+
+def testRefusesRewrittenInput():
+    def check(inputFilename, outputFilename, decryptedFilename):
+        data = getData(100)
+        writeFile(inputFilename, data)
+        appendCipher.appendFile(inputFilename, outputFilename, 'caesar', 13)
+        writeFile(inputFilename, data[:50])
+        expectValueError(lambda: appendCipher.appendFile(inputFilename, outputFilename, 'caesar', 13), 'a truncated input')
+        writeFile(inputFilename, data[:-1] + b'?' + getData(10))
+        expectValueError(lambda: appendCipher.appendFile(inputFilename, outputFilename, 'caesar', 13), 'a rewritten input')
+    runInDirectory(check)
+
+def testRefusesOtherKey():
+    def check(inputFilename, outputFilename, decryptedFilename):
+        writeFile(inputFilename, getData(100))
+        appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 8)
+        appendData(inputFilename, getData(10, 1))
+        expectValueError(lambda: appendCipher.appendFile(inputFilename, outputFilename, 'transposition', 9), 'another key')
+        expectValueError(lambda: appendCipher.appendFile(inputFilename, outputFilename, 'caesar', 8), 'another cipher')
+        assert not appendCipher.canResume(outputFilename, 'transposition', 9)
+    runInDirectory(check)
+
+def testBrokenBlocks():
+    def check(inputFilename, outputFilename, decryptedFilename):
+        for broken in [b'CIPHERA1 10\nshort', b'NOTACIPHER\n', b'CIPHERA1 x y\n']:
+            writeFile(outputFilename, broken)
+            expectValueError(lambda: appendCipher.decryptFile(outputFilename, decryptedFilename, 'transposition', 8), repr(broken))
+    runInDirectory(check)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except AssertionError as error:
+        print('Append cipher test FAILED: %s' % (error,))
+        sys.exit(1)
@@ -0,0 +1,258 @@
+import argparse, asyncio, json, socket, sys
+import caesarCipher, keywordTransposition, transpositionEncrypt, transpositionDecrypt
+import detectEnglish, englishPrefilter, englishTrie, trieHacker, cribHacker
+
+# 常駐して暗号化・復号・英語の判定・鍵の探索を引き受けるサーバーと、その薄いクライアント.
+# 辞書・トライ・転置の計画は起動時に読み込んだものを使い回すので、呼び出しごとの準備がいらない.
+# 1行に1つの JSON で要求を送り、同じ id を付けた JSON が1行で返る:
+#   {"id": 1, "op": "encrypt", "cipher": "transposition", "key": 8, "message": "..."}
+#   {"id": 1, "result": "..."}   または   {"id": 1, "error": "..."}
+# op は encrypt / decrypt / score / hack、cipher は transposition / keyword / caesar.
+#   python cipherDaemon.py --unix /tmp/cipher.sock serve
+#   python cipherDaemon.py --unix /tmp/cipher.sock client encrypt "Hello" --cipher caesar --key 13
+#   python cipherDaemon.py --unix /tmp/cipher.sock client hack - < frankenstein.encrypted.txt
+
+QUEUE_SIZE = 1024
+BATCH_SIZE = 64
+MAX_IN_FLIGHT = 32
+LINE_LIMIT = 64 * 1024 * 1024
+
+# op ごとに無いと処理できない項目
+REQUIRED_FIELDS = {'encrypt': ('message', 'key'), 'decrypt': ('message', 'key'), 'score': ('message',), 'hack': ('message',), 'ping': ()}
+
+def checkRequest(request):
+    # 項目が足りない要求を KeyError のまま返さず、何が足りないかを返す
+    if not isinstance(request, dict):
+        raise ValueError('a request must be a JSON object, not %s' % (type(request).__name__))
+    op = request.get('op')
+    if op not in REQUIRED_FIELDS:
+        raise ValueError('unknown op %r; use one of %s' % (op, ', '.join(REQUIRED_FIELDS)))
+    missing = [field for field in REQUIRED_FIELDS[op] if field not in request]
+    if missing:
+        raise ValueError('the %s request is missing %s' % (op, ', '.join(repr(field) for field in missing)))
+    if 'message' in request and not isinstance(request['message'], str):
+        raise ValueError("'message' must be a string")
+
+def translate(request):
+    cipher = request.get('cipher', 'transposition')
+    op = request['op']
+    key = request['key']
+    message = request['message']
+
+    if cipher == 'transposition':
+        if op == 'encrypt':
+            return transpositionEncrypt.encryptMessage(int(key), message)
+        return transpositionDecrypt.decryptMessage(int(key), message)
+    elif cipher == 'keyword':
+        if op == 'encrypt':
+            return keywordTransposition.encryptMessage(key, message)
+        return keywordTransposition.decryptMessage(key, message)
+    elif cipher == 'caesar':
+        return caesarCipher.translateMessage(int(key), message, op)
+    raise ValueError('unknown cipher %r' % (cipher,))
+
+def score(request):
+    message = request['message']
+    return {'englishCount': detectEnglish.getEnglishCount(message), 'isEnglish': detectEnglish.isEnglish(message)}
+
+def hack(trie, request):
+    # クリブがあればそれで鍵を絞り、無ければトライで総当たりする
+    cipher = request.get('cipher', 'transposition')
+    message = request['message']
+    crib = request.get('crib')
+
+    # ふるいの表はプロセスで共有し、段ごとの数は要求ごとの Cascade に数える
+    cascade = englishPrefilter.Cascade(cipher=cipher)
+    if cipher == 'transposition':
+        if crib:
+            return cribHacker.hackTransposition(message, crib, request.get('offset', 0))
+        return [key for key, plaintext in trieHacker.hackTransposition(message, trie=trie, cascade=cascade)]
+    elif cipher == 'caesar':
+        if crib:
+            key = cribHacker.hackCaesar(message, crib, request.get('offset', 0))
+            return [] if key is None else [key]
+        counts = []
+        for key in range(len(caesarCipher.SYMBOLS)):
+            counts.append((cascade.score(caesarCipher.translateMessage(key, message, 'decrypt')), key))
+        best, key = max(counts)
+        return [key] if best > 0 else []
+    raise ValueError('cannot hack cipher %r' % (cipher,))
+
+class CipherServer:
+    def __init__(self):
+        self.trie = englishTrie.loadTrie()
+        # ふるいの2文字・4文字の並びの表も起動時に読み込んでおく
+        englishPrefilter.getAllowedBigrams()
+        englishPrefilter.getQuadgramScores()
+        self.queue = None
+        # イベントループは task を弱い参照でしか持たないので、ここで持っておく
+        self.batchTask = None
+
+    def handle(self, request):
+        op = request.get('op')
+        if op in ('encrypt', 'decrypt'):
+            return translate(request)
+        elif op == 'score':
+            return score(request)
+        elif op == 'ping':
+            return 'pong'
+        raise ValueError('unknown op %r' % (op,))
+
+    async def processBatches(self):
+        # 溜まっている要求をまとめて取り出し、イベントループに戻らずに続けて処理する.
+        # 時間のかかる hack だけは別スレッドに回す
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            for request, future in batch:
+                # 待っていたクライアントが切断すると future は取り消されている. 結果を入れると
+                # InvalidStateError になり、このループが止まってしまうので、終わっているものは飛ばす
+                if future.done():
+                    continue
+                if request.get('op') == 'hack':
+                    task = loop.run_in_executor(None, hack, self.trie, request)
+                    task.add_done_callback(lambda done, future=future: copyResult(done, future))
+                    continue
+                try:
+                    result = self.handle(request)
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+                    continue
+                if not future.done():
+                    future.set_result(result)
+
+    async def serveClient(self, reader, writer):
+        # 接続ごとの処理中の要求を MAX_IN_FLIGHT までにし、キューが一杯なら読み込みを止める.
+        # こうすると送りすぎるクライアントには TCP の流量制御がかかる
+        inFlight = asyncio.Semaphore(MAX_IN_FLIGHT)
+        responses = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await inFlight.acquire()
+                task = asyncio.create_task(self.respond(line, writer, inFlight))
+                responses.add(task)
+                task.add_done_callback(responses.discard)
+            if responses:
+                await asyncio.gather(*responses)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, line, writer, inFlight):
+        requestId = None
+        try:
+            request = json.loads(line)
+            if isinstance(request, dict):
+                requestId = request.get('id')
+            checkRequest(request)
+            future = asyncio.get_running_loop().create_future()
+            await self.queue.put((request, future))
+            response = {'id': requestId, 'result': await future}
+        except Exception as error:
+            response = {'id': requestId, 'error': '%s: %s' % (type(error).__name__, error)}
+        finally:
+            inFlight.release()
+
+        writer.write(json.dumps(response).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    async def serve(self, unixPath=None, host='127.0.0.1', port=50100):
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.batchTask = asyncio.create_task(self.processBatches())
+        if unixPath:
+            server = await asyncio.start_unix_server(self.serveClient, path=unixPath, limit=LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(self.serveClient, host, port, limit=LINE_LIMIT)
+        async with server:
+            await server.serve_forever()
+
+def copyResult(done, future):
+    if future.done():
+        return
+    if done.exception() is not None:
+        future.set_exception(done.exception())
+    else:
+        future.set_result(done.result())
+
+class CipherClient:
+    def __init__(self, unixPath=None, host='127.0.0.1', port=50100):
+        if unixPath:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unixPath)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.reader = self.sock.makefile('rb')
+        self.nextId = 0
+
+    def call(self, op, **fields):
+        self.nextId += 1
+        request = dict(fields, op=op, id=self.nextId)
+        self.sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        response = json.loads(self.reader.readline())
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Resident cipher service and its client.')
+    parser.add_argument('--unix', help='Unix socket path (default: TCP)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=50100)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('serve')
+
+    client = commands.add_parser('client')
+    client.add_argument('op', choices=['encrypt', 'decrypt', 'score', 'hack'])
+    client.add_argument('message', help="the message, or '-' to read it from stdin")
+    client.add_argument('--cipher', default='transposition', choices=['transposition', 'keyword', 'caesar'])
+    client.add_argument('--key')
+    client.add_argument('--crib')
+
+    options = parser.parse_args()
+
+    if options.command == 'serve':
+        try:
+            asyncio.run(CipherServer().serve(options.unix, options.host, options.port))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    message = options.message
+    if message == '-':
+        message = sys.stdin.read()
+
+    fields = {'cipher': options.cipher, 'message': message}
+    if options.key is not None:
+        fields['key'] = options.key
+    if options.crib is not None:
+        fields['crib'] = options.crib
+
+    cipherClient = CipherClient(options.unix, options.host, options.port)
+    try:
+        result = cipherClient.call(options.op, **fields)
+    except RuntimeError as error:
+        print(error)
+        sys.exit(1)
+    finally:
+        cipherClient.close()
+
+    if isinstance(result, str):
+        print(result)
+    else:
+        print(json.dumps(result))
+
+if __name__ == '__main__':
+    main()
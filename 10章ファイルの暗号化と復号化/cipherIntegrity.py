@@ -0,0 +1,130 @@
+import argparse, hashlib, io, json, os, sys
+import transpositionEncrypt, compressionStage, cipherMetrics, fileUtil
+
+# 平文のハッシュを暗号文の横のファイル（サイドカー, 暗号文の名前 + '.sha256'）に残し、
+# 復号したときに同じハッシュになるかを確かめる.
+# 暗号文から平文を数行ずつ組み立ててはハッシュに流すので、復号した全文を作らずに往復の確認ができる.
+#   python cipherIntegrity.py check frankenstein.encrypted.txt 10
+# 圧縮してから暗号化したもの（compressionStage のヘッダー付き）は、復号して少しずつ展開しながらハッシュに流す.
+# 文字列はそのまま UTF-8 で、バイト列はそのままハッシュにかける.
+
+HASH_NAME = 'sha256'
+SIDECAR_SUFFIX = '.sha256'
+CHUNK_SIZE = 1024 * 1024
+
+def getSidecarFilename(filename):
+    return filename + SIDECAR_SUFFIX
+
+def updateHash(digest, chunk):
+    if isinstance(chunk, str):
+        chunk = chunk.encode('utf-8', 'surrogatepass')
+    digest.update(chunk)
+
+def hashPlaintext(content, chunkSize=CHUNK_SIZE):
+    # 大きな文字列を一度に encode しないよう、chunkSize 文字ずつハッシュに流す
+    digest = hashlib.new(HASH_NAME)
+    for start in range(0, len(content), chunkSize):
+        updateHash(digest, content[start:start + chunkSize])
+    return digest.hexdigest()
+
+def hashFile(filename, chunkSize=CHUNK_SIZE):
+    digest = hashlib.new(HASH_NAME)
+    fileObj = open(filename, 'rb')
+    while True:
+        chunk = fileObj.read(chunkSize)
+        if not chunk:
+            break
+        digest.update(chunk)
+    fileObj.close()
+    return digest.hexdigest()
+
+def iterDecryptedChunks(key, message, columnOrder=None, chunkSize=CHUNK_SIZE):
+    # 平文の行 firstRow から lastRow までを、各列の暗号文の切れ端を並べ直して作る
+    length = len(message)
+    starts = transpositionEncrypt.getColumnStarts(key, length, columnOrder)
+    rows, longColumns = divmod(length, key)
+    rowsPerChunk = max(1, chunkSize // key)
+
+    for firstRow in range(0, rows + 1, rowsPerChunk):
+        lastRow = firstRow + rowsPerChunk
+        chunkLength = min(lastRow * key, length) - firstRow * key
+        if chunkLength <= 0:
+            break
+
+        if isinstance(message, str):
+            chunk = [''] * chunkLength
+        else:
+            chunk = bytearray(chunkLength)
+        for column in range(min(key, chunkLength)):
+            columnLength = rows + (1 if column < longColumns else 0)
+            start = starts[column]
+            chunk[column::key] = message[start + firstRow:start + min(lastRow, columnLength)]
+
+        if isinstance(message, str):
+            yield ''.join(chunk)
+        else:
+            yield chunk
+
+def hashDecryption(key, message, columnOrder=None, chunkSize=CHUNK_SIZE):
+    digest = hashlib.new(HASH_NAME)
+    for chunk in iterDecryptedChunks(key, message, columnOrder, chunkSize):
+        updateHash(digest, chunk)
+    return digest.hexdigest()
+
+def writeSidecar(filename, plaintextHash, length):
+    sidecar = {'algorithm': HASH_NAME, 'plaintextHash': plaintextHash, 'length': length}
+    fileUtil.writeAtomically(getSidecarFilename(filename), json.dumps(sidecar) + '\n')
+
+def readSidecar(filename):
+    # サイドカーが無ければ None
+    sidecarFilename = getSidecarFilename(filename)
+    if not os.path.exists(sidecarFilename):
+        return None
+    fileObj = open(sidecarFilename)
+    sidecar = json.load(fileObj)
+    fileObj.close()
+    if sidecar.get('algorithm') != HASH_NAME:
+        raise ValueError('%s uses an unsupported hash %r' % (sidecarFilename, sidecar.get('algorithm')))
+    return sidecar
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that a transposition ciphertext decrypts to the plaintext recorded in its sidecar.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    check = commands.add_parser('check')
+    check.add_argument('ciphertext')
+    check.add_argument('key', type=int)
+    check.add_argument('--binary', action='store_true', help='treat the file as bytes instead of text')
+    options = parser.parse_args()
+
+    sidecar = readSidecar(options.ciphertext)
+    if sidecar is None:
+        print("There is no sidecar %s." % (getSidecarFilename(options.ciphertext)))
+        sys.exit(1)
+
+    fileObj = open(options.ciphertext, 'rb')
+    data = fileObj.read()
+    fileObj.close()
+
+    with cipherMetrics.stage('verify', bytes=len(data)) as record:
+        if compressionStage.hasHeader(data):
+            # 圧縮したものはバイト列として暗号化しているので、--binary に関わらずバイト列として扱う
+            # 鍵が違うと展開できないので、そのときも確認に失敗したものとして扱う
+            try:
+                plaintextHash, length = compressionStage.digestDecrypted(data, lambda body: iterDecryptedChunks(options.key, body), HASH_NAME)
+            except ValueError:
+                plaintextHash, length = None, None
+        else:
+            if options.binary:
+                message = data
+            else:
+                message = io.TextIOWrapper(io.BytesIO(data)).read()
+            record['chars'] = len(message)
+            plaintextHash = hashDecryption(options.key, message)
+            length = len(message)
+    if plaintextHash != sidecar['plaintextHash'] or length != sidecar['length']:
+        print("Round-trip check FAILED for %s with key %s." % (options.ciphertext, options.key))
+        sys.exit(1)
+    print("Round-trip check passed for %s with key %s. (%s seconds)" % (options.ciphertext, options.key, round(record['wallTime'], 2)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import hashlib, json, os, random, shutil, subprocess, sys, tempfile
+import cipherIntegrity, compressionStage, transpositionEncrypt, transpositionDecrypt, keywordTransposition
+
+# 暗号文から平文を少しずつ組み立てる iterDecryptedChunks が decryptMessage と同じ平文になり、
+# そのハッシュが平文のハッシュと一致すること、サイドカーと check コマンドが往復の失敗を見つけることを確かめる.
+#   python cipherIntegrityTest.py
+#   python -m pytest cipherIntegrityTest.py
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz .,!?\n'
+EDGE_LENGTHS = [0, 1, 2, 7, 8, 9, 63, 64, 65, 1000]
+KEYS = [1, 2, 3, 8, 9, 64]
+CHUNK_SIZES = [1, 7, 8, 64, 100, cipherIntegrity.CHUNK_SIZE]
+
+def main():
+    random.seed(42)
+    for test in [testChunksMatchDecryption, testKeywordChunksMatchDecryption, testHashDecryption, testSidecar, testCompressedDigest, testCheckCommand]:
+        test()
+        print('%s passed.' % (test.__name__))
+    print('Cipher integrity test passed.')
+
+def getMessage(length):
+    return ''.join(random.choice(LETTERS) for i in range(length))
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def runInDirectory(check):
+    directory = tempfile.mkdtemp()
+    try:
+        check(directory)
+    finally:
+        shutil.rmtree(directory)
+
+def testChunksMatchDecryption():
+    # どの大きさに区切っても、つなげると decryptMessage / decryptBytes と同じになる
+    for length in EDGE_LENGTHS:
+        plaintext = getMessage(length)
+        for key in KEYS:
+            message = transpositionEncrypt.encryptMessage(key, plaintext)
+            data = message.encode('ascii')
+            for chunkSize in CHUNK_SIZES:
+                chunks = list(cipherIntegrity.iterDecryptedChunks(key, message, chunkSize=chunkSize))
+                assert ''.join(chunks) == plaintext, (length, key, chunkSize)
+                assert all(chunk != '' for chunk in chunks), (length, key, chunkSize)
+                assert b''.join(cipherIntegrity.iterDecryptedChunks(key, data, chunkSize=chunkSize)) == transpositionDecrypt.decryptBytes(key, data), (length, key, chunkSize)
+
+def testKeywordChunksMatchDecryption():
+    for length in EDGE_LENGTHS:
+        plaintext = getMessage(length)
+        for keyword in ['ZEBRA', 'CIPHER', 'A']:
+            columnOrder = keywordTransposition.getColumnOrder(keyword)
+            message = keywordTransposition.encryptMessage(keyword, plaintext)
+            for chunkSize in CHUNK_SIZES:
+                assert ''.join(cipherIntegrity.iterDecryptedChunks(len(keyword), message, columnOrder, chunkSize)) == plaintext, (length, keyword, chunkSize)
+
+def testHashDecryption():
+    # 文字列は UTF-8 にしてからハッシュを取るので、ASCII 以外の文字を含んでも区切り方で値が変わらない
+    for plaintext in ['', 'a', getMessage(1000), 'こんにちは、世界。' * 50]:
+        expected = sha256(plaintext.encode('utf-8'))
+        for chunkSize in CHUNK_SIZES:
+            assert cipherIntegrity.hashPlaintext(plaintext, chunkSize) == expected, (plaintext[:10], chunkSize)
+        for key in KEYS:
+            message = transpositionEncrypt.encryptMessage(key, plaintext)
+            assert cipherIntegrity.hashDecryption(key, message, chunkSize=7) == expected, (plaintext[:10], key)
+            if len(plaintext) > key > 1:
+                assert cipherIntegrity.hashDecryption(key + 1, message) != expected, (plaintext[:10], key)
+
+def testSidecar():
+    def check(directory):
+        filename = os.path.join(directory, 'message.encrypted.txt')
+        assert cipherIntegrity.readSidecar(filename) is None
+        cipherIntegrity.writeSidecar(filename, sha256(b'abc'), 3)
+        assert cipherIntegrity.readSidecar(filename) == {'algorithm': 'sha256', 'plaintextHash': sha256(b'abc'), 'length': 3}
+
+        fileObj = open(cipherIntegrity.getSidecarFilename(filename), 'w')
+        json.dump({'algorithm': 'md5', 'plaintextHash': '', 'length': 3}, fileObj)
+        fileObj.close()
+        try:
+            cipherIntegrity.readSidecar(filename)
+        except ValueError:
+            pass
+        else:
+            assert False, 'a sidecar with another hash was accepted'
+    runInDirectory(check)
+
+def testCompressedDigest():
+    # 圧縮してから暗号化したものは、少しずつ復号して展開したもののハッシュと長さが平文と同じになる.
+    # 鍵が違えば展開できず ValueError になる（本体が鍵より短いと転置しても変わらないので、長いものだけ）
+    for length in [0, 1, 1000, 200000]:
+        data = getMessage(length).encode('ascii')
+        for algorithm in ['zlib', 'lzma', 'bz2']:
+            for key in [2, 9]:
+                ciphertext, record = compressionStage.encryptData(data, lambda body: transpositionEncrypt.encryptBytes(key, body), algorithm)
+                decryptChunks = lambda body: cipherIntegrity.iterDecryptedChunks(key, body, chunkSize=1000)
+                assert compressionStage.digestDecrypted(ciphertext, decryptChunks) == (sha256(data), length), (length, algorithm, key)
+                assert compressionStage.decryptData(ciphertext, decryptChunks) == data, (length, algorithm, key)
+                if length < 1000:
+                    continue
+                try:
+                    compressionStage.digestDecrypted(ciphertext, lambda body: cipherIntegrity.iterDecryptedChunks(key + 1, body))
+                except ValueError:
+                    pass
+                else:
+                    assert False, 'a wrong key was accepted (%s, %s, %s)' % (length, algorithm, key)
+
+def runCheck(filename, key, *arguments):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cipherIntegrity.py'), 'check', filename, str(key)]
+    return subprocess.run(command + list(arguments), stdout=subprocess.PIPE, stderr=subprocess.PIPE).returncode
+
+def testCheckCommand():
+    def check(directory):
+        plaintext = getMessage(5000)
+        filename = os.path.join(directory, 'message.encrypted.txt')
+        fileObj = open(filename, 'w')
+        fileObj.write(transpositionEncrypt.encryptMessage(8, plaintext))
+        fileObj.close()
+        # サイドカーが無ければ確かめられないので失敗にする
+        assert runCheck(filename, 8) == 1
+        cipherIntegrity.writeSidecar(filename, cipherIntegrity.hashPlaintext(plaintext), len(plaintext))
+        assert runCheck(filename, 8) == 0
+        assert runCheck(filename, 7) == 1
+
+        compressedFilename = os.path.join(directory, 'message.encrypted.bin')
+        data = plaintext.encode('ascii')
+        ciphertext, record = compressionStage.encryptData(data, lambda body: transpositionEncrypt.encryptBytes(8, body), 'zlib')
+        fileObj = open(compressedFilename, 'wb')
+        fileObj.write(ciphertext)
+        fileObj.close()
+        cipherIntegrity.writeSidecar(compressedFilename, sha256(data), len(data))
+        assert runCheck(compressedFilename, 8) == 0
+        assert runCheck(compressedFilename, 7) == 1
+    runInDirectory(check)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except AssertionError as error:
+        print('Cipher integrity test FAILED: %s' % (error,))
+        sys.exit(1)
@@ -0,0 +1,99 @@
+import contextlib, json, os, threading, time
+import fileUtil
+
+# 処理の段ごとに経過時間・CPU時間・バイト数・文字数を記録する.
+# 記録は addHook で登録した関数に渡す. Collector はそれを段ごとに合計し、
+# JSON や Prometheus の textfile collector 形式で書き出す.
+# 環境変数 CIPHER_METRICS_JSON / CIPHER_METRICS_PROM にファイル名を入れると、collectFromEnvironment がそこへ書く.
+
+hooks = []
+
+def addHook(hook):
+    hooks.append(hook)
+
+def removeHook(hook):
+    if hook in hooks:
+        hooks.remove(hook)
+
+@contextlib.contextmanager
+def stage(name, bytes=0, chars=0):
+    # with stage('read') as record: の中で record['bytes'] などを後から埋めてもよい
+    record = {'stage': name, 'bytes': bytes, 'chars': chars}
+    startWall = time.perf_counter()
+    startCpu = time.process_time()
+    try:
+        yield record
+    finally:
+        record['wallTime'] = time.perf_counter() - startWall
+        record['cpuTime'] = time.process_time() - startCpu
+        if record['wallTime'] > 0:
+            record['bytesPerSecond'] = record['bytes'] / record['wallTime']
+            record['charsPerSecond'] = record['chars'] / record['wallTime']
+        else:
+            record['bytesPerSecond'] = 0.0
+            record['charsPerSecond'] = 0.0
+        for hook in list(hooks):
+            hook(record)
+
+class Collector:
+    def __init__(self, jsonFilename=None, prometheusFilename=None):
+        self.jsonFilename = jsonFilename
+        self.prometheusFilename = prometheusFilename
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, record):
+        with self.lock:
+            total = self.totals.setdefault(record['stage'], {'calls': 0, 'wallTime': 0.0, 'cpuTime': 0.0, 'bytes': 0, 'chars': 0})
+            total['calls'] += 1
+            total['wallTime'] += record['wallTime']
+            total['cpuTime'] += record['cpuTime']
+            total['bytes'] += record['bytes']
+            total['chars'] += record['chars']
+
+    def getSummary(self):
+        with self.lock:
+            summary = {}
+            for name, total in self.totals.items():
+                summary[name] = dict(total)
+                if total['wallTime'] > 0:
+                    summary[name]['bytesPerSecond'] = total['bytes'] / total['wallTime']
+                    summary[name]['charsPerSecond'] = total['chars'] / total['wallTime']
+            return summary
+
+    def toJson(self):
+        return json.dumps({'timestamp': time.time(), 'stages': self.getSummary()}, indent=2)
+
+    def toPrometheus(self):
+        metrics = [
+            ('cipher_stage_calls_total', 'calls', 'Number of times each stage ran.'),
+            ('cipher_stage_wall_seconds_total', 'wallTime', 'Wall-clock seconds spent in each stage.'),
+            ('cipher_stage_cpu_seconds_total', 'cpuTime', 'CPU seconds spent in each stage.'),
+            ('cipher_stage_bytes_total', 'bytes', 'Bytes processed by each stage.'),
+            ('cipher_stage_chars_total', 'chars', 'Characters processed by each stage.'),
+        ]
+        summary = self.getSummary()
+        lines = []
+        for metric, field, help in metrics:
+            lines.append('# HELP %s %s' % (metric, help))
+            lines.append('# TYPE %s counter' % (metric))
+            for name in sorted(summary):
+                lines.append('%s{stage="%s"} %s' % (metric, name.replace('\\', '\\\\').replace('"', '\\"'), summary[name][field]))
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        if self.jsonFilename:
+            fileUtil.writeAtomically(self.jsonFilename, self.toJson())
+        if self.prometheusFilename:
+            fileUtil.writeAtomically(self.prometheusFilename, self.toPrometheus())
+
+def collectFromEnvironment():
+    # どちらの環境変数も無ければ何もせず None を返す
+    jsonFilename = os.environ.get('CIPHER_METRICS_JSON')
+    prometheusFilename = os.environ.get('CIPHER_METRICS_PROM')
+    if not jsonFilename and not prometheusFilename:
+        return None
+
+    collector = Collector(jsonFilename, prometheusFilename)
+    addHook(collector)
+    return collector
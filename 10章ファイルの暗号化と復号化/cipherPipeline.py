@@ -0,0 +1,147 @@
+import functools, math
+import pyperclip
+import caesarCipher, transpositionEncrypt
+
+# 段の並びは ('caesar', key, mode) と ('transposition', key, mode) のタプルで書く.
+# 換字は一つの変換表にまとめて最後に一度だけ変換する.
+# 転置は「出力の等差の位置 ← 入力の等差の位置」の区間（ラン）の並びで表し、続く転置の段はランどうしを
+# 合成して一つの並びにまとめる. 入力全体をランごとのスライスで一度だけ写すので、段の数だけ全体を写し直さずに済む.
+# ランの数はおおよそ鍵の積になるので、ランが短くなりすぎる（1つが MIN_RUN_LENGTH 文字に満たない）ときは
+# そこで区切り、まとめた分を一度写してから次の段に進む.
+
+MIN_RUN_LENGTH = 256
+
+def main():
+    message = "Common sence is not so common"
+    stages = [('caesar', 3, 'encrypt'), ('transposition', 8, 'encrypt'), ('transposition', 5, 'encrypt')]
+
+    ciphertext = runPipeline(stages, message)
+    print(ciphertext + '|')
+    print(runPipeline(reversePipeline(stages), ciphertext) + '|')
+
+    pyperclip.copy(ciphertext)
+
+def reversePipeline(stages):
+    # 逆順にたどり、それぞれの段の暗号化と復号を入れ替える
+    reversedStages = []
+    for kind, key, mode in reversed(stages):
+        if mode == 'encrypt':
+            reversedStages.append((kind, key, 'decrypt'))
+        else:
+            reversedStages.append((kind, key, 'encrypt'))
+    return reversedStages
+
+def composeTables(first, second):
+    # first を適用してから second を適用するのと同じ変換表を作る
+    table = {}
+    for source, target in first.items():
+        table[source] = second.get(target, target)
+    for source, target in second.items():
+        if source not in table:
+            table[source] = target
+    return table
+
+def getStageRuns(key, mode, length):
+    # ランは (出力の先頭, 出力の間隔, 入力の先頭, 入力の間隔, 文字数)
+    runs = []
+    for column, start, stop in transpositionEncrypt.getEncryptPlan(key, length):
+        if stop == start:
+            continue
+        if mode == 'encrypt':
+            runs.append((start, 1, column, key, stop - start))
+        else:
+            runs.append((column, key, start, 1, stop - start))
+    return runs
+
+def composeRuns(first, second):
+    # first で写してから second で写すのと同じランの並びを作る.
+    # second のランが読む位置 a + i*s と first のランが書く位置 b + j*t の重なりは、また等差の位置になる
+    runs = []
+    for outStart, outStep, a, s, n in second:
+        for b, t, inStart, inStep, m in first:
+            g = math.gcd(s, t)
+            if (b - a) % g:
+                continue
+            sg = s // g
+            tg = t // g
+            i0 = (b - a) // g * pow(sg, -1, tg) % tg if tg > 1 else 0
+            j0 = (a + i0 * s - b) // t
+            low = max(-(i0 // tg), -(j0 // sg))
+            high = min(-((i0 - n) // tg), -((j0 - m) // sg))
+            if high <= low:
+                continue
+            i = i0 + low * tg
+            j = j0 + low * sg
+            runs.append((outStart + i * outStep, tg * outStep, inStart + j * inStep, sg * inStep, high - low))
+    return runs
+
+@functools.lru_cache(maxsize=32)
+def getTranspositionPlans(transpositions, length):
+    # 転置の段の並びを、一度ずつ写すランの並びの列にする. ほとんどの場合は一つにまとまる
+    plans = []
+    runs = None
+    for key, mode in transpositions:
+        stageRuns = getStageRuns(key, mode, length)
+        if runs is not None and len(runs) * len(stageRuns) * MIN_RUN_LENGTH > length:
+            plans.append(tuple(runs))
+            runs = None
+        if runs is None:
+            runs = stageRuns
+        else:
+            runs = composeRuns(runs, stageRuns)
+    if runs is not None:
+        plans.append(tuple(runs))
+    # 出力の先頭の順に並べておく. 暗号化だけを重ねたときは出力が隙間なく続くので、スライスをつなぐだけで済む
+    return tuple(tuple(sorted(runs)) for runs in plans)
+
+def applyRuns(runs, message):
+    if all(outStep == 1 for outStart, outStep, inStart, inStep, count in runs):
+        pieces = [message[inStart:inStart + (count - 1) * inStep + 1:inStep] for outStart, outStep, inStart, inStep, count in runs]
+        if isinstance(message, str):
+            return ''.join(pieces)
+        return bytearray().join(pieces)
+
+    if isinstance(message, str):
+        output = [''] * len(message)
+    else:
+        output = bytearray(len(message))
+    for outStart, outStep, inStart, inStep, count in runs:
+        output[outStart:outStart + (count - 1) * outStep + 1:outStep] = message[inStart:inStart + (count - 1) * inStep + 1:inStep]
+    if isinstance(message, str):
+        return ''.join(output)
+    return output
+
+def compilePipeline(stages):
+    table = None
+    transpositions = []
+
+    for kind, key, mode in stages:
+        if kind == 'caesar':
+            stageTable = caesarCipher.getTranslationTable(key, mode)
+            if table is None:
+                table = dict(stageTable)
+            else:
+                table = composeTables(table, stageTable)
+        elif kind == 'transposition':
+            if mode not in ('encrypt', 'decrypt'):
+                raise ValueError("mode must be 'encrypt' or 'decrypt', not %r" % (mode,))
+            transpositions.append((key, mode))
+        else:
+            raise ValueError('unknown stage %r' % (kind,))
+
+    return tuple(transpositions), table
+
+def runPipeline(stages, message):
+    # 換字は位置に依存せず、転置は文字に依存しないので、二つの順番は入れ替えられる
+    transpositions, table = compilePipeline(stages)
+
+    if transpositions:
+        for runs in getTranspositionPlans(transpositions, len(message)):
+            message = applyRuns(runs, message)
+    if table is not None:
+        message = message.translate(table)
+
+    return message
+
+if __name__ == '__main__':
+    main()
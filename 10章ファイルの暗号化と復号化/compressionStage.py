@@ -0,0 +1,150 @@
+import bz2, hashlib, lzma, zlib
+import cipherMetrics
+
+# 暗号化の前に zlib / lzma / bz2 で圧縮し、復号の後で展開する段.
+# 暗号文の先頭には暗号化しないヘッダー b'CIPHERZ1 <方式> <レベル>\n' を付け、復号のときはそれを見て展開する.
+# 圧縮も展開も CHUNK_SIZE ずつ流すので、圧縮前の全文を読み込まずに圧縮でき、展開した全文を作らずに書き出したりハッシュだけ取ったりできる.
+# 復号も、平文を先頭から少しずつ組み立てる関数（cipherIntegrity.iterDecryptedChunks など）を受け取って展開器に流すので、
+# 復号の途中でメモリに全部載るのは暗号文だけ.
+# 圧縮の段の記録には compressedBytes（圧縮後の大きさ）と ratio（圧縮後 / 圧縮前）を足し、圧縮したものと一緒に返す.
+
+MAGIC = b'CIPHERZ1'
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_LEVELS = {'zlib': 6, 'lzma': 6, 'bz2': 9}
+
+def getCompressor(algorithm, level=None):
+    if level is None:
+        level = DEFAULT_LEVELS.get(algorithm)
+    if algorithm == 'zlib':
+        return zlib.compressobj(level)
+    elif algorithm == 'lzma':
+        return lzma.LZMACompressor(preset=level)
+    elif algorithm == 'bz2':
+        return bz2.BZ2Compressor(level)
+    raise ValueError("algorithm must be 'zlib', 'lzma' or 'bz2', not %r" % (algorithm,))
+
+def getDecompressor(algorithm):
+    if algorithm == 'zlib':
+        return zlib.decompressobj()
+    elif algorithm == 'lzma':
+        return lzma.LZMADecompressor()
+    elif algorithm == 'bz2':
+        return bz2.BZ2Decompressor()
+    raise ValueError("algorithm must be 'zlib', 'lzma' or 'bz2', not %r" % (algorithm,))
+
+def makeHeader(algorithm, level=None):
+    if level is None:
+        level = DEFAULT_LEVELS[algorithm]
+    return b'%s %s %d\n' % (MAGIC, algorithm.encode('ascii'), level)
+
+def hasHeader(data):
+    return bytes(data[:len(MAGIC) + 1]) == MAGIC + b' '
+
+def splitHeader(data):
+    # (方式, レベル, 本体) を返す. ヘッダーが無ければ (None, None, data)
+    if not hasHeader(data):
+        return None, None, data
+    end = bytes(data[:64]).find(b'\n')
+    if end == -1:
+        raise ValueError('broken compression header')
+    fields = bytes(data[:end]).split()
+    if len(fields) != 3:
+        raise ValueError('broken compression header')
+    return fields[1].decode('ascii'), int(fields[2]), memoryview(data)[end + 1:]
+
+def iterChunks(data, chunkSize=CHUNK_SIZE):
+    view = memoryview(data).cast('B')
+    for start in range(0, len(view), chunkSize):
+        yield view[start:start + chunkSize]
+
+def readChunks(fileObj, chunkSize=CHUNK_SIZE):
+    while True:
+        chunk = fileObj.read(chunkSize)
+        if not chunk:
+            return
+        yield chunk
+
+def compressChunks(chunks, algorithm, level=None):
+    # chunks を一つずつ圧縮器に流し、圧縮したものだけを bytearray に足していく.
+    # ファイルを readChunks で渡せば、圧縮前の全文はメモリに載らない
+    compressor = getCompressor(algorithm, level)
+    compressed = bytearray()
+    with cipherMetrics.stage('compress') as record:
+        for chunk in chunks:
+            record['bytes'] += len(chunk)
+            compressed += compressor.compress(chunk)
+        compressed += compressor.flush()
+        record['compressedBytes'] = len(compressed)
+        record['ratio'] = len(compressed) / record['bytes'] if record['bytes'] else 1.0
+    return compressed, record
+
+def compress(data, algorithm, level=None, chunkSize=CHUNK_SIZE):
+    return compressChunks(iterChunks(data, chunkSize), algorithm, level)
+
+def decompressChunks(pieces, algorithm):
+    # 壊れたもの（鍵を間違えて復号したものなど）は方式に関わらず ValueError にする
+    decompressor = getDecompressor(algorithm)
+    for piece in pieces:
+        try:
+            chunk = decompressor.decompress(piece)
+        except (zlib.error, lzma.LZMAError, OSError, EOFError) as error:
+            raise ValueError('compressed data is broken: %s' % (error,))
+        if chunk:
+            yield chunk
+    if algorithm == 'zlib':
+        chunk = decompressor.flush()
+        if chunk:
+            yield chunk
+    if not decompressor.eof:
+        raise ValueError('compressed data is truncated')
+
+def iterDecompressed(data, algorithm, chunkSize=CHUNK_SIZE):
+    return decompressChunks(iterChunks(data, chunkSize), algorithm)
+
+def decompress(data, algorithm, chunkSize=CHUNK_SIZE):
+    with cipherMetrics.stage('decompress', bytes=len(data)) as record:
+        decompressed = b''.join(iterDecompressed(data, algorithm, chunkSize))
+        record['decompressedBytes'] = len(decompressed)
+    return decompressed
+
+def encryptChunks(chunks, encrypt, algorithm, level=None):
+    # encrypt は bytes を受け取って暗号化した bytes / bytearray を返す関数.
+    # (ヘッダー, 暗号化した本体, 圧縮の段の記録) を返す. 書くときはヘッダー, 本体の順に書く
+    compressed, record = compressChunks(chunks, algorithm, level)
+    return makeHeader(algorithm, level), encrypt(compressed), record
+
+def encryptData(data, encrypt, algorithm, level=None):
+    # (暗号文, 圧縮の段の記録) を返す
+    header, body, record = encryptChunks(iterChunks(data), encrypt, algorithm, level)
+    return header + bytes(body), record
+
+def iterDecrypted(data, decryptChunks):
+    # decryptChunks は暗号化した本体を受け取り、平文（圧縮したもの）を先頭から少しずつ返す関数.
+    # 復号したそばから展開して返すので、復号した本体の全部も展開した全文も作らない.
+    # ヘッダーが無ければ圧縮されていないものとして、復号したものをそのまま返す
+    algorithm, level, body = splitHeader(data)
+    if algorithm is None:
+        for chunk in decryptChunks(body):
+            yield chunk
+        return
+    for chunk in decompressChunks(decryptChunks(body), algorithm):
+        yield chunk
+
+def decryptData(data, decryptChunks):
+    return b''.join(iterDecrypted(data, decryptChunks))
+
+def digestDecrypted(data, decryptChunks, hashName='sha256'):
+    # 復号して展開したものを少しずつハッシュに流す. 展開した全文は作らない. (ハッシュ, 平文のバイト数) を返す
+    digest = hashlib.new(hashName)
+    length = 0
+    for chunk in iterDecrypted(data, decryptChunks):
+        digest.update(chunk)
+        length += len(chunk)
+    return digest.hexdigest(), length
+
+def hashDecrypted(data, decryptChunks, hashName='sha256'):
+    return digestDecrypted(data, decryptChunks, hashName)[0]
+
+def printStats(record):
+    megabytesPerSecond = record['bytesPerSecond'] / (1024 * 1024)
+    print("Compressed %s bytes to %s bytes (%.1f%%) at %.1f MB/s." % (record['bytes'], record['compressedBytes'], record['ratio'] * 100, megabytesPerSecond))
@@ -0,0 +1,70 @@
+import sys, time
+import caesarCipher
+
+# 平文の一部（クリブ）とその位置が分かっているときの鍵の探索.
+# 転置式暗号では、鍵ごとにクリブの文字が暗号文のどこへ移るかを計算で求め、その位置だけを比べる.
+# 復号も英語の判定もしないので、鍵一つあたり len(crib) 回の比較で済む（食い違えばそこで打ち切る）.
+
+def main():
+    inputFilename = "frankenstein.encrypted.txt"
+    crib = "Project Gutenberg's Frankenstein"
+
+    fileObj = open(inputFilename)
+    message = fileObj.read()
+    fileObj.close()
+
+    startTime = time.time()
+    keys = hackTransposition(message, crib)
+    totalTime = round(time.time() - startTime, 4)
+
+    if keys == []:
+        print("No key matches the crib.")
+        sys.exit()
+    print("Possible keys: %s (%s seconds)" % (keys, totalTime))
+
+def matchesCrib(message, crib, offset, key):
+    # 平文の index 番目の文字が暗号文の何番目に来るかを求めて比べる.
+    # 先頭の length % key 列だけが1文字長いので、列の開始位置は計算で出せる
+    length = len(message)
+    rows, longColumns = divmod(length, key)
+    for index in range(offset, offset + len(crib)):
+        column = index % key
+        if message[column * rows + min(column, longColumns) + index // key] != crib[index - offset]:
+            return False
+    return True
+
+def hackTransposition(message, crib, offset=0, maxKey=None):
+    # クリブが平文の offset 文字目から始まるとして、矛盾しない鍵をすべて返す
+    if offset < 0 or offset + len(crib) > len(message):
+        raise ValueError('the crib does not fit inside the message at offset %s' % (offset))
+    if maxKey is None:
+        maxKey = len(message)
+
+    keys = []
+    for key in range(1, maxKey + 1):
+        if matchesCrib(message, crib, offset, key):
+            keys.append(key)
+    return keys
+
+def hackCaesar(message, crib, offset=0):
+    # 記号表にある文字の組が一つあれば鍵が決まる. 残りのクリブで確かめ、合わなければ None
+    if offset < 0 or offset + len(crib) > len(message):
+        raise ValueError('the crib does not fit inside the message at offset %s' % (offset))
+
+    symbols = caesarCipher.SYMBOLS
+    for index in range(len(crib)):
+        plainSymbol = crib[index]
+        cipherSymbol = message[offset + index]
+        if plainSymbol in symbols and cipherSymbol in symbols:
+            key = (symbols.find(cipherSymbol) - symbols.find(plainSymbol)) % len(symbols)
+            break
+    else:
+        return None
+
+    candidate = message[offset:offset + len(crib)]
+    if caesarCipher.translateMessage(key, candidate, 'decrypt') != crib:
+        return None
+    return key
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import random, sys
+import cribHacker, caesarCipher, transpositionEncrypt, transpositionDecrypt
+
+# クリブから鍵を絞る cribHacker が、鍵ごとに復号してクリブと比べたときと同じ鍵を返すことを確かめる.
+# クリブが暗号文の端にかかるときや、列の長さがそろわなくなる長さも試す.
+#   python cribHackerTest.py
+#   python -m pytest cribHackerTest.py
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz .,!?'
+LENGTHS = [1, 2, 3, 7, 8, 9, 16, 17, 64, 65]
+
+def main():
+    random.seed(42)
+    for test in [testTranspositionMatchesDecryption, testTranspositionFindsKey, testCaesarFindsKey, testCaesarRejectsWrongCrib, testCribOutsideMessage]:
+        test()
+        print('%s passed.' % (test.__name__))
+    print('Crib hacker test passed.')
+
+def getMessage(length):
+    return ''.join(random.choice(LETTERS) for i in range(length))
+
+def getCribs(plaintext):
+    # 先頭・末尾・途中・全体と、空のクリブ
+    length = len(plaintext)
+    cribs = [(0, ''), (0, plaintext), (0, plaintext[:3]), (max(0, length - 3), plaintext[-3:])]
+    if length > 4:
+        cribs.append((length // 2 - 2, plaintext[length // 2 - 2:length // 2 + 2]))
+    return cribs
+
+def testTranspositionMatchesDecryption():
+    # 返す鍵は、復号した平文の offset にクリブが現れる鍵とちょうど同じになる
+    for length in LENGTHS:
+        plaintext = getMessage(length)
+        for encryptKey in range(1, length + 1):
+            message = transpositionEncrypt.encryptMessage(encryptKey, plaintext)
+            for offset, crib in getCribs(plaintext):
+                expected = [key for key in range(1, length + 1) if transpositionDecrypt.decryptMessage(key, message)[offset:offset + len(crib)] == crib]
+                assert cribHacker.hackTransposition(message, crib, offset) == expected, (length, encryptKey, offset, crib)
+
+def testTranspositionFindsKey():
+    plaintext = getMessage(2000)
+    message = transpositionEncrypt.encryptMessage(37, plaintext)
+    assert cribHacker.hackTransposition(message, plaintext[100:140], 100) == [37]
+    # maxKey より大きい鍵は探さない
+    assert cribHacker.hackTransposition(message, plaintext[100:140], 100, maxKey=36) == []
+
+def testCaesarFindsKey():
+    for length in LENGTHS:
+        plaintext = getMessage(length)
+        for key in [0, 1, 13, len(caesarCipher.SYMBOLS) - 1]:
+            message = caesarCipher.translateMessage(key, plaintext, 'encrypt')
+            for offset, crib in getCribs(plaintext):
+                if crib == '':
+                    # 記号表の文字が一つも無ければ鍵は決まらない
+                    assert cribHacker.hackCaesar(message, crib, offset) is None
+                else:
+                    assert cribHacker.hackCaesar(message, crib, offset) == key, (length, key, offset, crib)
+
+def testCaesarRejectsWrongCrib():
+    message = caesarCipher.translateMessage(7, 'Hello, world!', 'encrypt')
+    assert cribHacker.hackCaesar(message, 'Hello, there!') is None
+    assert cribHacker.hackCaesar(message, '!!!!!', 0) is None
+    # 記号表に無い文字だけのクリブでも鍵は決まらない
+    assert cribHacker.hackCaesar('\n\n', '\n\n') is None
+
+def testCribOutsideMessage():
+    for hack in [cribHacker.hackTransposition, cribHacker.hackCaesar]:
+        for offset, crib in [(-1, 'a'), (0, 'abcdef'), (3, 'abc'), (6, '')]:
+            try:
+                hack('abcde', crib, offset)
+            except ValueError:
+                pass
+            else:
+                assert False, '%s accepted a crib at offset %s' % (hack.__name__, offset)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except AssertionError as error:
+        print('Crib hacker test FAILED: %s' % (error,))
+        sys.exit(1)
@@ -0,0 +1,64 @@
+import os
+import cipherMetrics, packedDictionary
+
+UPPERLETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+LETTERS_AND_SPACE = UPPERLETTERS + UPPERLETTERS.lower() + ' \t\n'
+
+def loadDictionary():
+    # 環境変数 CIPHER_PACKED_DICTIONARY が 1 なら、dictionary.words を mmap した PackedWords を使う.
+    # 引くのは少し遅くなるが、プロセスごとのメモリが数 MB から数百 KB に減る
+    if os.environ.get('CIPHER_PACKED_DICTIONARY') == '1':
+        with cipherMetrics.stage('dictionary load'):
+            return packedDictionary.loadPackedWords()
+
+    with cipherMetrics.stage('dictionary load') as record:
+        dictionaryFile = open('dictionary.txt')
+        content = dictionaryFile.read()
+        englishWords = {}
+        for word in content.split('\n'):
+            englishWords[word] = None
+        dictionaryFile.close()
+        record['chars'] = len(content)
+    return englishWords
+
+ENGLISH_WORDS = loadDictionary()
+
+
+def getEnglishCount(message):
+    # 候補ごとに呼ばれるので、記録する相手がいなければ時間を測らずに数える
+    if not cipherMetrics.hooks:
+        return countEnglishWords(message)
+    with cipherMetrics.stage('score', chars=len(message)):
+        return countEnglishWords(message)
+
+
+def countEnglishWords(message):
+    message = message.upper()
+    message = removeNonLetters(message)
+    possibleWords = message.split()
+
+    if possibleWords == []:
+        return 0.0
+
+    matches = 0
+    for word in possibleWords:
+        if word in ENGLISH_WORDS:
+            matches += 1
+    return float(matches) / len(possibleWords)
+
+
+def removeNonLetters(message):
+    lettersOnly = []
+    for symbol in message:
+        if symbol in LETTERS_AND_SPACE:
+            lettersOnly.append(symbol)
+    return ''.join(lettersOnly)
+
+
+def isEnglish(message, wordPercentage=20, letterPercentage=85):
+
+    wordsMatch = getEnglishCount(message) * 100 >= wordPercentage
+    numLetters = len(removeNonLetters(message))
+    messageLettersPercentage = float(numLetters) / len(message) * 100
+    lettersMatch = messageLettersPercentage >= letterPercentage
+    return wordsMatch and lettersMatch
\ No newline at end of file
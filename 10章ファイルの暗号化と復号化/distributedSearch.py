@@ -0,0 +1,204 @@
+import argparse, collections, os, sys, threading, time
+from multiprocessing.managers import BaseManager
+import caesarCipher, englishTrie, englishPrefilter, keySearch
+
+# 鍵の探索を複数のマシンで分担する. コーディネーターが鍵の範囲を貸し出し（リース）、
+# ワーカーは暗号文と辞書を一度だけ受け取って手元で範囲を調べ、上位の候補を返す.
+# 期限までに結果が返らないリースは別のワーカーに貸し直すので、ワーカーが落ちても探索は終わる.
+# 進みは keySearch と同じ形式のチェックポイントに書くので、途中から再開できる.
+#   python distributedSearch.py coordinator frankenstein.encrypted.txt --port 50000 --checkpoint run.json
+#   python distributedSearch.py worker --host 127.0.0.1 --port 50000
+# 認証キーは --authkey か環境変数 CIPHER_AUTHKEY で渡す.
+
+CHUNK_SIZE = 5000
+LEASE_TIME = 60.0
+WAIT_TIME = 0.5
+
+class Coordinator:
+    def __init__(self, message, cipher='transposition', checkpointFilename=None, chunkSize=CHUNK_SIZE, leaseTime=LEASE_TIME, topK=keySearch.TOP_K):
+        self.message = message
+        self.cipher = cipher
+        self.checkpointFilename = checkpointFilename
+        self.leaseTime = leaseTime
+        self.lock = threading.Lock()
+
+        # 別の暗号や鍵の範囲で作ったチェックポイントは loadCheckpoint が ValueError にする
+        start, stop = getKeyRange(cipher, message)
+        if checkpointFilename:
+            self.checkpoint = keySearch.loadCheckpoint(checkpointFilename, message, topK, cipher, [start, stop])
+        else:
+            self.checkpoint = keySearch.newCheckpoint(message, topK, cipher, [start, stop])
+        self.pending = collections.deque()
+        for missingStart, missingStop in keySearch.getMissingRanges(self.checkpoint['completed'], start, stop):
+            for chunkStart in range(missingStart, missingStop, chunkSize):
+                self.pending.append((chunkStart, min(chunkStart + chunkSize, missingStop)))
+
+        self.leases = {}
+        self.nextLease = 0
+
+    def getMessage(self):
+        return self.message, self.cipher
+
+    def getTask(self):
+        # 貸し出せる範囲があれば {'lease', 'start', 'stop'}、他のワーカーの結果待ちなら {'wait': True}、
+        # すべて終わっていれば None を返す
+        with self.lock:
+            now = time.time()
+            for lease, (start, stop, deadline) in list(self.leases.items()):
+                if deadline < now:
+                    del self.leases[lease]
+                    self.pending.appendleft((start, stop))
+
+            if self.pending:
+                start, stop = self.pending.popleft()
+                lease = self.nextLease
+                self.nextLease += 1
+                self.leases[lease] = (start, stop, now + self.leaseTime)
+                return {'lease': lease, 'start': start, 'stop': stop}
+            if self.leases:
+                return {'wait': True}
+            return None
+
+    def submitResult(self, lease, start, stop, candidates):
+        # 期限切れの後に届いた結果も正しいので受け取り、同じ範囲のリースや貸し直し待ちを取り消す
+        with self.lock:
+            self.leases.pop(lease, None)
+            for other, (otherStart, otherStop, deadline) in list(self.leases.items()):
+                if (otherStart, otherStop) == (start, stop):
+                    del self.leases[other]
+            if (start, stop) in self.pending:
+                self.pending.remove((start, stop))
+
+            self.checkpoint['completed'] = keySearch.mergeRanges(self.checkpoint['completed'] + [[start, stop]])
+            for score, key in candidates:
+                keySearch.addCandidate(self.checkpoint, key, score)
+            if self.checkpointFilename:
+                keySearch.saveCheckpoint(self.checkpoint, self.checkpointFilename)
+
+    def isFinished(self):
+        with self.lock:
+            return not self.pending and not self.leases
+
+    def getCheckpoint(self):
+        with self.lock:
+            return dict(self.checkpoint)
+
+class CoordinatorManager(BaseManager):
+    pass
+
+def getKeyRange(cipher, message):
+    if cipher == 'transposition':
+        return 1, len(message) + 1
+    elif cipher == 'caesar':
+        return 0, len(caesarCipher.SYMBOLS)
+    raise ValueError("cipher must be 'transposition' or 'caesar', not %r" % (cipher,))
+
+def scoreKey(cipher, trie, message, key, cascade):
+    # cascade は englishPrefilter.Cascade(cipher=cipher). ふるいで落ちた候補は 0 点
+    if cipher == 'transposition':
+        return keySearch.scoreKey(trie, message, key, cascade=cascade)
+    return cascade.score(caesarCipher.translateMessage(key, message, 'decrypt'))
+
+def searchRange(cipher, trie, message, start, stop, topK):
+    candidates = {'top': [], 'topK': topK}
+    cascade = englishPrefilter.Cascade(cipher=cipher)
+    for key in range(start, stop):
+        score = scoreKey(cipher, trie, message, key, cascade)
+        if score > 0:
+            keySearch.addCandidate(candidates, key, score)
+    return candidates['top']
+
+def serve(coordinator, host, port, authkey, graceTime=2.0):
+    # すべての範囲が終わったら、ワーカーが None を受け取れるよう少し待ってから止める
+    CoordinatorManager.register('getCoordinator', callable=lambda: coordinator)
+    manager = CoordinatorManager(address=(host, port), authkey=authkey)
+    server = manager.get_server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    while not coordinator.isFinished():
+        time.sleep(WAIT_TIME)
+    time.sleep(graceTime)
+    server.stop_event.set()
+    return coordinator.getCheckpoint()
+
+def runWorker(host, port, authkey, topK=keySearch.TOP_K):
+    CoordinatorManager.register('getCoordinator')
+    manager = CoordinatorManager(address=(host, port), authkey=authkey)
+    manager.connect()
+    coordinator = manager.getCoordinator()
+
+    # 暗号文と辞書は最初に一度だけ用意する
+    message, cipher = coordinator.getMessage()
+    trie = englishTrie.loadTrie()
+
+    ranges = 0
+    while True:
+        try:
+            task = coordinator.getTask()
+        except (EOFError, ConnectionError):
+            break
+        if task is None:
+            break
+        if 'wait' in task:
+            time.sleep(WAIT_TIME)
+            continue
+
+        candidates = searchRange(cipher, trie, message, task['start'], task['stop'], topK)
+        try:
+            coordinator.submitResult(task['lease'], task['start'], task['stop'], candidates)
+        except (EOFError, ConnectionError):
+            break
+        ranges += 1
+    return ranges
+
+def getAuthkey(authkey):
+    if authkey is None:
+        authkey = os.environ.get('CIPHER_AUTHKEY')
+    if not authkey:
+        print("Set an authentication key with --authkey or CIPHER_AUTHKEY.")
+        sys.exit(1)
+    return authkey.encode('utf-8')
+
+def main():
+    parser = argparse.ArgumentParser(description='Distributed transposition/Caesar key search.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinatorParser = commands.add_parser('coordinator')
+    coordinatorParser.add_argument('ciphertext')
+    coordinatorParser.add_argument('--cipher', choices=['transposition', 'caesar'], default='transposition')
+    coordinatorParser.add_argument('--host', default='127.0.0.1')
+    coordinatorParser.add_argument('--port', type=int, default=50000)
+    coordinatorParser.add_argument('--checkpoint')
+    coordinatorParser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    coordinatorParser.add_argument('--lease-time', type=float, default=LEASE_TIME)
+    coordinatorParser.add_argument('--authkey')
+
+    workerParser = commands.add_parser('worker')
+    workerParser.add_argument('--host', default='127.0.0.1')
+    workerParser.add_argument('--port', type=int, default=50000)
+    workerParser.add_argument('--authkey')
+
+    options = parser.parse_args()
+    authkey = getAuthkey(options.authkey)
+
+    if options.command == 'coordinator':
+        fileObj = open(options.ciphertext)
+        message = fileObj.read()
+        fileObj.close()
+
+        try:
+            coordinator = Coordinator(message, options.cipher, options.checkpoint, options.chunk_size, options.lease_time)
+        except ValueError as error:
+            print(error)
+            sys.exit(1)
+        startTime = time.time()
+        checkpoint = serve(coordinator, options.host, options.port, authkey)
+        print("Search finished in %s seconds." % (round(time.time() - startTime, 2)))
+        keySearch.printStatus(checkpoint)
+    elif options.command == 'worker':
+        ranges = runWorker(options.host, options.port, authkey)
+        print("Worker finished after %s ranges." % (ranges))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+import math
+import detectEnglish
+
+# 候補の平文を detectEnglish.isEnglish に渡す前に、安い判定から順にふるい落とす.
+# どの段も先頭の SAMPLE_SIZE 文字だけを見て、後ろの段ほど手間がかかる:
+#   空白の割合 → 母音の割合 → 英単語に現れない2文字の並び → 4文字の並び（quadgram）の対数尤度
+# 段ごとの判定数と棄却数を数えておき、getReport で棄却率を返す.
+# ふるいは本物の英語を落としてはいけないので、どの段も見る文字や並びが少なすぎて決められないときは通す.
+# 空白と母音の割合は転置しても変わらないので、転置式暗号の候補には並びの段だけを使う（getDefaultStages）.
+
+SAMPLE_SIZE = 200
+VOWELS = 'AEIOU'
+QUADGRAM_FILE = 'frankenstein.txt'
+
+allowedBigrams = None
+quadgramScores = None
+quadgramFloor = None
+
+def main():
+    cascade = Cascade()
+    print(cascade.check("This is a perfectly ordinary English sentence, which should pass every stage of the filter."))
+    print(cascade.check("Tsssa ih  ifletrrcyeel pn,gd ohe sw cn iEh tlsheh"))
+    for stage in cascade.getReport():
+        print('%-10s tested %6s rejected %6s (%.1f%%)' % (stage['name'], stage['tested'], stage['rejected'], stage['rejectRate'] * 100))
+
+def getLetters(sample):
+    return detectEnglish.removeNonLetters(sample.upper())
+
+def getAllowedBigrams():
+    # 辞書の単語の中に一度でも現れる2文字の並び
+    global allowedBigrams
+    if allowedBigrams is None:
+        bigrams = set()
+        for word in detectEnglish.ENGLISH_WORDS:
+            for index in range(len(word) - 1):
+                bigrams.add(word[index:index + 2])
+        allowedBigrams = bigrams
+    return allowedBigrams
+
+def getQuadgramScores():
+    # 単語の中の4文字の並びの出現回数から log10 の確率を求める. 一度も現れない並びは quadgramFloor
+    global quadgramScores, quadgramFloor
+    if quadgramScores is None:
+        fileObj = open(QUADGRAM_FILE)
+        words = getLetters(fileObj.read()).split()
+        fileObj.close()
+
+        counts = {}
+        total = 0
+        for word in words:
+            for index in range(len(word) - 3):
+                quadgram = word[index:index + 4]
+                counts[quadgram] = counts.get(quadgram, 0) + 1
+                total += 1
+
+        scores = {}
+        for quadgram, count in counts.items():
+            scores[quadgram] = math.log10(count / total)
+        quadgramFloor = math.log10(0.01 / total)
+        quadgramScores = scores
+    return quadgramScores
+
+def spaceStage(low=0.08, high=1.0, minLength=40):
+    # 字下げや空行の多い本物の英語があるので、既定では空白が少なすぎるものだけを落とす
+    def test(sample):
+        if len(sample) < minLength:
+            return True
+        spaces = 0
+        for space in ' \t\n':
+            spaces += sample.count(space)
+        return low <= spaces / len(sample) <= high
+    return ('space', test)
+
+def vowelStage(low=0.25, high=0.55, minLetters=30):
+    def test(sample):
+        letters = getLetters(sample).replace(' ', '').replace('\t', '').replace('\n', '')
+        if len(letters) < minLetters:
+            return True
+        vowels = 0
+        for vowel in VOWELS:
+            vowels += letters.count(vowel)
+        return low <= vowels / len(letters) <= high
+    return ('vowel', test)
+
+def bigramStage(maxRatio=0.15, minCount=20):
+    def test(sample):
+        bigrams = getAllowedBigrams()
+        total = 0
+        impossible = 0
+        for word in getLetters(sample).split():
+            for index in range(len(word) - 1):
+                total += 1
+                if word[index:index + 2] not in bigrams:
+                    impossible += 1
+        return total < minCount or impossible <= maxRatio * total
+    return ('bigram', test)
+
+def quadgramStage(minScore=-5.2, minCount=20):
+    def test(sample):
+        scores = getQuadgramScores()
+        total = 0.0
+        count = 0
+        for word in getLetters(sample).split():
+            for index in range(len(word) - 3):
+                total += scores.get(word[index:index + 4], quadgramFloor)
+                count += 1
+        return count < minCount or total / count >= minScore
+    return ('quadgram', test)
+
+def getDefaultStages(cipher=None):
+    # 転置式暗号の候補は空白と母音の割合が正しい平文と同じなので、その2段は手間がかかるだけ
+    if cipher == 'transposition':
+        return [bigramStage(), quadgramStage()]
+    return [spaceStage(), vowelStage(), bigramStage(), quadgramStage()]
+
+class Cascade:
+    def __init__(self, stages=None, sampleSize=SAMPLE_SIZE, wordPercentage=20, letterPercentage=85, cipher=None):
+        if stages is None:
+            stages = getDefaultStages(cipher)
+        self.stages = stages
+        self.sampleSize = sampleSize
+        self.wordPercentage = wordPercentage
+        self.letterPercentage = letterPercentage
+        self.tested = {}
+        self.rejected = {}
+        for name, test in self.stages + [('isEnglish', None)]:
+            self.tested[name] = 0
+            self.rejected[name] = 0
+
+    def passes(self, message):
+        # 安い段だけで判定する. False なら isEnglish でも英語にはならないとみなしてよい
+        if message == '':
+            return False
+
+        sample = message[:self.sampleSize]
+        for name, test in self.stages:
+            self.tested[name] += 1
+            if not test(sample):
+                self.rejected[name] += 1
+                return False
+        return True
+
+    def score(self, message):
+        # 段を通ったものだけ detectEnglish.getEnglishCount で数え、落ちたものは 0 点にする
+        if not self.passes(message):
+            return 0.0
+        return detectEnglish.getEnglishCount(message)
+
+    def check(self, message):
+        if not self.passes(message):
+            return False
+
+        # 残ったものだけを辞書で判定する
+        self.tested['isEnglish'] += 1
+        if not detectEnglish.isEnglish(message, self.wordPercentage, self.letterPercentage):
+            self.rejected['isEnglish'] += 1
+            return False
+        return True
+
+    def getReport(self):
+        report = []
+        for name, test in self.stages + [('isEnglish', None)]:
+            tested = self.tested[name]
+            rejected = self.rejected[name]
+            if tested:
+                rejectRate = rejected / tested
+            else:
+                rejectRate = 0.0
+            report.append({'name': name, 'tested': tested, 'rejected': rejected, 'rejectRate': rejectRate})
+        return report
+
+if __name__ == '__main__':
+    main()
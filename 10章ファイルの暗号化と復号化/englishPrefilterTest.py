@@ -0,0 +1,80 @@
+import random, sys
+import englishPrefilter, detectEnglish, transpositionEncrypt, transpositionDecrypt, caesarCipher
+
+# ふるいが本物の英語を落とさないこと（isEnglish が英語とするものは必ず通すこと）と、
+# 間違った鍵で復号したものはふるいの段で落ちることを確かめる.
+# 辞書と frankenstein.txt を相対パスで開くので、リポジトリの一番上で動かす.
+#   python 10章ファイルの暗号化と復号化/englishPrefilterTest.py
+#   python -m pytest 10章ファイルの暗号化と復号化/englishPrefilterTest.py
+
+SHORT_ENGLISH = ['I am a cat.', 'Yes, it is so.', 'Go to the zoo. It is fun.', 'The cat sat on the mat and he ran to the car.']
+WINDOW_LENGTHS = [5, 10, 20, 30, 50, 80, 120, 200, 400, 1000]
+CIPHERS = [None, 'caesar', 'transposition']
+
+def main():
+    for test in [testShortEnglishPasses, testEnglishWindowsPass, testTranspositionStages, testRejectsWrongTranspositionKeys, testRejectsWrongCaesarKeys, testScore]:
+        test()
+        print('%s passed.' % (test.__name__))
+    print('English prefilter test passed.')
+
+def getText():
+    fileObj = open('frankenstein.txt')
+    text = fileObj.read()
+    fileObj.close()
+    return text
+
+def testShortEnglishPasses():
+    for cipher in CIPHERS:
+        cascade = englishPrefilter.Cascade(cipher=cipher)
+        for message in SHORT_ENGLISH:
+            assert detectEnglish.isEnglish(message), message
+            assert cascade.check(message), (cipher, message)
+
+def testEnglishWindowsPass():
+    # 単語の途中から始まる切れ端や、字下げの多い箇所も含めて、isEnglish が通すものは全部通す
+    random.seed(3)
+    text = getText()
+    for cipher in CIPHERS:
+        cascade = englishPrefilter.Cascade(cipher=cipher)
+        for length in WINDOW_LENGTHS:
+            for i in range(200):
+                start = random.randrange(len(text) - length)
+                window = text[start:start + length]
+                if detectEnglish.isEnglish(window):
+                    assert cascade.check(window), (cipher, window)
+
+def testTranspositionStages():
+    # 空白と母音の割合は転置で変わらないので、転置式暗号の候補には使わない
+    names = [name for name, test in englishPrefilter.getDefaultStages('transposition')]
+    assert names == ['bigram', 'quadgram'], names
+
+def testRejectsWrongTranspositionKeys():
+    plaintext = getText()[5000:8000]
+    ciphertext = transpositionEncrypt.encryptMessage(17, plaintext)
+    cascade = englishPrefilter.Cascade(cipher='transposition')
+    passed = [key for key in range(1, 400) if cascade.check(transpositionDecrypt.decryptMessage(key, ciphertext))]
+    assert passed == [17], passed
+    report = dict((stage['name'], stage) for stage in cascade.getReport())
+    # 間違った鍵のほとんどは辞書を引く前に落ちる
+    assert report['isEnglish']['tested'] <= 10, report
+
+def testRejectsWrongCaesarKeys():
+    plaintext = getText()[5000:8000]
+    ciphertext = caesarCipher.translateMessage(23, plaintext, 'encrypt')
+    cascade = englishPrefilter.Cascade(cipher='caesar')
+    passed = [key for key in range(len(caesarCipher.SYMBOLS)) if cascade.check(caesarCipher.translateMessage(key, ciphertext, 'decrypt'))]
+    assert passed == [23], passed
+
+def testScore():
+    cascade = englishPrefilter.Cascade(cipher='transposition')
+    plaintext = getText()[5000:8000]
+    assert cascade.score(plaintext) == detectEnglish.getEnglishCount(plaintext)
+    assert cascade.score(transpositionEncrypt.encryptMessage(9, plaintext)) == 0.0
+    assert cascade.score('') == 0.0
+
+if __name__ == '__main__':
+    try:
+        main()
+    except AssertionError as error:
+        print('English prefilter test FAILED: %s' % (error,))
+        sys.exit(1)
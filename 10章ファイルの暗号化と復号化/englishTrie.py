@@ -0,0 +1,137 @@
+import array, os, sys
+import fileUtil
+
+# dictionary.txt の単語を詰め込んだトライ.
+# 節点 node の子への辺は edgeLabels[firstEdge[node]:firstEdge[node + 1]] に文字として並び、
+# 行き先は edgeTargets の同じ位置にある. 単語の終わりの節点は terminal[node] が 1.
+# 一度作ったものは dictionary.trie に保存し、次からはそれを読み込むだけにする.
+
+DICTIONARY_FILE = 'dictionary.txt'
+TRIE_FILE = 'dictionary.trie'
+MAGIC = b'TRIE1\n'
+ROOT = 0
+MISSING = -1
+
+class Trie:
+    def __init__(self, firstEdge, edgeLabels, edgeTargets, terminal):
+        self.firstEdge = firstEdge
+        self.edgeLabels = edgeLabels
+        self.edgeTargets = edgeTargets
+        self.terminal = terminal
+
+    def getChild(self, node, letter):
+        # letter は1文字の bytes（ASCII の大文字）. 子が無ければ MISSING
+        position = self.edgeLabels.find(letter, self.firstEdge[node], self.firstEdge[node + 1])
+        if position == -1:
+            return MISSING
+        return self.edgeTargets[position]
+
+    def isWord(self, node):
+        return self.terminal[node] == 1
+
+    def walk(self, word, node=ROOT):
+        for letter in word.upper().encode('ascii', 'replace'):
+            node = self.getChild(node, bytes((letter,)))
+            if node == MISSING:
+                break
+        return node
+
+    def isPrefix(self, word):
+        return self.walk(word) != MISSING
+
+    def __contains__(self, word):
+        node = self.walk(word)
+        return node != MISSING and self.isWord(node)
+
+def buildTrie(words):
+    # まず辞書の入れ子で木を作り、幅優先の順に節点へ番号を振って配列へ詰める
+    tree = {}
+    for word in words:
+        branch = tree
+        for letter in word:
+            branch = branch.setdefault(letter, {})
+        branch[''] = True
+
+    firstEdge = array.array('I')
+    edgeLabels = bytearray()
+    edgeTargets = array.array('I')
+    terminal = bytearray()
+
+    queue = [tree]
+    nodeCount = 1
+    head = 0
+    while head < len(queue):
+        branch = queue[head]
+        head += 1
+        firstEdge.append(len(edgeLabels))
+        terminal.append(1 if '' in branch else 0)
+        for letter in sorted(letter for letter in branch if letter != ''):
+            edgeLabels += letter.encode('ascii')
+            edgeTargets.append(nodeCount)
+            nodeCount += 1
+            queue.append(branch[letter])
+    firstEdge.append(len(edgeLabels))
+
+    return Trie(firstEdge, bytes(edgeLabels), edgeTargets, bytes(terminal))
+
+def saveTrie(trie, filename):
+    firstEdge = array.array('I', trie.firstEdge)
+    edgeTargets = array.array('I', trie.edgeTargets)
+    if sys.byteorder != 'little':
+        firstEdge.byteswap()
+        edgeTargets.byteswap()
+
+    header = b'%d %d\n' % (len(trie.firstEdge), len(trie.edgeLabels))
+    # 複数のプロセスが同時に作っても壊れないよう、別々の一時ファイルに書いてから置き換える
+    with fileUtil.openAtomically(filename, 'wb') as fileObj:
+        fileObj.write(MAGIC + header)
+        fileObj.write(firstEdge.tobytes())
+        fileObj.write(trie.edgeLabels)
+        fileObj.write(edgeTargets.tobytes())
+        fileObj.write(trie.terminal)
+
+def readTrie(filename):
+    fileObj = open(filename, 'rb')
+    try:
+        if fileObj.readline() != MAGIC:
+            raise ValueError('%s is not a trie file' % (filename))
+        try:
+            nodeEntries, edgeCount = [int(number) for number in fileObj.readline().split()]
+        except ValueError:
+            raise ValueError('%s has a broken header' % (filename))
+
+        # 途中で切れたファイルは、配列が短くなる前にここで見つける
+        itemsize = array.array('I').itemsize
+        expected = fileObj.tell() + nodeEntries * itemsize + edgeCount + edgeCount * itemsize + nodeEntries - 1
+        if nodeEntries < 1 or edgeCount < 0 or os.fstat(fileObj.fileno()).st_size != expected:
+            raise ValueError('%s is truncated or has the wrong size' % (filename))
+
+        firstEdge = array.array('I')
+        firstEdge.frombytes(fileObj.read(nodeEntries * itemsize))
+        edgeLabels = fileObj.read(edgeCount)
+        edgeTargets = array.array('I')
+        edgeTargets.frombytes(fileObj.read(edgeCount * itemsize))
+        terminal = fileObj.read(nodeEntries - 1)
+    finally:
+        fileObj.close()
+
+    if sys.byteorder != 'little':
+        firstEdge.byteswap()
+        edgeTargets.byteswap()
+    return Trie(firstEdge, edgeLabels, edgeTargets, terminal)
+
+def loadTrie(dictionaryFilename=DICTIONARY_FILE, trieFilename=TRIE_FILE):
+    # 保存したトライが辞書より新しければそれを使い、そうでなければ作り直して保存する
+    if os.path.exists(trieFilename) and os.path.getmtime(trieFilename) >= os.path.getmtime(dictionaryFilename):
+        try:
+            return readTrie(trieFilename)
+        except ValueError:
+            pass
+
+    dictionaryFile = open(dictionaryFilename)
+    words = [word.strip().upper() for word in dictionaryFile.read().split('\n')]
+    dictionaryFile.close()
+
+    trie = buildTrie(word for word in words if word != '' and word.isascii() and word.isalpha())
+    saveTrie(trie, trieFilename)
+    return trie
@@ -0,0 +1,40 @@
+import contextlib, os, tempfile
+
+# ファイルを書くときの小さな道具.
+# openAtomically / writeAtomically は一時ファイルに書いてから置き換えるので、読む側が書きかけのファイルを見ることはない.
+
+def getFileMode(filename):
+    # open(filename, 'w') で書いたときの権限. 前のファイルがあればその権限、無ければ umask に従った 0666
+    try:
+        return os.stat(filename).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+@contextlib.contextmanager
+def openAtomically(filename, mode='w', fsync=False):
+    # 読む側が書きかけのファイルを見ないように、同じ場所の一時ファイルに書き、with を抜けるときに置き換える.
+    # 一時ファイルの名前は mkstemp で決めるので、同時に書くプロセスがあっても互いの一時ファイルを壊さない.
+    # 途中で例外が起きたら一時ファイルを消し、元のファイルはそのまま残す.
+    # mkstemp は 0600 で作るので、open() で書いたときと同じ権限に直しておく
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tempFilename = tempfile.mkstemp(prefix='.' + os.path.basename(filename), suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode) as fileObj:
+            os.chmod(tempFilename, getFileMode(filename))
+            yield fileObj
+            if fsync:
+                fileObj.flush()
+                os.fsync(fileObj.fileno())
+        os.replace(tempFilename, filename)
+    except BaseException:
+        if os.path.exists(tempFilename):
+            os.remove(tempFilename)
+        raise
+
+def writeAtomically(filename, data, fsync=False):
+    # data が str ならテキストで、bytes などならバイト列として書く
+    mode = 'w' if isinstance(data, str) else 'wb'
+    with openAtomically(filename, mode, fsync) as fileObj:
+        fileObj.write(data)
@@ -0,0 +1,210 @@
+import argparse, hashlib, json, os, signal, sys, time
+import englishTrie, englishPrefilter, detectEnglish, transpositionDecrypt, trieHacker, fileUtil
+
+# 転置式暗号の鍵を順に試し、英語らしさの上位 K 件を残す探索.
+# 終わった鍵の範囲・上位の候補・暗号文のハッシュをチェックポイントファイルに書いておくので、
+# 途中で止まっても同じファイルを渡せば続きから再開できる.
+# 鍵の範囲を分けて別々のマシンで動かしたチェックポイントは merge でまとめられる.
+#   python keySearch.py search frankenstein.encrypted.txt run.json --start 1 --stop 200000
+#   python keySearch.py merge all.json shard1.json shard2.json
+#   python keySearch.py status all.json
+
+VERSION = 1
+TOP_K = 10
+CHECKPOINT_INTERVAL = 10.0
+
+def getHash(message):
+    return hashlib.sha256(message.encode('utf-8')).hexdigest()
+
+def newCheckpoint(message, topK=TOP_K, cipher='transposition', keyRange=None):
+    checkpoint = {
+        'version': VERSION,
+        'cipher': cipher,
+        'ciphertextHash': getHash(message),
+        'length': len(message),
+        'completed': [],
+        'top': [],
+        'topK': topK,
+    }
+    if keyRange is not None:
+        checkpoint['keyRange'] = list(keyRange)
+    return checkpoint
+
+def loadCheckpoint(filename, message=None, topK=TOP_K, cipher=None, keyRange=None):
+    # ファイルが無ければ新しく作る. 暗号文・暗号の種類・鍵の範囲が違うチェックポイントは使わない
+    # （終わった範囲の意味が変わり、調べていない鍵を調べたことにしてしまう）
+    if not os.path.exists(filename):
+        if message is None:
+            raise FileNotFoundError(filename)
+        return newCheckpoint(message, topK, cipher or 'transposition', keyRange)
+
+    fileObj = open(filename)
+    checkpoint = json.load(fileObj)
+    fileObj.close()
+
+    if checkpoint.get('version') != VERSION:
+        raise ValueError('%s has an unsupported checkpoint version' % (filename))
+    if message is not None and checkpoint['ciphertextHash'] != getHash(message):
+        raise ValueError('%s was made for a different ciphertext' % (filename))
+    if cipher is not None and checkpoint.get('cipher', 'transposition') != cipher:
+        raise ValueError('%s was made for the %s cipher, not %s' % (filename, checkpoint.get('cipher', 'transposition'), cipher))
+    if keyRange is not None:
+        if 'keyRange' not in checkpoint:
+            checkpoint['keyRange'] = list(keyRange)
+        elif checkpoint['keyRange'] != list(keyRange):
+            raise ValueError('%s was made for keys %s to %s, not %s to %s' % (filename, checkpoint['keyRange'][0], checkpoint['keyRange'][1], keyRange[0], keyRange[1]))
+    return checkpoint
+
+def saveCheckpoint(checkpoint, filename):
+    fileUtil.writeAtomically(filename, json.dumps(checkpoint, indent=1), fsync=True)
+
+def mergeRanges(ranges):
+    # [start, stop) の区間を並べ、重なりや隣り合うものを一つにする
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return merged
+
+def getMissingRanges(completed, start, stop):
+    missing = []
+    position = start
+    for doneStart, doneStop in completed:
+        if doneStop <= position:
+            continue
+        if doneStart >= stop:
+            break
+        if doneStart > position:
+            missing.append((position, doneStart))
+        position = max(position, doneStop)
+    if position < stop:
+        missing.append((position, stop))
+    return missing
+
+def addCandidate(checkpoint, key, score):
+    # 中断の直前に試した鍵は再開後にもう一度試すことがあるので、同じ鍵は一つにする
+    top = [candidate for candidate in checkpoint['top'] if candidate[1] != key]
+    checkpoint['top'] = top
+    top.append([score, key])
+    top.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+    del top[checkpoint['topK']:]
+
+def mergeCheckpoints(checkpoints):
+    if checkpoints == []:
+        raise ValueError('nothing to merge')
+
+    first = checkpoints[0]
+    merged = dict(first)
+    merged['completed'] = []
+    merged['top'] = []
+    merged['topK'] = max(checkpoint['topK'] for checkpoint in checkpoints)
+
+    for checkpoint in checkpoints:
+        if checkpoint['ciphertextHash'] != first['ciphertextHash']:
+            raise ValueError('checkpoints were made for different ciphertexts')
+        if checkpoint.get('cipher', 'transposition') != first.get('cipher', 'transposition'):
+            raise ValueError('checkpoints were made for different ciphers')
+        merged['completed'] += checkpoint['completed']
+        for score, key in checkpoint['top']:
+            addCandidate(merged, key, score)
+    merged['completed'] = mergeRanges(merged['completed'])
+    return merged
+
+def scoreKey(trie, message, key, prune=True, cascade=None):
+    # 先頭の単語がトライで行き詰まる鍵は復号せずに 0 点にする.
+    # cascade があれば、そのふるいで落ちた平文も辞書を引かずに 0 点にする
+    if prune and not trieHacker.checkKey(trie, message, key)[0]:
+        return 0.0
+    plaintext = transpositionDecrypt.decryptMessage(key, message)
+    if cascade is not None:
+        return cascade.score(plaintext)
+    return detectEnglish.getEnglishCount(plaintext)
+
+def searchKeys(message, checkpointFilename, start=1, stop=None, topK=TOP_K, prune=True, interval=CHECKPOINT_INTERVAL):
+    # [start, stop) のうち、まだ終わっていない鍵だけを試す
+    if stop is None:
+        stop = len(message) + 1
+    checkpoint = loadCheckpoint(checkpointFilename, message, topK, 'transposition')
+    trie = englishTrie.loadTrie()
+    cascade = englishPrefilter.Cascade(cipher='transposition') if prune else None
+    lastSave = time.time()
+
+    for missingStart, missingStop in getMissingRanges(checkpoint['completed'], start, stop):
+        rangeStart = missingStart
+        key = missingStart
+        try:
+            while key < missingStop:
+                score = scoreKey(trie, message, key, prune, cascade)
+                if score > 0:
+                    addCandidate(checkpoint, key, score)
+                key += 1
+
+                if time.time() - lastSave >= interval:
+                    checkpoint['completed'] = mergeRanges(checkpoint['completed'] + [[rangeStart, key]])
+                    saveCheckpoint(checkpoint, checkpointFilename)
+                    rangeStart = key
+                    lastSave = time.time()
+        finally:
+            # 中断されても、試し終えた鍵までは残す
+            checkpoint['completed'] = mergeRanges(checkpoint['completed'] + [[rangeStart, key]])
+            saveCheckpoint(checkpoint, checkpointFilename)
+
+    return checkpoint
+
+def printStatus(checkpoint):
+    keyStart, keyStop = checkpoint.get('keyRange', [1, checkpoint['length'] + 1])
+    done = sum(stop - start for start, stop in checkpoint['completed'])
+    print("Ciphertext %s... (%s characters), %s of %s keys done." % (checkpoint['ciphertextHash'][:12], checkpoint['length'], done, keyStop - keyStart))
+    for score, key in checkpoint['top']:
+        print("  key %s: %.1f%% English words" % (key, score * 100))
+
+def stopOnSignal(signum, frame):
+    # kill やジョブの打ち切りでも Ctrl+C と同じように進みを保存して終わる
+    raise KeyboardInterrupt
+
+def main():
+    parser = argparse.ArgumentParser(description='Resumable transposition key search.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    search = commands.add_parser('search')
+    search.add_argument('ciphertext')
+    search.add_argument('checkpoint')
+    search.add_argument('--start', type=int, default=1)
+    search.add_argument('--stop', type=int, help='first key not to try (default: message length + 1)')
+    search.add_argument('--top', type=int, default=TOP_K)
+    search.add_argument('--no-prune', action='store_true', help='score every key, even hopeless ones (skips the trie and the prefilter)')
+
+    merge = commands.add_parser('merge')
+    merge.add_argument('output')
+    merge.add_argument('inputs', nargs='+')
+
+    status = commands.add_parser('status')
+    status.add_argument('checkpoint')
+
+    options = parser.parse_args()
+
+    if options.command == 'search':
+        signal.signal(signal.SIGTERM, stopOnSignal)
+        fileObj = open(options.ciphertext)
+        message = fileObj.read()
+        fileObj.close()
+        try:
+            checkpoint = searchKeys(message, options.checkpoint, options.start, options.stop, options.top, not options.no_prune)
+        except KeyboardInterrupt:
+            print("Interrupted. Progress saved to %s." % (options.checkpoint))
+            sys.exit(1)
+        except ValueError as error:
+            print(error)
+            sys.exit(1)
+        printStatus(checkpoint)
+    elif options.command == 'merge':
+        checkpoint = mergeCheckpoints([loadCheckpoint(filename) for filename in options.inputs])
+        saveCheckpoint(checkpoint, options.output)
+        printStatus(checkpoint)
+    elif options.command == 'status':
+        printStatus(loadCheckpoint(options.checkpoint))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import os, shutil, signal, sys, tempfile
+import keySearch, transpositionEncrypt
+
+# 鍵の探索が、途中で止めて再開しても（Ctrl+C でも SIGTERM でも）一度に最後まで探したときと同じ結果になり、
+# 範囲を分けて探したチェックポイントを merge しても同じになることを確かめる.
+# 辞書と frankenstein.txt を相対パスで開くので、リポジトリの一番上で動かす.
+#   python 10章ファイルの暗号化と復号化/keySearchTest.py
+#   python -m pytest 10章ファイルの暗号化と復号化/keySearchTest.py
+
+KEY = 11
+STOP = 41
+STOP_AT = 17
+
+def main():
+    for test in [testRanges, testAddCandidate, testSearchFindsKey, testResumeAfterInterrupt, testResumeAfterSigterm, testMergeMatchesSingleRun, testRejectsOtherCheckpoints]:
+        test()
+        print('%s passed.' % (test.__name__))
+    print('Key search test passed.')
+
+def getMessage():
+    fileObj = open('frankenstein.txt')
+    plaintext = fileObj.read(3000)[1000:]
+    fileObj.close()
+    return transpositionEncrypt.encryptMessage(KEY, plaintext)
+
+def runInDirectory(check):
+    directory = tempfile.mkdtemp()
+    try:
+        check(directory)
+    finally:
+        shutil.rmtree(directory)
+
+def stopAt(stopKey, stop):
+    # stopKey を試そうとしたところで一度だけ stop() を呼ぶ scoreKey を keySearch に差し込む.
+    # 元の scoreKey と、試した鍵の一覧を返す
+    originalScoreKey = keySearch.scoreKey
+    triedKeys = []
+    stopped = []
+
+    def scoreKey(trie, message, key, prune=True, cascade=None):
+        if key == stopKey and not stopped:
+            stopped.append(key)
+            stop()
+        triedKeys.append(key)
+        return originalScoreKey(trie, message, key, prune, cascade)
+
+    keySearch.scoreKey = scoreKey
+    return originalScoreKey, triedKeys
+
+def interrupt():
+    raise KeyboardInterrupt
+
+def testRanges():
+    assert keySearch.mergeRanges([]) == []
+    assert keySearch.mergeRanges([[5, 8], [1, 3], [3, 4], [7, 10]]) == [[1, 4], [5, 10]]
+    assert keySearch.getMissingRanges([], 1, 10) == [(1, 10)]
+    assert keySearch.getMissingRanges([[1, 4], [5, 10]], 1, 12) == [(4, 5), (10, 12)]
+    assert keySearch.getMissingRanges([[1, 4], [5, 10]], 2, 9) == [(4, 5)]
+    assert keySearch.getMissingRanges([[1, 12]], 1, 12) == []
+
+def testAddCandidate():
+    # 同じ鍵は一つにまとめ、点の高い順に topK 件だけ残す
+    checkpoint = keySearch.newCheckpoint('message', topK=2)
+    keySearch.addCandidate(checkpoint, 3, 0.5)
+    keySearch.addCandidate(checkpoint, 3, 0.5)
+    keySearch.addCandidate(checkpoint, 4, 0.9)
+    keySearch.addCandidate(checkpoint, 5, 0.1)
+    assert checkpoint['top'] == [[0.9, 4], [0.5, 3]], checkpoint['top']
+
+def testSearchFindsKey():
+    message = getMessage()
+    def check(directory):
+        filename = os.path.join(directory, 'run.json')
+        for prune in [True, False]:
+            checkpoint = keySearch.searchKeys(message, filename + str(prune), 1, STOP, prune=prune)
+            assert checkpoint['top'][0][1] == KEY, (prune, checkpoint['top'])
+            assert checkpoint['completed'] == [[1, STOP]], checkpoint['completed']
+            assert keySearch.loadCheckpoint(filename + str(prune), message) == checkpoint
+    runInDirectory(check)
+
+def checkResume(stop):
+    # 止めたときに試し終えた鍵までが保存され、再開すると残りの鍵だけを試す
+    message = getMessage()
+    def check(directory):
+        expected = keySearch.searchKeys(message, os.path.join(directory, 'whole.json'), 1, STOP)
+        filename = os.path.join(directory, 'run.json')
+        originalScoreKey, triedKeys = stopAt(STOP_AT, stop)
+        try:
+            try:
+                keySearch.searchKeys(message, filename, 1, STOP)
+            except KeyboardInterrupt:
+                pass
+            else:
+                assert False, 'the search was not interrupted'
+            assert keySearch.loadCheckpoint(filename, message)['completed'] == [[1, STOP_AT]]
+            del triedKeys[:]
+            checkpoint = keySearch.searchKeys(message, filename, 1, STOP)
+        finally:
+            keySearch.scoreKey = originalScoreKey
+        assert triedKeys == list(range(STOP_AT, STOP)), triedKeys
+        assert checkpoint['completed'] == expected['completed']
+        assert checkpoint['top'] == expected['top'], (checkpoint['top'], expected['top'])
+    runInDirectory(check)
+
+def testResumeAfterInterrupt():
+    checkResume(interrupt)
+
+def testResumeAfterSigterm():
+    # main() と同じように SIGTERM を Ctrl+C に置き換えて、本当にシグナルを送る
+    handler = signal.signal(signal.SIGTERM, keySearch.stopOnSignal)
+    try:
+        checkResume(lambda: os.kill(os.getpid(), signal.SIGTERM))
+    finally:
+        signal.signal(signal.SIGTERM, handler)
+
+def testMergeMatchesSingleRun():
+    message = getMessage()
+    def check(directory):
+        expected = keySearch.searchKeys(message, os.path.join(directory, 'whole.json'), 1, STOP)
+        # 重なりのある分け方でも、同じ鍵が二つ残ったりしない
+        shards = []
+        for index, (start, stop) in enumerate([(20, STOP), (1, 12), (10, 21)]):
+            shards.append(keySearch.searchKeys(message, os.path.join(directory, 'shard%s.json' % (index)), start, stop))
+        merged = keySearch.mergeCheckpoints(shards)
+        assert merged['completed'] == expected['completed'], merged['completed']
+        assert merged['top'] == expected['top'], (merged['top'], expected['top'])
+        # まとめたものを渡せば、探し終えた鍵はもう試さない
+        keySearch.saveCheckpoint(merged, os.path.join(directory, 'all.json'))
+        originalScoreKey, triedKeys = stopAt(None, interrupt)
+        try:
+            keySearch.searchKeys(message, os.path.join(directory, 'all.json'), 1, STOP + 2)
+        finally:
+            keySearch.scoreKey = originalScoreKey
+        assert triedKeys == [STOP, STOP + 1], triedKeys
+    runInDirectory(check)
+
+def testRejectsOtherCheckpoints():
+    message = getMessage()
+    def check(directory):
+        filename = os.path.join(directory, 'run.json')
+        keySearch.searchKeys(message, filename, 1, 5)
+        otherFilename = os.path.join(directory, 'other.json')
+        keySearch.searchKeys(message[1:], otherFilename, 1, 5)
+
+        checkpoint = keySearch.loadCheckpoint(filename)
+        caesarCheckpoint = dict(checkpoint, cipher='caesar')
+        rangeFilename = os.path.join(directory, 'range.json')
+        keySearch.saveCheckpoint(dict(checkpoint, keyRange=[1, 5]), rangeFilename)
+        for call in [
+            lambda: keySearch.searchKeys(message[1:], filename, 1, 5),
+            lambda: keySearch.loadCheckpoint(filename, message, cipher='caesar'),
+            lambda: keySearch.loadCheckpoint(rangeFilename, message, keyRange=(1, 6)),
+            lambda: keySearch.mergeCheckpoints([checkpoint, keySearch.loadCheckpoint(otherFilename)]),
+            lambda: keySearch.mergeCheckpoints([checkpoint, caesarCheckpoint]),
+            lambda: keySearch.mergeCheckpoints([]),
+        ]:
+            try:
+                call()
+            except ValueError:
+                pass
+            else:
+                assert False, 'a mismatched checkpoint was accepted'
+        # 断られたあとも、チェックポイントは書き換わっていない
+        assert keySearch.loadCheckpoint(filename, message) == checkpoint
+        try:
+            keySearch.loadCheckpoint(os.path.join(directory, 'missing.json'))
+        except FileNotFoundError:
+            pass
+        else:
+            assert False, 'a missing checkpoint was accepted'
+    runInDirectory(check)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except AssertionError as error:
+        print('Key search test FAILED: %s' % (error,))
+        sys.exit(1)
@@ -0,0 +1,32 @@
+import pyperclip
+import functools
+import transpositionEncrypt, transpositionDecrypt
+
+# キーワード式の転置式暗号.
+# 列の数はキーワードの長さで、列はキーワードの文字をアルファベット順に並べた順番で読み出す.
+# 同じ文字が複数あるときは左にある列を先に読む.
+
+def main():
+    message = "Common sence is not so common"
+    keyword = "ZEBRAS"
+
+    ciphertext = encryptMessage(keyword, message)
+    print(ciphertext + '|')
+    print(decryptMessage(keyword, ciphertext) + '|')
+
+    pyperclip.copy(ciphertext)
+
+@functools.lru_cache(maxsize=128)
+def getColumnOrder(keyword):
+    if keyword == '':
+        raise ValueError('keyword must not be empty')
+    return tuple(sorted(range(len(keyword)), key=lambda column: (keyword[column], column)))
+
+def encryptMessage(keyword, message):
+    return transpositionEncrypt.encryptMessage(len(keyword), message, getColumnOrder(keyword))
+
+def decryptMessage(keyword, message):
+    return transpositionDecrypt.decryptMessage(len(keyword), message, getColumnOrder(keyword))
+
+if __name__ == '__main__':
+    main()
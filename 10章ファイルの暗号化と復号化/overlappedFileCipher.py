@@ -0,0 +1,226 @@
+import os, queue, threading
+import caesarCipher, transpositionEncrypt, fileUtil
+
+# 読み込み・変換・書き込みを別々のスレッドで動かし、キューでつなぐ.
+# キューの大きさを QUEUE_SIZE に抑えているので、メモリに溜まるのは二重バッファ分だけになる.
+# 出力は fileUtil.openAtomically で一時ファイルに書き、最後に置き換える.
+
+CHUNK_SIZE = 1024 * 1024
+QUEUE_SIZE = 2
+DONE = None
+
+def putItem(itemQueue, item, cancel):
+    # 相手のスレッドが失敗して止まっていても、ここで固まらないようにする
+    while not cancel.is_set():
+        try:
+            itemQueue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def getItem(itemQueue, cancel):
+    while not cancel.is_set():
+        try:
+            return True, itemQueue.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return False, DONE
+
+def startThread(errors, cancel, target, *args):
+    def run():
+        try:
+            target(*args)
+        except BaseException as error:
+            errors.append(error)
+            cancel.set()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def readChunks(fileObj, chunkSize, outQueue, cancel):
+    sequence = 0
+    try:
+        while not cancel.is_set():
+            chunk = fileObj.read(chunkSize)
+            if not chunk:
+                break
+            putItem(outQueue, (sequence, chunk), cancel)
+            sequence += 1
+    finally:
+        putItem(outQueue, DONE, cancel)
+
+def transformChunks(transform, inQueue, outQueue, cancel):
+    try:
+        while True:
+            ok, item = getItem(inQueue, cancel)
+            if not ok:
+                return
+            if item is DONE:
+                # 他の変換スレッドにも終わりを伝える
+                putItem(inQueue, DONE, cancel)
+                return
+            sequence, chunk = item
+            putItem(outQueue, (sequence, transform(chunk)), cancel)
+    finally:
+        putItem(outQueue, DONE, cancel)
+
+def writeChunks(fileObj, inQueue, producers, cancel):
+    # 変換スレッドが複数あると順番が入れ替わるので、番号順に並べ直してから書く
+    pending = {}
+    nextSequence = 0
+    finished = 0
+
+    while finished < producers:
+        ok, item = getItem(inQueue, cancel)
+        if not ok:
+            return
+        if item is DONE:
+            finished += 1
+            continue
+
+        sequence, chunk = item
+        pending[sequence] = chunk
+        while nextSequence in pending:
+            fileObj.write(pending.pop(nextSequence))
+            nextSequence += 1
+
+    if pending:
+        raise RuntimeError('missing chunk %s' % (nextSequence,))
+
+def runThreads(outputFilename, startStages):
+    # startStages(outputFileObj, errors, cancel) がスレッドを起動し、その一覧を返す
+    errors = []
+    cancel = threading.Event()
+
+    try:
+        with fileUtil.openAtomically(outputFilename, 'wb', fsync=True) as outputFileObj:
+            for thread in startStages(outputFileObj, errors, cancel):
+                thread.join()
+            if errors:
+                raise errors[0]
+    except BaseException:
+        cancel.set()
+        raise
+
+def caesarFile(inputFilename, outputFilename, key, mode, workers=2, chunkSize=CHUNK_SIZE):
+    # シーザー暗号は1バイトずつ独立なので、ブロックごとに並行して変換できる
+    def transform(chunk):
+        return caesarCipher.translateBytes(key, chunk, mode)
+
+    def startStages(outputFileObj, errors, cancel):
+        inputFileObj = open(inputFilename, 'rb')
+        readQueue = queue.Queue(QUEUE_SIZE)
+        writeQueue = queue.Queue(QUEUE_SIZE * workers)
+
+        threads = [startThread(errors, cancel, readChunks, inputFileObj, chunkSize, readQueue, cancel)]
+        for worker in range(workers):
+            threads.append(startThread(errors, cancel, transformChunks, transform, readQueue, writeQueue, cancel))
+        threads.append(startThread(errors, cancel, writeChunks, outputFileObj, writeQueue, workers, cancel))
+
+        threads.append(startThread(errors, cancel, closeAfter, threads[:], inputFileObj))
+        return threads
+
+    runThreads(outputFilename, startStages)
+
+def closeAfter(threads, fileObj):
+    for thread in threads:
+        thread.join()
+    fileObj.close()
+
+def readInto(fileObj, buffer, chunkSize, progressQueue, cancel):
+    # ファイル全体を用意しておいたバッファへ読み込み、読めたところまでを知らせる
+    view = memoryview(buffer)
+    position = 0
+    try:
+        while position < len(view) and not cancel.is_set():
+            count = fileObj.readinto(view[position:position + chunkSize])
+            if not count:
+                raise EOFError('file shrank while reading')
+            position += count
+            putItem(progressQueue, position, cancel)
+    finally:
+        putItem(progressQueue, DONE, cancel)
+
+def waitForProgress(progressQueue, needed, position, cancel):
+    while position < needed:
+        ok, item = getItem(progressQueue, cancel)
+        if not ok or item is DONE:
+            return position
+        position = item
+    return position
+
+def encryptColumns(key, columnOrder, buffer, chunkSize, progressQueue, writeQueue, cancel):
+    # 各列は平文全体に散らばっているので、読み終えてから列ごとに書き出しへ回す
+    try:
+        length = len(buffer)
+        if waitForProgress(progressQueue, length, 0, cancel) < length:
+            return
+        data = memoryview(buffer)
+
+        # 出力で隣り合う列を chunkSize ほどにまとめ、一つのバッファへ直接書き込む
+        plan = transpositionEncrypt.getEncryptPlan(key, length, columnOrder)
+        sequence = 0
+        first = 0
+        while first < len(plan):
+            last = first
+            while last + 1 < len(plan) and plan[last][2] - plan[first][1] < chunkSize:
+                last += 1
+
+            offset = plan[first][1]
+            chunk = bytearray(plan[last][2] - offset)
+            for column, start, stop in plan[first:last + 1]:
+                chunk[start - offset:stop - offset] = data[column::key]
+
+            putItem(writeQueue, (sequence, chunk), cancel)
+            sequence += 1
+            first = last + 1
+    finally:
+        putItem(writeQueue, DONE, cancel)
+
+def decryptColumns(key, columnOrder, buffer, chunkSize, progressQueue, writeQueue, cancel):
+    # 暗号文の列は連続しているので、読み込みが列の終わりまで届いたものから平文へ書き戻す
+    try:
+        length = len(buffer)
+        data = memoryview(buffer)
+        output = bytearray(length)
+        target = memoryview(output)
+
+        position = 0
+        for column, start, stop in transpositionEncrypt.getEncryptPlan(key, length, columnOrder):
+            position = waitForProgress(progressQueue, stop, position, cancel)
+            if position < stop:
+                return
+            target[column::key] = data[start:stop]
+
+        sequence = 0
+        for start in range(0, length, chunkSize):
+            putItem(writeQueue, (sequence, target[start:start + chunkSize]), cancel)
+            sequence += 1
+    finally:
+        putItem(writeQueue, DONE, cancel)
+
+def transpositionFile(inputFilename, outputFilename, key, mode, columnOrder=None, chunkSize=CHUNK_SIZE):
+    if mode == 'encrypt':
+        transform = encryptColumns
+    elif mode == 'decrypt':
+        transform = decryptColumns
+    else:
+        raise ValueError("mode must be 'encrypt' or 'decrypt', not %r" % (mode,))
+
+    def startStages(outputFileObj, errors, cancel):
+        inputFileObj = open(inputFilename, 'rb')
+        buffer = bytearray(os.fstat(inputFileObj.fileno()).st_size)
+        progressQueue = queue.Queue()
+        writeQueue = queue.Queue(QUEUE_SIZE)
+
+        threads = [
+            startThread(errors, cancel, readInto, inputFileObj, buffer, chunkSize, progressQueue, cancel),
+            startThread(errors, cancel, transform, key, columnOrder, buffer, chunkSize, progressQueue, writeQueue, cancel),
+            startThread(errors, cancel, writeChunks, outputFileObj, writeQueue, 1, cancel),
+        ]
+        threads.append(startThread(errors, cancel, closeAfter, threads[:], inputFileObj))
+        return threads
+
+    runThreads(outputFilename, startStages)
@@ -0,0 +1,127 @@
+import os, random, shutil, sys, tempfile
+import overlappedFileCipher, caesarCipher, keywordTransposition, transpositionEncrypt, transpositionDecrypt
+
+# 読み込み・変換・書き込みを重ねて動かす overlappedFileCipher が、メモリ上で一度に変換したものと
+# 同じファイルを書き、往復して元に戻ることを確かめる. 空のファイルやブロックの大きさの前後も試す.
+#   python overlappedFileCipherTest.py
+#   python -m pytest overlappedFileCipherTest.py
+
+CHUNK_SIZE = 16
+# 空のファイルや1バイト、ブロックの大きさの倍数の前後の長さ
+EDGE_LENGTHS = [0, 1, CHUNK_SIZE - 1, CHUNK_SIZE, CHUNK_SIZE + 1, CHUNK_SIZE * 3 - 1, CHUNK_SIZE * 3, CHUNK_SIZE * 3 + 1, 1000]
+KEYS = [1, 2, 3, 8, 15, 16, 17]
+
+def main():
+    for test in [testCaesarMatchesMemory, testCaesarRoundTrip, testTranspositionMatchesMemory, testTranspositionRoundTrip, testKeywordRoundTrip, testErrorLeavesNoOutput]:
+        test()
+        print('%s passed.' % (test.__name__))
+    print('Overlapped file cipher test passed.')
+
+def getData(length):
+    random.seed(length)
+    return bytes(random.choice(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz .,!?\n') for i in range(length))
+
+def writeFile(filename, data):
+    fileObj = open(filename, 'wb')
+    fileObj.write(data)
+    fileObj.close()
+
+def readFile(filename):
+    fileObj = open(filename, 'rb')
+    data = fileObj.read()
+    fileObj.close()
+    return data
+
+def runInDirectory(check):
+    # 一時的なディレクトリに入力を書いて check(入力, 出力, 戻した出力) を呼ぶ
+    directory = tempfile.mkdtemp()
+    try:
+        check(os.path.join(directory, 'input'), os.path.join(directory, 'output'), os.path.join(directory, 'restored'))
+    finally:
+        shutil.rmtree(directory)
+
+def testCaesarMatchesMemory():
+    def check(inputFilename, outputFilename, restoredFilename):
+        for length in EDGE_LENGTHS:
+            data = getData(length)
+            writeFile(inputFilename, data)
+            for workers in [1, 3]:
+                overlappedFileCipher.caesarFile(inputFilename, outputFilename, 13, 'encrypt', workers, CHUNK_SIZE)
+                assert readFile(outputFilename) == caesarCipher.translateBytes(13, data, 'encrypt'), (length, workers)
+    runInDirectory(check)
+
+def testCaesarRoundTrip():
+    def check(inputFilename, outputFilename, restoredFilename):
+        for length in EDGE_LENGTHS:
+            data = getData(length)
+            writeFile(inputFilename, data)
+            for key in [0, 1, 13, len(caesarCipher.SYMBOLS) - 1]:
+                overlappedFileCipher.caesarFile(inputFilename, outputFilename, key, 'encrypt', 2, CHUNK_SIZE)
+                overlappedFileCipher.caesarFile(outputFilename, restoredFilename, key, 'decrypt', 2, CHUNK_SIZE)
+                assert readFile(restoredFilename) == data, (length, key)
+    runInDirectory(check)
+
+def testTranspositionMatchesMemory():
+    def check(inputFilename, outputFilename, restoredFilename):
+        for length in EDGE_LENGTHS:
+            data = getData(length)
+            writeFile(inputFilename, data)
+            for key in KEYS:
+                overlappedFileCipher.transpositionFile(inputFilename, outputFilename, key, 'encrypt', chunkSize=CHUNK_SIZE)
+                assert readFile(outputFilename) == transpositionEncrypt.encryptBytes(key, data), (length, key)
+                overlappedFileCipher.transpositionFile(inputFilename, outputFilename, key, 'decrypt', chunkSize=CHUNK_SIZE)
+                assert readFile(outputFilename) == transpositionDecrypt.decryptBytes(key, data), (length, key)
+    runInDirectory(check)
+
+def testTranspositionRoundTrip():
+    def check(inputFilename, outputFilename, restoredFilename):
+        for length in EDGE_LENGTHS:
+            data = getData(length)
+            writeFile(inputFilename, data)
+            for key in KEYS:
+                for chunkSize in [1, CHUNK_SIZE, overlappedFileCipher.CHUNK_SIZE]:
+                    overlappedFileCipher.transpositionFile(inputFilename, outputFilename, key, 'encrypt', chunkSize=chunkSize)
+                    overlappedFileCipher.transpositionFile(outputFilename, restoredFilename, key, 'decrypt', chunkSize=chunkSize)
+                    assert readFile(restoredFilename) == data, (length, key, chunkSize)
+    runInDirectory(check)
+
+def testKeywordRoundTrip():
+    # キーワードで列の順番を入れ替えたときも、メモリ上の変換と同じになる
+    def check(inputFilename, outputFilename, restoredFilename):
+        for length in EDGE_LENGTHS:
+            data = getData(length)
+            writeFile(inputFilename, data)
+            for keyword in ['ZEBRA', 'CIPHER', 'A']:
+                columnOrder = keywordTransposition.getColumnOrder(keyword)
+                overlappedFileCipher.transpositionFile(inputFilename, outputFilename, len(keyword), 'encrypt', columnOrder, CHUNK_SIZE)
+                assert readFile(outputFilename) == transpositionEncrypt.encryptBytes(len(keyword), data, columnOrder), (length, keyword)
+                overlappedFileCipher.transpositionFile(outputFilename, restoredFilename, len(keyword), 'decrypt', columnOrder, CHUNK_SIZE)
+                assert readFile(restoredFilename) == data, (length, keyword)
+    runInDirectory(check)
+
+def testErrorLeavesNoOutput():
+    # 途中で失敗したときは、前の出力を壊さず、書きかけのファイルも残さない
+    def check(inputFilename, outputFilename, restoredFilename):
+        writeFile(outputFilename, b'previous')
+        try:
+            overlappedFileCipher.caesarFile(inputFilename, outputFilename, 13, 'encrypt', 2, CHUNK_SIZE)
+        except OSError:
+            pass
+        else:
+            assert False, 'a missing input file did not raise'
+        try:
+            overlappedFileCipher.transpositionFile(outputFilename, restoredFilename, 8, 'sideways')
+        except ValueError:
+            pass
+        else:
+            assert False, 'an unknown mode did not raise'
+        assert readFile(outputFilename) == b'previous'
+        assert sorted(os.listdir(os.path.dirname(outputFilename))) == ['output']
+    runInDirectory(check)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except AssertionError as error:
+        print('Overlapped file cipher test FAILED: %s' % (error,))
+        sys.exit(1)
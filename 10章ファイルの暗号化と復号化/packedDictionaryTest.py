@@ -0,0 +1,144 @@
+import os, random, shutil, sys, tempfile, time
+import packedDictionary
+
+# dictionary.words に詰めた PackedWords が、detectEnglish の辞書（dict）と同じ単語を含み、同じ単語を含まないことを確かめる.
+# 辞書を相対パスで開くので、リポジトリの一番上で動かす.
+#   python 10章ファイルの暗号化と復号化/packedDictionaryTest.py
+#   python -m pytest 10章ファイルの暗号化と復号化/packedDictionaryTest.py
+
+SMALL_WORDS = ['', 'A', 'AB', 'ABC', 'ABD', 'B', 'BA', 'CAFÉ', 'ÉCOLE', 'ZZ', 'Z']
+
+def main():
+    random.seed(42)
+    for test in [testMembershipMatchesDict, testSmallWords, testEmptyWords, testIteration, testRebuildsStaleFile, testRejectsBrokenFile]:
+        test()
+        print('%s passed.' % (test.__name__))
+    print('Packed dictionary test passed.')
+
+def getDictionary():
+    # detectEnglish.loadDictionary と同じ作り方
+    dictionaryFile = open(packedDictionary.DICTIONARY_FILE)
+    englishWords = {}
+    for word in dictionaryFile.read().split('\n'):
+        englishWords[word] = None
+    dictionaryFile.close()
+    return englishWords
+
+def getNonWords(words):
+    # 辞書の単語を1文字変えたり、削ったり、足したりしたもの. 辞書にあるものも混ざるので dict と比べる
+    candidates = ['', ' ', 'Q', 'QQ', 'XYZZY', 'a', 'the', 'THE ', 'É', '日本', '\udcff', 'AAAAAAAAAAAAAAAAAAAA']
+    for word in random.sample(sorted(words), 2000):
+        if word:
+            position = random.randrange(len(word))
+            candidates.append(word[:position] + random.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') + word[position + 1:])
+            candidates.append(word[:-1])
+            candidates.append(word[1:])
+            candidates.append(word + 'S')
+            candidates.append(word.lower())
+    return candidates
+
+def runInDirectory(check):
+    directory = tempfile.mkdtemp()
+    try:
+        check(directory)
+    finally:
+        shutil.rmtree(directory)
+
+def packWords(directory, words):
+    filename = os.path.join(directory, 'words')
+    packedDictionary.savePackedWords(words, filename)
+    return packedDictionary.readPackedWords(filename)
+
+def testMembershipMatchesDict():
+    englishWords = getDictionary()
+    def check(directory):
+        packed = packedDictionary.loadPackedWords(packedDictionary.DICTIONARY_FILE, os.path.join(directory, 'dictionary.words'))
+        assert len(packed) == len(englishWords)
+        for word in englishWords:
+            assert word in packed, word
+        for word in getNonWords(englishWords):
+            assert (word in packed) == (word in englishWords), word
+        # 文字列でないものは含まない
+        for word in [None, 1, b'THE', ['THE']]:
+            assert word not in packed, word
+    runInDirectory(check)
+
+def testSmallWords():
+    # 2バイトに満たない単語や、頭の2バイトが同じ単語、ASCII 以外の文字の単語も引ける
+    def check(directory):
+        packed = packWords(directory, SMALL_WORDS + ['ABC'])
+        assert len(packed) == len(SMALL_WORDS)
+        for word in SMALL_WORDS:
+            assert word in packed, word
+        for word in ['AC', 'ABCD', 'AA', 'C', 'CAFE', 'É', 'ZZZ', 'a']:
+            assert word not in packed, word
+    runInDirectory(check)
+
+def testEmptyWords():
+    def check(directory):
+        packed = packWords(directory, [])
+        assert len(packed) == 0
+        assert list(packed) == []
+        assert '' not in packed and 'A' not in packed
+    runInDirectory(check)
+
+def testIteration():
+    # UTF-8 のバイト列の順に、重なり無しで返す
+    def check(directory):
+        packed = packWords(directory, SMALL_WORDS)
+        assert list(packed) == sorted(SMALL_WORDS, key=lambda word: word.encode('utf-8'))
+    runInDirectory(check)
+
+def testRebuildsStaleFile():
+    # 辞書のほうが新しければ詰めたファイルを作り直す
+    def check(directory):
+        dictionaryFilename = os.path.join(directory, 'dictionary.txt')
+        packedFilename = os.path.join(directory, 'dictionary.words')
+        fileObj = open(dictionaryFilename, 'w')
+        fileObj.write('CAT\nDOG')
+        fileObj.close()
+        assert 'DOG' in packedDictionary.loadPackedWords(dictionaryFilename, packedFilename)
+
+        fileObj = open(dictionaryFilename, 'w')
+        fileObj.write('CAT\nEMU')
+        fileObj.close()
+        later = time.time() + 10
+        os.utime(dictionaryFilename, (later, later))
+        packed = packedDictionary.loadPackedWords(dictionaryFilename, packedFilename)
+        assert 'EMU' in packed and 'DOG' not in packed
+    runInDirectory(check)
+
+def testRejectsBrokenFile():
+    # 壊れたファイルは readPackedWords では ValueError になり、loadPackedWords は作り直す
+    def check(directory):
+        dictionaryFilename = os.path.join(directory, 'dictionary.txt')
+        packedFilename = os.path.join(directory, 'dictionary.words')
+        fileObj = open(dictionaryFilename, 'w')
+        fileObj.write('CAT\nDOG')
+        fileObj.close()
+        packedDictionary.loadPackedWords(dictionaryFilename, packedFilename)
+
+        fileObj = open(packedFilename, 'rb')
+        data = fileObj.read()
+        fileObj.close()
+        for broken in [data[:-1], b'NOTWORDS\n' + data[len(packedDictionary.MAGIC):]]:
+            fileObj = open(packedFilename, 'wb')
+            fileObj.write(broken)
+            fileObj.close()
+            try:
+                packedDictionary.readPackedWords(packedFilename)
+            except ValueError:
+                pass
+            else:
+                assert False, 'a broken packed file was accepted'
+            later = time.time() + 10
+            os.utime(packedFilename, (later, later))
+            assert 'DOG' in packedDictionary.loadPackedWords(dictionaryFilename, packedFilename)
+    runInDirectory(check)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except AssertionError as error:
+        print('Packed dictionary test FAILED: %s' % (error,))
+        sys.exit(1)
@@ -0,0 +1,189 @@
+import argparse, concurrent.futures, os, sys
+import caesarCipher, transpositionEncrypt, cipherMetrics, fileUtil
+
+# JSONL や CSV のように区切り文字で分かれたレコードを、一つずつ別々に暗号化・復号する.
+# 受け取った側は欲しいレコードだけを復号できる. 区切り文字はそのまま残す.
+# 入力は BATCH_SIZE バイトほどずつ（レコードの切れ目で）読み、まとまりごとにプロセスプールへ回す.
+# 結果は順番待ちの表に入れ、前のまとまりが書けたものから順に書き出すので、出力の順番は入力と同じになる.
+# 同時に回すまとまりの数を抑えているので、メモリより大きなファイルでも扱える.
+#   python recordCipher.py events.jsonl events.encrypted.jsonl --key 8
+#   python recordCipher.py events.encrypted.jsonl events.jsonl --key 8 --mode decrypt
+#   python recordCipher.py table.csv table.encrypted.csv --cipher caesar --key 13
+
+BATCH_SIZE = 1024 * 1024
+MAX_PLANS = 4096
+
+# このプロセスで作った転置の計画. レコードの長さごとに一つ持つ
+plans = {}
+
+def getPlan(key, length):
+    # 長さの種類が getEncryptPlan の lru_cache より多くても作り直さないよう、ここで覚えておく
+    plan = plans.get((key, length))
+    if plan is None:
+        if len(plans) >= MAX_PLANS:
+            plans.clear()
+        plan = transpositionEncrypt.getEncryptPlan(key, length)
+        plans[(key, length)] = plan
+    return plan
+
+def translateRecord(cipher, key, mode, record):
+    if cipher == 'caesar':
+        return caesarCipher.translateBytes(key, record, mode)
+
+    translated = bytearray(len(record))
+    if mode == 'encrypt':
+        for column, start, stop in getPlan(key, len(record)):
+            translated[start:stop] = record[column::key]
+    else:
+        for column, start, stop in getPlan(key, len(record)):
+            translated[column::key] = record[start:stop]
+    return translated
+
+def translateRecords(cipher, key, mode, chunk, delimiter=b'\n'):
+    # chunk を区切り文字で分けて各レコードを変換し、同じ区切り文字でつなぎ直す
+    return delimiter.join([translateRecord(cipher, key, mode, record) for record in chunk.split(delimiter)])
+
+def checkDelimiter(cipher, delimiter):
+    # シーザー暗号で区切り文字が別の文字に化けたり、別の文字が区切り文字になったりしないようにする
+    if delimiter == b'':
+        raise ValueError('the delimiter must not be empty')
+    if cipher == 'caesar' and any(chr(byte) in caesarCipher.SYMBOLS for byte in delimiter):
+        raise ValueError('the delimiter %r is shifted by the Caesar cipher' % (delimiter,))
+    # 転置ではレコードの中の \r と \n が並び替わって \r\n ができることがあり、復号するときにレコードの切れ目がずれる.
+    # シーザー暗号は区切り文字のバイトを動かさないので、何バイトの区切り文字でもよい
+    if cipher == 'transposition' and len(delimiter) > 1:
+        raise ValueError('the delimiter %r must be a single byte for the transposition cipher' % (delimiter,))
+    if cipher not in ('transposition', 'caesar'):
+        raise ValueError("cipher must be 'transposition' or 'caesar', not %r" % (cipher,))
+
+def readBatches(fileObj, delimiter, batchSize):
+    # レコードの途中で切らないよう、最後の区切り文字より後ろは次のまとまりに回す.
+    # ファイルの最後に区切り文字が無ければ、残りを最後のまとまりにする
+    carry = b''
+    while True:
+        block = fileObj.read(batchSize)
+        if not block:
+            break
+        block = carry + block
+        end = block.rfind(delimiter)
+        if end == -1:
+            carry = block
+            continue
+        end += len(delimiter)
+        carry = block[end:]
+        yield block[:end - len(delimiter)]
+    if carry:
+        yield carry
+
+def translateFile(inputFilename, outputFilename, cipher, key, mode, delimiter=b'\n', workers=None, batchSize=BATCH_SIZE):
+    # workers が 0 ならプロセスプールを使わずにこのプロセスで変換する. 返り値は (まとまりの数, バイト数)
+    checkDelimiter(cipher, delimiter)
+    inputFileObj = open(inputFilename, 'rb')
+    batches = 0
+    size = 0
+
+    try:
+        with fileUtil.openAtomically(outputFilename, 'wb', fsync=True) as outputFileObj:
+            # まとまりの後ろの区切り文字は変換に渡さず、書くときに足す
+            if workers == 0:
+                for chunk in readBatches(inputFileObj, delimiter, batchSize):
+                    outputFileObj.write(translateRecords(cipher, key, mode, chunk, delimiter))
+                    outputFileObj.write(delimiter)
+                    batches += 1
+                    size += len(chunk) + len(delimiter)
+            else:
+                batches, size = translateInPool(inputFileObj, outputFileObj, cipher, key, mode, delimiter, workers, batchSize)
+            if batches:
+                # 入力の最後に区切り文字が無ければ、足した分を取り除く
+                if not endsWith(inputFilename, delimiter):
+                    outputFileObj.seek(-len(delimiter), os.SEEK_END)
+                    outputFileObj.truncate()
+                    size -= len(delimiter)
+    finally:
+        inputFileObj.close()
+    return batches, size
+
+def endsWith(filename, suffix):
+    fileObj = open(filename, 'rb')
+    fileObj.seek(0, os.SEEK_END)
+    fileSize = fileObj.tell()
+    if fileSize < len(suffix):
+        fileObj.close()
+        return False
+    fileObj.seek(fileSize - len(suffix))
+    ending = fileObj.read()
+    fileObj.close()
+    return ending == suffix
+
+def translateInPool(inputFileObj, outputFileObj, cipher, key, mode, delimiter, workers, batchSize):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    executor = concurrent.futures.ProcessPoolExecutor(workers)
+    maxInFlight = workers * 2
+    inFlight = {}
+    finished = {}
+    nextSequence = 0
+    nextToWrite = 0
+    size = 0
+
+    def writeFinished():
+        nonlocal nextToWrite
+        while nextToWrite in finished:
+            outputFileObj.write(finished.pop(nextToWrite))
+            outputFileObj.write(delimiter)
+            nextToWrite += 1
+
+    def waitForOne():
+        done, pending = concurrent.futures.wait(inFlight, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            finished[inFlight.pop(future)] = future.result()
+        writeFinished()
+
+    try:
+        for chunk in readBatches(inputFileObj, delimiter, batchSize):
+            # 回しているまとまりが多すぎるときは、どれかが終わるまで読み込みを待つ
+            while len(inFlight) >= maxInFlight:
+                waitForOne()
+            future = executor.submit(translateRecords, cipher, key, mode, chunk, delimiter)
+            inFlight[future] = nextSequence
+            nextSequence += 1
+            size += len(chunk) + len(delimiter)
+        while inFlight:
+            waitForOne()
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return nextSequence, size
+
+def main():
+    parser = argparse.ArgumentParser(description='Encrypt or decrypt each record of a line-oriented file separately.')
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--key', type=int, required=True)
+    parser.add_argument('--mode', choices=['encrypt', 'decrypt'], default='encrypt')
+    parser.add_argument('--cipher', choices=['transposition', 'caesar'], default='transposition')
+    parser.add_argument('--delimiter', default='\\n', help='record delimiter; backslash escapes are allowed (default: \\n)')
+    parser.add_argument('--workers', type=int, help='worker processes; 0 runs in this process (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    options = parser.parse_args()
+
+    delimiter = options.delimiter.encode('utf-8').decode('unicode_escape').encode('latin-1')
+    try:
+        checkDelimiter(options.cipher, delimiter)
+    except ValueError as error:
+        print('Error: %s' % (error))
+        sys.exit(1)
+    if not os.path.exists(options.input):
+        print("The file %s dose not exist. Quitting..." % (options.input))
+        sys.exit()
+
+    collector = cipherMetrics.collectFromEnvironment()
+    print("%sing %s..." % (options.mode.title(), options.input))
+    with cipherMetrics.stage('records', bytes=os.path.getsize(options.input)) as record:
+        batches, size = translateFile(options.input, options.output, options.cipher, options.key, options.mode, delimiter, options.workers, options.batch_size)
+    print("Done %sing %s bytes in %s batches. (%s seconds)" % (options.mode, size, batches, round(record['wallTime'], 2)))
+    print("%sed file is %s." % (options.mode.title(), options.output))
+    if collector:
+        collector.export()
+
+if __name__ == '__main__':
+    main()
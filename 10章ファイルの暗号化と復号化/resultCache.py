@@ -0,0 +1,130 @@
+import hashlib, json, os, shutil, sys
+import fileUtil
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 暗号化・復号の結果ファイルを、入力の中身のハッシュと暗号・鍵・モード・実装の版で引けるように保存しておくキャッシュ.
+# 同じ入力をもう一度処理するときは、ハッシュを計算して保存済みのファイルをコピーするだけで済む.
+# ハードリンクにすると、出力をその場で書き換える処理（appendCipher など）がキャッシュの中身まで壊すのでコピーにする.
+# ただしファイルシステムが reflink（Btrfs・XFS などの FICLONE）に対応していれば、それで中身のブロックを共有する.
+# reflink は別の inode なので、片方を書き換えても書き換えたブロックだけが複製され、もう片方は変わらない.
+# 保存したファイルは出力のハッシュを一緒に記録しておき、取り出すたびに確かめる.
+# 合計の大きさが maxBytes を超えたら、最後に使ったのが古いものから消す.
+# 置き場所は環境変数 CIPHER_CACHE_DIR で変えられる.
+
+VERSION = 1
+CACHE_DIR = '.cipher-cache'
+MAX_BYTES = 1024 * 1024 * 1024
+BLOCK_SIZE = 1024 * 1024
+# linux/fs.h の FICLONE. fcntl に定義されているのは Python 3.12 から
+FICLONE = getattr(fcntl, 'FICLONE', 0x40049409)
+
+def getFileHash(filename):
+    digest = hashlib.sha256()
+    buffer = bytearray(BLOCK_SIZE)
+    view = memoryview(buffer)
+    fileObj = open(filename, 'rb')
+    while True:
+        size = fileObj.readinto(buffer)
+        if size == 0:
+            break
+        digest.update(view[:size])
+    fileObj.close()
+    return digest.hexdigest()
+
+def getCacheKey(inputHash, cipher, key, mode, **options):
+    # options には出力を変える設定（バイト列として扱うかなど）を入れる
+    fields = {'version': VERSION, 'input': inputHash, 'cipher': cipher, 'key': key, 'mode': mode, 'options': options}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+def cloneFile(sourceFileObj, outputFileObj):
+    # reflink できれば True. 対応していないファイルシステムや、別のファイルシステムどうしなら False
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        fcntl.ioctl(outputFileObj.fileno(), FICLONE, sourceFileObj.fileno())
+    except OSError:
+        return False
+    return True
+
+def copyAtomically(sourceFilename, outputFilename, reflink=True):
+    # 出力先と同じ場所の一時ファイルに reflink かコピーで作り、出力先を置き換える
+    sourceFileObj = open(sourceFilename, 'rb')
+    try:
+        with fileUtil.openAtomically(outputFilename, 'wb') as outputFileObj:
+            if not (reflink and cloneFile(sourceFileObj, outputFileObj)):
+                shutil.copyfileobj(sourceFileObj, outputFileObj, BLOCK_SIZE)
+    finally:
+        sourceFileObj.close()
+
+class ResultCache:
+    def __init__(self, directory=None, maxBytes=MAX_BYTES, reflink=True):
+        # reflink=False にすると、対応しているファイルシステムでもいつもコピーする
+        if directory is None:
+            directory = os.environ.get('CIPHER_CACHE_DIR', CACHE_DIR)
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.reflink = reflink
+        os.makedirs(directory, exist_ok=True)
+
+    def getPaths(self, cacheKey):
+        return os.path.join(self.directory, cacheKey), os.path.join(self.directory, cacheKey + '.json')
+
+    def lookup(self, cacheKey, outputFilename):
+        # 見つかって中身も正しければ outputFilename に置いて True を返す. 壊れていた項目は消す
+        dataFilename, metaFilename = self.getPaths(cacheKey)
+        if not os.path.exists(dataFilename) or not os.path.exists(metaFilename):
+            return False
+
+        try:
+            fileObj = open(metaFilename)
+            meta = json.load(fileObj)
+            fileObj.close()
+        except ValueError:
+            self.remove(cacheKey)
+            return False
+
+        if os.path.getsize(dataFilename) != meta['size'] or getFileHash(dataFilename) != meta['outputHash']:
+            self.remove(cacheKey)
+            return False
+
+        os.utime(metaFilename)
+        copyAtomically(dataFilename, outputFilename, self.reflink)
+        return True
+
+    def store(self, cacheKey, outputFilename):
+        # 出力ファイルを複製して保存する. 出力先はあとで書き換えられるかもしれないので、ハードリンクではなく reflink かコピーにする
+        dataFilename, metaFilename = self.getPaths(cacheKey)
+        copyAtomically(outputFilename, dataFilename, self.reflink)
+        meta = {'outputHash': getFileHash(dataFilename), 'size': os.path.getsize(dataFilename)}
+        fileUtil.writeAtomically(metaFilename, json.dumps(meta))
+        self.evict()
+
+    def remove(self, cacheKey):
+        for filename in self.getPaths(cacheKey):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def evict(self):
+        # 最後に使った時刻はメタデータのファイルの更新時刻で表す
+        entries = []
+        total = 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            cacheKey = filename[:-len('.json')]
+            dataFilename, metaFilename = self.getPaths(cacheKey)
+            if not os.path.exists(dataFilename):
+                continue
+            size = os.path.getsize(dataFilename)
+            entries.append((os.path.getmtime(metaFilename), cacheKey, size))
+            total += size
+
+        entries.sort()
+        for usedTime, cacheKey, size in entries:
+            if total <= self.maxBytes:
+                break
+            self.remove(cacheKey)
+            total -= size
@@ -1,33 +1,80 @@
 import pyperclip
-import math
+import cipherMetrics
+import transpositionEncrypt
 
 def main():
     message = "Cenoonommctmme oo snnio s s c"
     key = 8
+    collector = cipherMetrics.collectFromEnvironment()
 
     ciphertext = decryptMessage(key, message)
     print(ciphertext + '|')
 
-    pyperclip.copy(ciphertext)
+    with cipherMetrics.stage('clipboard', chars=len(ciphertext)):
+        pyperclip.copy(ciphertext)
 
-def decryptMessage(key, message):
-    numOfColumns = int(math.ceil(len(message) / float(key)))
-    numOfRows = key
-    numOfShadedBoxes = (numOfColumns * numOfRows) - len(message)
-    plaintext = [''] * numOfColumns
+    if collector:
+        collector.export()
 
-    column = 0
-    row = 0
+def decryptMessage(key, message, columnOrder=None):
+    if not isinstance(message, str):
+        return decryptBytes(key, message, columnOrder)
 
-    for symbol in message:
-        plaintext[column] += symbol
-        column += 1
+    plaintext = [''] * len(message)
+
+    # 暗号文の各列をまとめて平文の位置へ書き戻す
+    for column, start, stop in transpositionEncrypt.getEncryptPlan(key, len(message), columnOrder):
+        plaintext[column::key] = message[start:stop]
 
-        if column == numOfColumns or column == numOfColumns - 1 and row >= numOfRows - numOfShadedBoxes:
-            column = 0
-            row += 1
-        
     return ''.join(plaintext)
 
+def decryptBytes(key, data, columnOrder=None, output=None):
+    # bytes / bytearray / memoryview をデコードせずに復号する.
+    # output を渡すと新しいバッファを作らずにそこへ書き込む
+    # bytes と bytearray は自分のスライスの方が memoryview の飛び飛びのコピーより速い
+    if not isinstance(data, (bytes, bytearray)):
+        data = memoryview(data).cast('B')
+    if output is None:
+        output = bytearray(len(data))
+    if isinstance(output, bytearray):
+        target = output
+    else:
+        target = memoryview(output).cast('B')
+
+    for column, start, stop in transpositionEncrypt.getEncryptPlan(key, len(data), columnOrder):
+        target[column::key] = data[start:stop]
+
+    return output
+
+def decryptInPlace(key, buffer, columnOrder=None, scratchSize=0):
+    # encryptInPlace の逆. 巡回をたどりながら、各位置へ暗号文の対応する文字を引き寄せる（遅さは encryptInPlace と同じ）.
+    # scratchSize 以下のバッファだけは decryptBytes の結果を書き戻す
+    buffer = memoryview(buffer).cast('B')
+    if buffer.readonly:
+        raise TypeError('buffer must be writable')
+
+    length = len(buffer)
+    if length <= scratchSize:
+        buffer[:] = decryptBytes(key, buffer, columnOrder)
+        return
+
+    starts = transpositionEncrypt.getColumnStarts(key, length, columnOrder)
+    done = bytearray((length + 7) // 8)
+
+    for first in range(length):
+        if done[first >> 3] & (1 << (first & 7)):
+            continue
+
+        saved = buffer[first]
+        current = first
+        while True:
+            done[current >> 3] |= 1 << (current & 7)
+            source = starts[current % key] + current // key
+            if source == first:
+                buffer[current] = saved
+                break
+            buffer[current] = buffer[source]
+            current = source
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,25 +1,105 @@
 import pyperclip
+import cipherMetrics
+import functools
+
 def main():
     message = "Common sence is not so common"
     key = 8
+    collector = cipherMetrics.collectFromEnvironment()
 
     ciphertext = encryptMessage(key, message)
     print(ciphertext + '|')
 
-    pyperclip.copy(ciphertext)
+    with cipherMetrics.stage('clipboard', chars=len(ciphertext)):
+        pyperclip.copy(ciphertext)
+
+    if collector:
+        collector.export()
+
+@functools.lru_cache(maxsize=128)
+def getEncryptPlan(key, length, columnOrder=None):
+    # 暗号文の各区間 [start, stop) が平文のどの列 message[column::key] に対応するか
+    # columnOrder を渡すと、その順番で列を読み出す（キーワード式）
+    if columnOrder is None:
+        columnOrder = range(key)
+
+    plan = []
+    start = 0
+    for column in columnOrder:
+        stop = start + len(range(column, length, key))
+        plan.append((column, start, stop))
+        start = stop
 
-def encryptMessage(key, message):
-    ciphertext = [''] * key
+    return tuple(plan)
 
-    for columun in range(key):
-        currentIndex = columun
+def encryptMessage(key, message, columnOrder=None):
+    if not isinstance(message, str):
+        return encryptBytes(key, message, columnOrder)
 
-        while currentIndex < len(message):
-            ciphertext[columun] += message[currentIndex]
+    ciphertext = []
 
-            currentIndex += key
+    for column, start, stop in getEncryptPlan(key, len(message), columnOrder):
+        ciphertext.append(message[column::key])
 
     return ''.join(ciphertext)
 
+def encryptBytes(key, data, columnOrder=None, output=None):
+    # bytes / bytearray / memoryview をデコードせずに暗号化する.
+    # output を渡すと新しいバッファを作らずにそこへ書き込む
+    # bytes と bytearray は自分のスライスの方が memoryview の飛び飛びのコピーより速い
+    if not isinstance(data, (bytes, bytearray)):
+        data = memoryview(data).cast('B')
+    if output is None:
+        output = bytearray(len(data))
+    if isinstance(output, bytearray):
+        target = output
+    else:
+        target = memoryview(output).cast('B')
+
+    for column, start, stop in getEncryptPlan(key, len(data), columnOrder):
+        target[start:stop] = data[column::key]
+
+    return output
+
+def getColumnStarts(key, length, columnOrder=None):
+    # 列 column が暗号文のどこから始まるか
+    starts = [0] * key
+    for column, start, stop in getEncryptPlan(key, length, columnOrder):
+        starts[column] = start
+    return starts
+
+def encryptInPlace(key, buffer, columnOrder=None, scratchSize=0):
+    # bytearray や書き込み可能な memoryview（mmap を含む）をその場で暗号化する.
+    # 置換を巡回ごとにたどって要素を送り出すので、出力用の二つ目のバッファは作らない.
+    # 追加で使うのは処理済みの印（1バイトにつき1ビット）だけだが、1バイトずつ Python で動かすので
+    # encryptBytes の数百倍遅い（1GB で数分かかる）.
+    # scratchSize を渡すと、その大きさ以下のバッファだけは encryptBytes で一時的なバッファに暗号化してから書き戻す
+    # （速いが、その間はメモリを倍使う）. 既定の 0 では一時的なバッファを作らない.
+    buffer = memoryview(buffer).cast('B')
+    if buffer.readonly:
+        raise TypeError('buffer must be writable')
+
+    length = len(buffer)
+    if length <= scratchSize:
+        buffer[:] = encryptBytes(key, buffer, columnOrder)
+        return
+
+    starts = getColumnStarts(key, length, columnOrder)
+    done = bytearray((length + 7) // 8)
+
+    for first in range(length):
+        if done[first >> 3] & (1 << (first & 7)):
+            continue
+
+        carry = buffer[first]
+        current = first
+        while True:
+            done[current >> 3] |= 1 << (current & 7)
+            target = starts[current % key] + current // key
+            carry, buffer[target] = buffer[target], carry
+            current = target
+            if current == first:
+                break
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,44 +1,228 @@
-import time, os, sys, transpositionEncrypt, transpositionDecrypt
+import io, os, sys, transpositionEncrypt, transpositionDecrypt, overlappedFileCipher, cipherMetrics, fileUtil, resultCache, cipherIntegrity, compressionStage, appendCipher
 
 def main():
     inputFilename = "frankenstein.txt"
     outputFilename = "frankenstein.encrypted.txt"
     myKey = 10
     myMode = "encrypt"
+    # True にするとテキストとしてデコードせず、バイト列のまま暗号化・復号する
+    myBinary = False
+    # True にすると読み込み・変換・書き込みを別スレッドで重ねて行う（バイト列として扱う）
+    myOverlapped = False
+    # True にすると同じ入力・鍵・モードの結果を resultCache から取り出し、無ければ計算して保存する
+    myCache = False
+    # True にすると暗号化のときに平文のハッシュをサイドカーに残して往復を確かめ、復号のときにそれと照らし合わせる
+    myVerify = False
+    # 'zlib' / 'lzma' / 'bz2' にすると暗号化の前に圧縮し、復号の後で展開する（バイト列として扱う）.
+    # 復号のときは暗号文のヘッダーから方式を読むので、圧縮したかどうかに関わらず None でよい
+    myCompression = None
+    myCompressionLevel = None
+    # True にすると前回から増えた分だけを独立したブロックとして暗号化し、暗号文の後ろに足す（appendCipher）.
+    # 復号のときはブロックのヘッダーがあれば自動でこちらを使う
+    myIncremental = False
 
     if not os.path.exists(inputFilename):
         print("The file %s dose not exist. Quitting..." % (inputFilename))
 
         sys.exit()
 
-    if os.path.exists(outputFilename):
+    # 前回の続きに足せる（状態ファイルがあり、暗号文もそれと合っている）ときだけ確かめずに進む
+    resume = myIncremental and myMode == "encrypt" and appendCipher.canResume(outputFilename, 'transposition', myKey)
+    if os.path.exists(outputFilename) and not resume:
         print("This will overwrite the file %s. (C)ontinue or (Q)uit?" % (outputFilename))
 
         response = input("> ")
         if not response.lower().startswith('c'):
             sys.exit()
 
-    fileObj = open(inputFilename)
-    content = fileObj.read()
-    fileObj.close()
+    collector = cipherMetrics.collectFromEnvironment()
 
     print("%sing..." % (myMode.title()))
 
-    startTime = time.time()
-    if myMode == "encrypt":
-        translated = transpositionEncrypt.encryptMessage(myKey, content)
-    elif myMode == "decrypt":
-        translated = transpositionDecrypt.decryptMessage(myKey, content)
-    
-    totalTime = round(time.time() - startTime, 2)
-    print("%sion time: %s seconds" % (myMode.title(), totalTime))
+    if myIncremental or (myMode == "decrypt" and appendCipher.hasHeader(inputFilename)):
+        with cipherMetrics.stage('transform', bytes=os.path.getsize(inputFilename)) as record:
+            if myMode == "encrypt":
+                added = appendCipher.appendFile(inputFilename, outputFilename, 'transposition', myKey, restart=not resume)
+            elif myMode == "decrypt":
+                blocks = appendCipher.decryptFile(inputFilename, outputFilename, 'transposition', myKey)
+        print("%sion time: %s seconds" % (myMode.title(), round(record['wallTime'], 2)))
+        if myMode == "encrypt":
+            print("Done sealing %s new bytes of %s." % (added, inputFilename))
+        elif myMode == "decrypt":
+            print("Done decrypting %s blocks of %s." % (blocks, inputFilename))
+        print("%sed file is %s." % (myMode.title(), outputFilename))
+        if collector:
+            collector.export()
+        return
+
+    # サイドカーはキャッシュに入れないので、検証するときはキャッシュを使わない
+    myCache = myCache and not myVerify
+
+    if myCache:
+        cache = resultCache.ResultCache()
+        with cipherMetrics.stage('hash', bytes=os.path.getsize(inputFilename)):
+            cacheKey = resultCache.getCacheKey(resultCache.getFileHash(inputFilename), 'transposition', myKey, myMode, binary=myBinary or myOverlapped, compression=myCompression, compressionLevel=myCompressionLevel, incremental=myIncremental)
+        with cipherMetrics.stage('cache lookup') as record:
+            hit = cache.lookup(cacheKey, outputFilename)
+        if hit:
+            print("Found %sed %s in the cache. (%s seconds)" % (myMode, inputFilename, round(record['wallTime'], 2)))
+            print("%sed file is %s." % (myMode.title(), outputFilename))
+            if collector:
+                collector.export()
+            return
+
+    if myCompression or (myMode == "decrypt" and isCompressed(inputFilename)):
+        transpositionCompressedFile(inputFilename, outputFilename, myKey, myMode, myCompression, myCompressionLevel, myVerify)
+        if myCache:
+            with cipherMetrics.stage('cache store', bytes=os.path.getsize(outputFilename)):
+                cache.store(cacheKey, outputFilename)
+        if collector:
+            collector.export()
+        return
+
+    if myOverlapped:
+        with cipherMetrics.stage('transform', bytes=os.path.getsize(inputFilename)) as record:
+            overlappedFileCipher.transpositionFile(inputFilename, outputFilename, myKey, myMode)
+        print("%sion time: %s seconds" % (myMode.title(), round(record['wallTime'], 2)))
+        print("Done %sing %s (%s bytes.)" % (myMode, inputFilename, record['bytes']))
+        print("%sed file is %s." % (myMode.title(), outputFilename))
+        if myVerify:
+            verifyFiles(inputFilename, outputFilename, myMode, lambda data: cipherIntegrity.hashDecryption(myKey, data))
+        if myCache:
+            with cipherMetrics.stage('cache store', bytes=record['bytes']):
+                cache.store(cacheKey, outputFilename)
+        if collector:
+            collector.export()
+        return
+
+    with cipherMetrics.stage('read', bytes=os.path.getsize(inputFilename)) as record:
+        data = bytearray(record['bytes'])
+        fileObj = open(inputFilename, 'rb')
+        fileObj.readinto(data)
+        fileObj.close()
+
+    if myBinary:
+        content = data
+    else:
+        # open() のテキストモードと同じ文字コードと改行の変換でデコードする
+        with cipherMetrics.stage('decode', bytes=len(data)) as record:
+            content = io.TextIOWrapper(io.BytesIO(data)).read()
+            record['chars'] = len(content)
+
+    with cipherMetrics.stage('transform', bytes=len(data), chars=len(content)) as record:
+        if myMode == "encrypt":
+            translated = transpositionEncrypt.encryptMessage(myKey, content)
+        elif myMode == "decrypt":
+            translated = transpositionDecrypt.decryptMessage(myKey, content)
+    print("%sion time: %s seconds" % (myMode.title(), round(record['wallTime'], 2)))
+
+    if myVerify:
+        # 確かめられなかったときは出力を書かずに終わる
+        plaintextHash = verifyContent(inputFilename, content, translated, myKey, myMode)
+
+    if not myBinary:
+        with cipherMetrics.stage('encode', chars=len(translated)) as record:
+            buffer = io.BytesIO()
+            textObj = io.TextIOWrapper(buffer)
+            textObj.write(translated)
+            textObj.flush()
+            translated = buffer.getvalue()
+            record['bytes'] = len(translated)
 
-    outputFileObj = open(outputFilename, 'w')
-    outputFileObj.write(translated)
-    outputFileObj.close()
+    with cipherMetrics.stage('write', bytes=len(translated)):
+        fileUtil.writeAtomically(outputFilename, translated)
+
+    if myVerify and myMode == "encrypt":
+        cipherIntegrity.writeSidecar(outputFilename, plaintextHash, len(content))
 
     print("Done %sing %s (%s characters.)" %(myMode, inputFilename, len(content)))
     print("%sed file is %s." % (myMode.title(), outputFilename))
 
+    if myCache:
+        with cipherMetrics.stage('cache store', bytes=len(translated)):
+            cache.store(cacheKey, outputFilename)
+
+    if collector:
+        collector.export()
+
+def verifyContent(inputFilename, content, translated, key, mode):
+    # 暗号化では暗号文から平文を少しずつ組み立ててハッシュを取り、元の平文のハッシュと比べる.
+    # 復号では入力のサイドカーに残っているハッシュと比べる. 平文のハッシュを返す
+    with cipherMetrics.stage('verify', chars=len(content)) as record:
+        if mode == "encrypt":
+            plaintextHash = cipherIntegrity.hashPlaintext(content)
+            if cipherIntegrity.hashDecryption(key, translated) != plaintextHash:
+                print("Round-trip check failed: the ciphertext does not decrypt to %s. Nothing was written." % (inputFilename))
+                sys.exit(1)
+        elif mode == "decrypt":
+            plaintextHash = cipherIntegrity.hashPlaintext(translated)
+            sidecar = cipherIntegrity.readSidecar(inputFilename)
+            if sidecar is None:
+                print("There is no sidecar %s, so the plaintext cannot be checked." % (cipherIntegrity.getSidecarFilename(inputFilename)))
+                return plaintextHash
+            if plaintextHash != sidecar['plaintextHash'] or len(translated) != sidecar['length']:
+                print("Integrity check failed: %s does not decrypt to the recorded plaintext. Nothing was written." % (inputFilename))
+                sys.exit(1)
+    print("Integrity check passed. (%s seconds)" % (round(record['wallTime'], 2)))
+    return plaintextHash
+
+def verifyFiles(inputFilename, outputFilename, mode, hashDecryption):
+    # 重ねて処理したときや圧縮したときはバイト列として扱うので、ファイルの中身そのものを比べる.
+    # hashDecryption は暗号文のファイルの中身から平文のハッシュを求める関数
+    with cipherMetrics.stage('verify', bytes=os.path.getsize(inputFilename)) as record:
+        if mode == "encrypt":
+            plaintextHash = cipherIntegrity.hashFile(inputFilename)
+            fileObj = open(outputFilename, 'rb')
+            ciphertext = fileObj.read()
+            fileObj.close()
+            if hashDecryption(ciphertext) != plaintextHash:
+                os.remove(outputFilename)
+                print("Round-trip check failed: the ciphertext does not decrypt to %s. Removed %s." % (inputFilename, outputFilename))
+                sys.exit(1)
+            # length はいつも平文の長さ（バイト列として扱うのでバイト数）. 圧縮した暗号文の大きさではない
+            cipherIntegrity.writeSidecar(outputFilename, plaintextHash, os.path.getsize(inputFilename))
+        elif mode == "decrypt":
+            sidecar = cipherIntegrity.readSidecar(inputFilename)
+            if sidecar is None:
+                print("There is no sidecar %s, so the plaintext cannot be checked." % (cipherIntegrity.getSidecarFilename(inputFilename)))
+                return
+            if cipherIntegrity.hashFile(outputFilename) != sidecar['plaintextHash']:
+                os.remove(outputFilename)
+                print("Integrity check failed: %s does not decrypt to the recorded plaintext. Removed %s." % (inputFilename, outputFilename))
+                sys.exit(1)
+    print("Integrity check passed. (%s seconds)" % (round(record['wallTime'], 2)))
+
+def isCompressed(filename):
+    fileObj = open(filename, 'rb')
+    header = fileObj.read(len(compressionStage.MAGIC) + 1)
+    fileObj.close()
+    return compressionStage.hasHeader(header)
+
+def transpositionCompressedFile(inputFilename, outputFilename, key, mode, compression, compressionLevel, verify):
+    # 圧縮は入力を、復号と展開は出力を少しずつ流すので、メモリに全部載るのは圧縮した大きさの暗号文だけ
+    inputSize = os.path.getsize(inputFilename)
+    inputFileObj = open(inputFilename, 'rb')
+    outputSize = 0
+    with cipherMetrics.stage('transform', bytes=inputSize) as record:
+        if mode == "encrypt":
+            header, body, compressRecord = compressionStage.encryptChunks(compressionStage.readChunks(inputFileObj), lambda compressed: transpositionEncrypt.encryptMessage(key, compressed), compression, compressionLevel)
+            chunks = [header, body]
+        elif mode == "decrypt":
+            chunks = compressionStage.iterDecrypted(inputFileObj.read(), lambda body: cipherIntegrity.iterDecryptedChunks(key, body))
+        with fileUtil.openAtomically(outputFilename, 'wb') as outputFileObj:
+            for chunk in chunks:
+                outputFileObj.write(chunk)
+                outputSize += len(chunk)
+    inputFileObj.close()
+    print("%sion time: %s seconds" % (mode.title(), round(record['wallTime'], 2)))
+    if mode == "encrypt":
+        compressionStage.printStats(compressRecord)
+
+    print("Done %sing %s (%s bytes to %s bytes.)" % (mode, inputFilename, inputSize, outputSize))
+    print("%sed file is %s." % (mode.title(), outputFilename))
+
+    if verify:
+        verifyFiles(inputFilename, outputFilename, mode, lambda ciphertext: compressionStage.hashDecrypted(ciphertext, lambda body: cipherIntegrity.iterDecryptedChunks(key, body)))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,144 @@
+import random, sys
+import transpositionEncrypt, transpositionDecrypt, cipherPipeline
+
+# スライスで列ごとに写す encryptMessage / decryptMessage が、
+# 元の1文字ずつたどる実装（6章）と同じ結果になり、往復して元に戻ることを確かめる.
+#   python transpositionTest.py
+#   python -m pytest transpositionTest.py
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz .,!?'
+# 空の文字列や1文字、鍵の倍数の前後など、列の長さがそろわなくなる境目の長さ
+EDGE_LENGTHS = [0, 1, 2, 3, 7, 8, 9, 15, 16, 17, 29, 64, 65]
+
+def main():
+    random.seed(42)
+    for test in [testEncryptMatchesLoop, testDecryptMatchesLoop, testRoundTrip, testBytesMatchesText, testPipelineRoundTrip, testDoubleTranspositionIsOnePass, testComposedStagesMatchSequence, testInPlaceMatchesBytes]:
+        test()
+        print('%s passed.' % (test.__name__))
+    print('Transposition cipher test passed.')
+
+def loopEncryptMessage(key, message):
+    ciphertext = [''] * key
+
+    for columun in range(key):
+        currentIndex = columun
+
+        while currentIndex < len(message):
+            ciphertext[columun] += message[currentIndex]
+
+            currentIndex += key
+
+    return ''.join(ciphertext)
+
+def loopDecryptMessage(key, message):
+    numOfColumns = -(-len(message) // key)
+    numOfRows = key
+    numOfShadedBoxes = (numOfColumns * numOfRows) - len(message)
+    plaintext = [''] * numOfColumns
+
+    column = 0
+    row = 0
+
+    for symbol in message:
+        plaintext[column] += symbol
+        column += 1
+
+        if column == numOfColumns or column == numOfColumns - 1 and row >= numOfRows - numOfShadedBoxes:
+            column = 0
+            row += 1
+
+    return ''.join(plaintext)
+
+def getMessages():
+    # 境目の長さと、乱数で選んだ長さの文字列
+    messages = []
+    for length in EDGE_LENGTHS:
+        messages.append(''.join(random.choice(LETTERS) for i in range(length)))
+    for i in range(20):
+        messages.append(''.join(random.choice(LETTERS) for i in range(random.randint(4, 80))))
+    return messages
+
+def getKeys(message):
+    return range(1, max(len(message), 1) + 1)
+
+def testEncryptMatchesLoop():
+    for message in getMessages():
+        for key in getKeys(message):
+            assert transpositionEncrypt.encryptMessage(key, message) == loopEncryptMessage(key, message), (key, message)
+
+def testDecryptMatchesLoop():
+    for message in getMessages():
+        for key in getKeys(message):
+            ciphertext = loopEncryptMessage(key, message)
+            assert transpositionDecrypt.decryptMessage(key, ciphertext) == loopDecryptMessage(key, ciphertext), (key, message)
+
+def testRoundTrip():
+    for message in getMessages():
+        for key in getKeys(message):
+            ciphertext = transpositionEncrypt.encryptMessage(key, message)
+            assert transpositionDecrypt.decryptMessage(key, ciphertext) == message, (key, message)
+
+def testBytesMatchesText():
+    for message in getMessages():
+        data = message.encode('ascii')
+        for key in getKeys(message):
+            ciphertext = transpositionEncrypt.encryptMessage(key, data)
+            assert ciphertext.decode('ascii') == transpositionEncrypt.encryptMessage(key, message), (key, message)
+            assert transpositionDecrypt.decryptMessage(key, ciphertext) == data, (key, message)
+
+def testPipelineRoundTrip():
+    stages = [('caesar', 3, 'encrypt'), ('transposition', 8, 'encrypt'), ('transposition', 5, 'encrypt')]
+    for message in getMessages():
+        ciphertext = cipherPipeline.runPipeline(stages, message)
+        expected = message
+        for kind, key, mode in stages:
+            if kind == 'caesar':
+                expected = cipherPipeline.caesarCipher.translateMessage(key, expected, mode)
+            else:
+                expected = loopEncryptMessage(key, expected)
+        assert ciphertext == expected, message
+        assert cipherPipeline.runPipeline(cipherPipeline.reversePipeline(stages), ciphertext) == message, message
+
+def testDoubleTranspositionIsOnePass():
+    # 二つの転置は一つのランの並びにまとまり、順に二回かけたのと同じになる
+    stages = [('transposition', 8, 'encrypt'), ('transposition', 5, 'encrypt')]
+    message = ''.join(random.choice(LETTERS) for i in range(100000))
+    plans = cipherPipeline.getTranspositionPlans(((8, 'encrypt'), (5, 'encrypt')), len(message))
+    assert len(plans) == 1, len(plans)
+    expected = transpositionEncrypt.encryptMessage(5, transpositionEncrypt.encryptMessage(8, message))
+    assert cipherPipeline.runPipeline(stages, message) == expected
+
+def testComposedStagesMatchSequence():
+    # 暗号化と復号を混ぜた転置の並び（鍵が長さより大きいものも含む）を、一段ずつかけたものと比べる
+    for message in getMessages():
+        for i in range(10):
+            stages = []
+            for j in range(random.randint(1, 4)):
+                stages.append(('transposition', random.randint(1, len(message) + 2), random.choice(['encrypt', 'decrypt'])))
+            expected = message
+            for kind, key, mode in stages:
+                if mode == 'encrypt':
+                    expected = loopEncryptMessage(key, expected)
+                else:
+                    expected = loopDecryptMessage(key, expected)
+            assert cipherPipeline.runPipeline(stages, message) == expected, (stages, message)
+            assert bytes(cipherPipeline.runPipeline(stages, message.encode('ascii'))) == expected.encode('ascii'), (stages, message)
+
+def testInPlaceMatchesBytes():
+    # 既定では巡回をたどり、scratchSize を渡したときだけ一時的なバッファを使う. どちらも encryptBytes と同じ結果になる
+    for message in getMessages():
+        data = message.encode('ascii')
+        for key in getKeys(message):
+            for scratchSize in [0, len(data)]:
+                buffer = bytearray(data)
+                transpositionEncrypt.encryptInPlace(key, buffer, scratchSize=scratchSize)
+                assert buffer == transpositionEncrypt.encryptBytes(key, data), (key, message, scratchSize)
+                transpositionDecrypt.decryptInPlace(key, buffer, scratchSize=scratchSize)
+                assert buffer == data, (key, message, scratchSize)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except AssertionError as error:
+        print('Transposition cipher test FAILED: %s' % (error,))
+        sys.exit(1)
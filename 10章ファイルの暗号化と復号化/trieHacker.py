@@ -0,0 +1,96 @@
+import sys, time
+import englishTrie, englishPrefilter, transpositionDecrypt
+
+# 転置式暗号の鍵を総当たりするとき、鍵ごとに平文を先頭から1文字ずつだけ復号し、
+# 単語を辞書のトライでたどる. 辞書の単語の頭にもならない単語が続いたら、その鍵はそこで諦める.
+# 最後まで残った鍵だけを全文復号し、englishPrefilter のふるいを通ったものを detectEnglish.isEnglish で確かめる.
+
+UPPERLETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+SEPARATORS = ' \t\n'
+WORDS_NEEDED = 20
+MAX_MISSES = 3
+
+# 文字からトライの辺の文字（大文字1文字の bytes）への表
+LETTER_BYTES = {}
+for letter in UPPERLETTERS:
+    LETTER_BYTES[letter] = letter.encode('ascii')
+    LETTER_BYTES[letter.lower()] = letter.encode('ascii')
+
+def main():
+    inputFilename = "frankenstein.encrypted.txt"
+
+    fileObj = open(inputFilename)
+    message = fileObj.read()
+    fileObj.close()
+
+    startTime = time.time()
+    results = hackTransposition(message)
+    totalTime = round(time.time() - startTime, 2)
+
+    if results == []:
+        print("Failed to hack encryption. (%s seconds)" % (totalTime))
+        sys.exit()
+    for key, plaintext in results:
+        print("Key %s (%s seconds): %s" % (key, totalTime, plaintext[:100]))
+
+def checkKey(trie, message, key, wordsNeeded=WORDS_NEEDED, maxMisses=MAX_MISSES):
+    # 鍵 key で復号した平文の先頭の単語を順に調べる.
+    # 辞書に無い単語（頭の数文字で行き詰まったものを含む）は半分まで、それとは別に maxMisses 個まで許す.
+    # 返り値は (見込みがあるか, 復号した文字数)
+    length = len(message)
+    rows, longColumns = divmod(length, key)
+    node = englishTrie.ROOT
+    inWord = False
+    words = 0
+    misses = 0
+
+    for index in range(length):
+        # 平文の index 番目の文字の暗号文での位置（cribHacker.matchesCrib と同じ計算）
+        column = index % key
+        symbol = message[column * rows + min(column, longColumns) + index // key]
+
+        if symbol in LETTER_BYTES:
+            if node != englishTrie.MISSING:
+                node = trie.getChild(node, LETTER_BYTES[symbol])
+                if node == englishTrie.MISSING:
+                    # 単語の途中でトライから外れた時点で、この単語は外れと分かる
+                    misses += 1
+                    if misses > maxMisses + words // 2:
+                        return False, index + 1
+            inWord = True
+        elif symbol in SEPARATORS:
+            if inWord:
+                words += 1
+                if node != englishTrie.MISSING and not trie.isWord(node):
+                    misses += 1
+                if misses > maxMisses + words // 2:
+                    return False, index + 1
+                if words >= wordsNeeded:
+                    return True, index + 1
+            node = englishTrie.ROOT
+            inWord = False
+
+    # 平文が短く、wordsNeeded 個の単語に届かなかったとき
+    return words > 0 and misses <= maxMisses + words // 2, length
+
+def hackTransposition(message, maxKey=None, trie=None, cascade=None):
+    # 見込みのある鍵を全文復号し、isEnglish でも英語と判定された (鍵, 平文) の一覧を返す
+    if trie is None:
+        trie = englishTrie.loadTrie()
+    if cascade is None:
+        cascade = englishPrefilter.Cascade(cipher='transposition')
+    if maxKey is None:
+        maxKey = len(message)
+
+    results = []
+    for key in range(1, maxKey + 1):
+        promising, charsRead = checkKey(trie, message, key)
+        if not promising:
+            continue
+        plaintext = transpositionDecrypt.decryptMessage(key, message)
+        if cascade.check(plaintext):
+            results.append((key, plaintext))
+    return results
+
+if __name__ == '__main__':
+    main()
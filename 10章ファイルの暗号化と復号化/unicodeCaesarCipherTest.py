@@ -0,0 +1,96 @@
+import random, sys
+import unicodeCaesarCipher
+
+# 文字コードの範囲でずらす unicodeCaesarCipher が、どの鍵・アルファベットでも往復して元に戻り、
+# アルファベットの外の文字には触れず、アルファベットの中の文字は同じアルファベットの中に移ることを確かめる.
+# unicodeCaesarCipher.py は 5章シーザー暗号 にあるので、そこも PYTHONPATH に入れて動かす.
+#   python unicodeCaesarCipherTest.py
+#   python -m pytest unicodeCaesarCipherTest.py
+
+ALPHABET_SETS = [unicodeCaesarCipher.DEFAULT_ALPHABETS, ('ascii',), ('latin',), ('mycaesar',), ('hiragana', 'latin'), ('xyz',), ()]
+# 0、負の鍵、アルファベットの長さちょうどとその前後、とても大きな鍵
+KEYS = [0, 1, -1, 3, 26, 51, 52, 53, 86, 94, 95, 10 ** 12, -(10 ** 12) - 7]
+OUTSIDE = '\n\t日本語。😀\udcff' + chr(0x10FFFF)
+
+def main():
+    random.seed(42)
+    for test in [testRoundTrip, testStaysInsideAlphabet, testKeyWrapsAround, testLeavesOtherCharacters, testKnownShifts, testRejectsBadArguments]:
+        test()
+        print('%s passed.' % (test.__name__))
+    print('Unicode Caesar cipher test passed.')
+
+def getSymbols(alphabets):
+    symbols = ''
+    for alphabet in alphabets:
+        symbols += ''.join(chr(code) for code in unicodeCaesarCipher.getCodes(alphabet))
+    return symbols
+
+def getMessage(alphabets, length):
+    # アルファベットの文字と外の文字を混ぜる
+    symbols = getSymbols(alphabets) + OUTSIDE
+    return ''.join(random.choice(symbols) for i in range(length))
+
+def testRoundTrip():
+    for alphabets in ALPHABET_SETS:
+        for length in [0, 1, 2, 100]:
+            message = getMessage(alphabets, length)
+            for key in KEYS:
+                encrypted = unicodeCaesarCipher.translateMessage(key, message, 'encrypt', alphabets)
+                assert len(encrypted) == len(message), (alphabets, key)
+                assert unicodeCaesarCipher.translateMessage(key, encrypted, 'decrypt', alphabets) == message, (alphabets, length, key)
+                # 暗号化を -key で行うのは復号と同じ
+                assert unicodeCaesarCipher.translateMessage(-key, message, 'encrypt', alphabets) == unicodeCaesarCipher.translateMessage(key, message, 'decrypt', alphabets), (alphabets, key)
+
+def testStaysInsideAlphabet():
+    # 各アルファベットの文字は同じアルファベットの文字に一対一で移る
+    for alphabets in ALPHABET_SETS:
+        for key in KEYS:
+            for alphabet in alphabets:
+                symbols = getSymbols([alphabet])
+                encrypted = unicodeCaesarCipher.translateMessage(key, symbols, 'encrypt', alphabets)
+                assert sorted(encrypted) == sorted(symbols), (alphabets, alphabet, key)
+
+def testKeyWrapsAround():
+    # 鍵はアルファベットごとの長さで割った余りだけが効く
+    for alphabets in ALPHABET_SETS:
+        for alphabet in alphabets:
+            symbols = getSymbols([alphabet])
+            for key in KEYS:
+                encrypted = unicodeCaesarCipher.translateMessage(key, symbols, 'encrypt', alphabets)
+                assert unicodeCaesarCipher.translateMessage(key % len(symbols), symbols, 'encrypt', alphabets) == encrypted, (alphabet, key)
+                assert unicodeCaesarCipher.translateMessage(key + len(symbols), symbols, 'encrypt', alphabets) == encrypted, (alphabet, key)
+
+def testLeavesOtherCharacters():
+    for alphabets in ALPHABET_SETS:
+        outside = ''.join(symbol for symbol in OUTSIDE if symbol not in getSymbols(alphabets))
+        for key in KEYS:
+            assert unicodeCaesarCipher.translateMessage(key, outside, 'encrypt', alphabets) == outside, (alphabets, key)
+
+def testKnownShifts():
+    # 範囲をつないだ並びを1つの輪としてずらすので、latin では 'Z' の次は 'a'、'z' の次は 'A'
+    assert unicodeCaesarCipher.translateMessage(1, 'AZaz', 'encrypt', ('latin',)) == 'BabA'
+    assert unicodeCaesarCipher.translateMessage(1, 'ぁゖァヺ！～', 'encrypt') == 'あぁアァ＂！'
+    assert unicodeCaesarCipher.translateMessage(2, 'xyz!', 'encrypt', ('xyz',)) == 'zxy!'
+    assert unicodeCaesarCipher.translateMessage(13, 'Hello', 'encrypt', ('ascii',)) == 'Uryy|'
+
+def testRejectsBadArguments():
+    for alphabets in [('ascii', 'latin'), ('hiragana', 'hiragana'), ('abca',), ('abc', 'cde')]:
+        try:
+            unicodeCaesarCipher.translateMessage(1, 'abc', 'encrypt', alphabets)
+        except ValueError:
+            pass
+        else:
+            assert False, 'overlapping alphabets %s were accepted' % (alphabets,)
+    try:
+        unicodeCaesarCipher.translateMessage(1, 'abc', 'sideways')
+    except ValueError:
+        pass
+    else:
+        assert False, 'an unknown mode was accepted'
+
+if __name__ == '__main__':
+    try:
+        main()
+    except AssertionError as error:
+        print('Unicode Caesar cipher test FAILED: %s' % (error,))
+        sys.exit(1)
@@ -0,0 +1,299 @@
+import argparse, concurrent.futures, ctypes, ctypes.util, json, os, select, signal, struct, sys, time
+import overlappedFileCipher, fileUtil
+
+# 受け取り用のディレクトリを見張り、新しく置かれたファイルや書き換えられたファイルを暗号化（または復号）して
+# 出力用のディレクトリに書く. Linux では inotify で、それ以外ではディレクトリを定期的に調べて変化を知る.
+# 最後の変化から DEBOUNCE 秒たったファイルだけを待ち行列に入れ、WORKERS 個のプロセスで処理する.
+# 待ち行列と処理済みの一覧は状態ファイルに書くので、止めて動かし直しても取りこぼさない.
+# 待ち行列の長さ・処理数・待ち始めてから書き終わるまでの時間を JSON や Prometheus の textfile の形で書き出せる.
+#   python watchDaemon.py inbox outbox --key 10 --state watch.json --metrics-prom watch.prom
+# 名前が '.' で始まるファイル（書きかけの一時ファイルなど）は無視する.
+
+DEBOUNCE = 1.0
+POLL_INTERVAL = 1.0
+WORKERS = 2
+VERSION = 1
+
+# inotify の定数（<sys/inotify.h>）
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+EVENT_HEADER = struct.Struct('iIII')
+
+class PollingWatcher:
+    def __init__(self, directory):
+        self.directory = directory
+        self.snapshot = scanDirectory(directory)
+
+    def wait(self, timeout):
+        # timeout 秒待ってから調べ直し、大きさか更新時刻が変わったファイルの名前を返す
+        time.sleep(timeout)
+        snapshot = scanDirectory(self.directory)
+        changed = set(name for name, stat in snapshot.items() if self.snapshot.get(name) != stat)
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.directory = directory
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, 'inotify_add_watch failed')
+
+    def wait(self, timeout):
+        readable, writable, failed = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        position = 0
+        while position < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, position)
+            position += EVENT_HEADER.size
+            name = data[position:position + length].rstrip(b'\0')
+            position += length
+            if mask & IN_Q_OVERFLOW:
+                # 取りこぼした通知があるので、ディレクトリ全体を調べ直させる
+                changed.update(scanDirectory(self.directory))
+            elif name:
+                changed.add(os.fsdecode(name))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+def getWatcher(directory):
+    try:
+        return InotifyWatcher(directory)
+    except (OSError, AttributeError):
+        return PollingWatcher(directory)
+
+def scanDirectory(directory):
+    # 名前 -> (更新時刻, 大きさ). '.' で始まる名前とファイルでないものは入れない
+    snapshot = {}
+    for entry in os.scandir(directory):
+        if entry.name.startswith('.') or not entry.is_file():
+            continue
+        stat = entry.stat()
+        snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+def getStat(filename):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def startWorker():
+    # 止めるときのシグナルは親のプロセスだけが受け取って後始末をする
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def processFile(inputFilename, outputFilename, cipher, key, mode):
+    # ワーカーのプロセスで動く. 書き込みは一時ファイルへ行い、最後に置き換える
+    if cipher == 'caesar':
+        overlappedFileCipher.caesarFile(inputFilename, outputFilename, key, mode, workers=1)
+    else:
+        overlappedFileCipher.transpositionFile(inputFilename, outputFilename, key, mode)
+    return os.path.getsize(inputFilename)
+
+class WatchDaemon:
+    def __init__(self, inputDirectory, outputDirectory, cipher, key, mode, stateFilename, workers=WORKERS, debounce=DEBOUNCE):
+        self.inputDirectory = inputDirectory
+        self.outputDirectory = outputDirectory
+        self.cipher = cipher
+        self.key = key
+        self.mode = mode
+        self.stateFilename = stateFilename
+        self.workers = workers
+        self.debounce = debounce
+
+        # pending: 名前 -> 待ち行列に入った時刻, done: 名前 -> 処理したときの (更新時刻, 大きさ)
+        self.pending = {}
+        self.done = {}
+        self.lastChange = {}
+        self.running = {}
+        self.metrics = {'jobs': 0, 'failures': 0, 'bytes': 0, 'latencySum': 0.0, 'latencyMax': 0.0}
+        self.loadState()
+
+    def loadState(self):
+        if not os.path.exists(self.stateFilename):
+            return
+        fileObj = open(self.stateFilename)
+        state = json.load(fileObj)
+        fileObj.close()
+        if state.get('version') != VERSION:
+            raise ValueError('%s has an unsupported state version' % (self.stateFilename))
+        self.pending = state['pending']
+        self.done = dict((name, tuple(stat)) for name, stat in state['done'].items())
+        self.metrics.update(state.get('metrics', {}))
+
+    def saveState(self):
+        state = {'version': VERSION, 'pending': self.pending, 'done': self.done, 'metrics': self.metrics}
+        fileUtil.writeAtomically(self.stateFilename, json.dumps(state, indent=1) + '\n')
+
+    def notice(self, names):
+        now = time.time()
+        for name in names:
+            if not name.startswith('.'):
+                self.lastChange[name] = now
+
+    def collectReady(self):
+        # 最後の変化から debounce 秒たち、前に処理したときから変わっているファイルを待ち行列に入れる
+        now = time.time()
+        added = False
+        for name, changeTime in list(self.lastChange.items()):
+            # 待ち行列にある（処理中かもしれない）ものは、終わってから比べ直す
+            if now - changeTime < self.debounce or name in self.pending:
+                continue
+            del self.lastChange[name]
+            stat = getStat(os.path.join(self.inputDirectory, name))
+            if stat is None or self.done.get(name) == stat:
+                continue
+            self.pending[name] = now
+            added = True
+        return added
+
+    def dispatch(self, executor):
+        # 空いているワーカーの分だけ、待ち行列の古いものから渡す
+        for name in sorted(self.pending, key=self.pending.get):
+            if len(self.running) >= self.workers:
+                break
+            if name in [runningName for runningName, stat in self.running.values()]:
+                continue
+            inputFilename = os.path.join(self.inputDirectory, name)
+            outputFilename = os.path.join(self.outputDirectory, name)
+            stat = getStat(inputFilename)
+            if stat is None:
+                del self.pending[name]
+                continue
+            future = executor.submit(processFile, inputFilename, outputFilename, self.cipher, self.key, self.mode)
+            self.running[future] = (name, stat)
+
+    def finish(self, future):
+        name, stat = self.running.pop(future)
+        latency = time.time() - self.pending.pop(name)
+        try:
+            size = future.result()
+        except Exception as error:
+            print("Failed to %s %s: %s" % (self.mode, name, error))
+            self.metrics['failures'] += 1
+            return
+        # 処理中に書き換えられていれば、前の状態で記録しておき、次の変化の通知でもう一度処理する
+        self.done[name] = stat
+        self.metrics['jobs'] += 1
+        self.metrics['bytes'] += size
+        self.metrics['latencySum'] += latency
+        self.metrics['latencyMax'] = max(self.metrics['latencyMax'], latency)
+        print("%sed %s (%s bytes, %s seconds after it was queued)." % (self.mode.title(), name, size, round(latency, 2)))
+
+    def getMetrics(self):
+        metrics = dict(self.metrics)
+        metrics['queueDepth'] = len(self.pending)
+        metrics['running'] = len(self.running)
+        return metrics
+
+    def toPrometheus(self):
+        metrics = self.getMetrics()
+        rows = [
+            ('cipher_watch_queue_depth', 'gauge', metrics['queueDepth'], 'Files waiting to be processed, including running ones.'),
+            ('cipher_watch_running', 'gauge', metrics['running'], 'Files being processed right now.'),
+            ('cipher_watch_jobs_total', 'counter', metrics['jobs'], 'Files processed successfully.'),
+            ('cipher_watch_failures_total', 'counter', metrics['failures'], 'Files that failed to process.'),
+            ('cipher_watch_bytes_total', 'counter', metrics['bytes'], 'Input bytes processed.'),
+            ('cipher_watch_latency_seconds_sum', 'counter', metrics['latencySum'], 'Seconds from queueing to finishing, summed over files.'),
+            ('cipher_watch_latency_seconds_max', 'gauge', metrics['latencyMax'], 'Longest time from queueing to finishing.'),
+        ]
+        lines = []
+        for metric, kind, value, help in rows:
+            lines.append('# HELP %s %s' % (metric, help))
+            lines.append('# TYPE %s %s' % (metric, kind))
+            lines.append('%s %s' % (metric, value))
+        return '\n'.join(lines) + '\n'
+
+    def exportMetrics(self, jsonFilename=None, prometheusFilename=None):
+        if jsonFilename:
+            fileUtil.writeAtomically(jsonFilename, json.dumps(dict(self.getMetrics(), timestamp=time.time()), indent=2))
+        if prometheusFilename:
+            fileUtil.writeAtomically(prometheusFilename, self.toPrometheus())
+
+    def run(self, jsonFilename=None, prometheusFilename=None, interval=POLL_INTERVAL, stopWhenIdle=False):
+        # 止めていた間に置かれたファイルも拾えるよう、最初にディレクトリ全体を調べる
+        os.makedirs(self.outputDirectory, exist_ok=True)
+        watcher = getWatcher(self.inputDirectory)
+        executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=startWorker)
+        self.notice(scanDirectory(self.inputDirectory))
+        self.lastChange = dict((name, 0.0) for name in self.lastChange)
+        print("Watching %s with %s..." % (self.inputDirectory, type(watcher).__name__))
+        try:
+            while True:
+                # 落ち着くのを待っているファイルや処理中のファイルがあるときは、こまめに様子を見る
+                timeout = interval
+                if self.lastChange:
+                    timeout = min(timeout, self.debounce / 2)
+                if self.running:
+                    timeout = min(timeout, 0.1)
+                self.notice(watcher.wait(timeout))
+                changed = self.collectReady()
+                self.dispatch(executor)
+
+                for future in [future for future in self.running if future.done()]:
+                    self.finish(future)
+                    changed = True
+                    self.dispatch(executor)
+
+                if changed:
+                    self.saveState()
+                    self.exportMetrics(jsonFilename, prometheusFilename)
+                if stopWhenIdle and not self.pending and not self.lastChange:
+                    break
+        finally:
+            executor.shutdown(cancel_futures=True)
+            watcher.close()
+            self.saveState()
+            self.exportMetrics(jsonFilename, prometheusFilename)
+
+def stopOnSignal(signum, frame):
+    raise KeyboardInterrupt
+
+def main():
+    parser = argparse.ArgumentParser(description='Encrypt files dropped into a directory.')
+    parser.add_argument('input', help='directory to watch')
+    parser.add_argument('output', help='directory to write results to')
+    parser.add_argument('--key', type=int, required=True)
+    parser.add_argument('--mode', choices=['encrypt', 'decrypt'], default='encrypt')
+    parser.add_argument('--cipher', choices=['transposition', 'caesar'], default='transposition')
+    parser.add_argument('--state', default='watch.json', help='file that keeps the queue across restarts')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE, help='seconds a file must stay unchanged')
+    parser.add_argument('--metrics-json')
+    parser.add_argument('--metrics-prom')
+    parser.add_argument('--once', action='store_true', help='stop when the queue is empty')
+    options = parser.parse_args()
+
+    if os.path.abspath(options.input) == os.path.abspath(options.output):
+        print("The input and output directories must be different.")
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, stopOnSignal)
+    daemon = WatchDaemon(options.input, options.output, options.cipher, options.key, options.mode, options.state, options.workers, options.debounce)
+    try:
+        daemon.run(options.metrics_json, options.metrics_prom, stopWhenIdle=options.once)
+    except KeyboardInterrupt:
+        print("Stopped. %s files are still queued in %s." % (len(daemon.pending), options.state))
+
+if __name__ == '__main__':
+    main()
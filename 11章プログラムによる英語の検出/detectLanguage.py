@@ -0,0 +1,183 @@
+import re
+import cipherMetrics
+
+# 複数の言語をまとめて判定する. 言語ごとに「単語の一覧」と「使う文字の範囲（文字の種類）」を持たせる.
+# 単語の一覧は初めて使うときに読み込み、プロセスの中で使い回す.
+# 判定は1つの文を1回だけ走査する:
+#   単語 → 読み込んだ全言語の単語をまとめた表（wordMasks, 判定器どうしで共有）で、その単語を持つ言語のビットの集まりを1回で引く
+#   文字 → 全言語の文字の範囲をまとめた変換表で、1回の translate で文字の種類に置き換えて数える
+# なので言語を増やしても、1つの候補を判定する手間はほとんど増えない.
+# 日本語は単語を空白で区切らないので、単語や n-gram の模型は持たず、ひらがな・カタカナ・漢字の割合だけで判定する.
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+# 言語の名前 -> {'words': 単語のファイル名か None, 'scripts': 文字の範囲の名前の一覧, 'wordPercentage', 'scriptPercentage'}
+languages = {}
+# 文字の範囲の名前 -> [(最初の文字コード, 最後の文字コード), ...]
+scripts = {
+    'latin': [(0x41, 0x5A), (0x61, 0x7A), (0xC0, 0xD6), (0xD8, 0xF6), (0xF8, 0x24F)],
+    'hiragana': [(0x3040, 0x309F)],
+    'katakana': [(0x30A0, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F)],
+    'kanji': [(0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF)],
+    'hangul': [(0xAC00, 0xD7A3), (0x1100, 0x11FF), (0x3130, 0x318F)],
+    'cyrillic': [(0x400, 0x4FF)],
+}
+
+# 読み込んだ単語の一覧（ファイル名 -> set）と、組み合わせごとに作った判定器
+loadedWords = {}
+detectors = {}
+# 単語 -> その単語を持つ言語のビットの和と、言語の名前 -> そのビット. 言語を初めて判定に使うときに足す
+wordMasks = {}
+wordBits = {}
+# 文字の範囲の名前の組 -> 文字の種類の変換表. 漢字だけで数万文字あるので、同じ組の判定器で共有する
+scriptTables = {}
+
+def main():
+    detector = getDetector(['english', 'japanese'])
+    for message in ["This is a perfectly ordinary English sentence.",
+                    "これは日本語の文です。カタカナも少し入っています。",
+                    "Tsssa ih  ifletrrcyeel pn,gd ohe sw cn iEh tlsheh"]:
+        print('%-12s %s' % (detector.detect(message), detector.score(message)))
+
+def registerLanguage(name, words=None, scriptNames=(), wordPercentage=20, scriptPercentage=85):
+    # words は1行に1単語のファイル. 単語は大文字にしてから比べる
+    languages[name] = {'words': words, 'scripts': tuple(scriptNames), 'wordPercentage': wordPercentage, 'scriptPercentage': scriptPercentage}
+    if name in wordBits:
+        # 前の単語の一覧が wordMasks に入っているので、表を作り直す. 他の言語の判定器も表を共有しているので捨てる
+        wordMasks.clear()
+        wordBits.clear()
+        detectors.clear()
+    for key in list(detectors):
+        if name in key:
+            del detectors[key]
+
+def registerScript(name, ranges):
+    scripts[name] = list(ranges)
+    scriptTables.clear()
+    detectors.clear()
+
+def getWords(filename):
+    # 単語の一覧はその言語を初めて判定するときに読み込む
+    if filename not in loadedWords:
+        with cipherMetrics.stage('dictionary load') as record:
+            fileObj = open(filename, encoding='utf-8')
+            content = fileObj.read()
+            fileObj.close()
+            loadedWords[filename] = set(word.strip().upper() for word in content.split('\n') if word.strip())
+            record['chars'] = len(content)
+    return loadedWords[filename]
+
+def getWordBit(name):
+    # name の単語を wordMasks に足したうえで、その言語のビットを返す
+    if name not in wordBits:
+        bit = 1 << len(wordBits)
+        for word in getWords(languages[name]['words']):
+            wordMasks[word] = wordMasks.get(word, 0) | bit
+        wordBits[name] = bit
+    return wordBits[name]
+
+def getScriptTable(scriptNames):
+    # 文字の範囲ごとに1文字の記号を割り当てた変換表
+    if scriptNames not in scriptTables:
+        table = {}
+        for index, script in enumerate(scriptNames):
+            for first, last in scripts[script]:
+                for code in range(first, last + 1):
+                    table[code] = chr(0xE000 + index)
+        scriptTables[scriptNames] = table
+    return scriptTables[scriptNames]
+
+registerLanguage('english', words='dictionary.txt', scriptNames=['latin'])
+registerLanguage('japanese', scriptNames=['hiragana', 'katakana', 'kanji'], scriptPercentage=60)
+
+class Detector:
+    def __init__(self, names):
+        self.names = list(names)
+        for name in self.names:
+            if name not in languages:
+                raise ValueError('unknown language %r' % (name,))
+
+        # 言語ごとの wordMasks の中でのビット. 単語の一覧を持たない言語は 0
+        self.wordBits = []
+        for name in self.names:
+            if languages[name]['words']:
+                self.wordBits.append(getWordBit(name))
+            else:
+                self.wordBits.append(0)
+
+        # 文字の範囲ごとに1文字の記号を割り当て、どの範囲にも入らない文字は消す変換表
+        self.scriptNames = tuple(sorted(set(script for name in self.names for script in languages[name]['scripts'])))
+        self.scriptTable = getScriptTable(self.scriptNames)
+
+    def scan(self, message):
+        # 1回の走査で、言語ごとの辞書にある単語の数・単語の数・文字の範囲ごとの文字数を求める
+        tokens = WORD_PATTERN.findall(message.replace("'", ''))
+        words = ' '.join(tokens).upper().split(' ') if tokens else []
+        masks = wordMasks
+        maskCounts = {}
+        for word in words:
+            mask = masks.get(word, 0)
+            if mask:
+                maskCounts[mask] = maskCounts.get(mask, 0) + 1
+        wordMatches = [0] * len(self.names)
+        for mask, count in maskCounts.items():
+            for index, bit in enumerate(self.wordBits):
+                if mask & bit:
+                    wordMatches[index] += count
+
+        # 空白・数字・記号は文字の割合に数えない
+        letters = ''.join(tokens)
+        classified = letters.translate(self.scriptTable)
+        scriptCounts = {}
+        for index, script in enumerate(self.scriptNames):
+            scriptCounts[script] = classified.count(chr(0xE000 + index))
+        return len(words), wordMatches, len(letters), scriptCounts
+
+    def score(self, message):
+        # 言語ごとに {'words': 辞書にある単語の割合 か None, 'script': その言語の文字の割合}
+        # 候補ごとに呼ばれるので、記録する相手がいなければ時間を測らない
+        if cipherMetrics.hooks:
+            with cipherMetrics.stage('language score', chars=len(message)):
+                wordCount, wordMatches, letterCount, scriptCounts = self.scan(message)
+        else:
+            wordCount, wordMatches, letterCount, scriptCounts = self.scan(message)
+        scores = {}
+        for index, name in enumerate(self.names):
+            language = languages[name]
+            wordScore = None
+            if language['words']:
+                wordScore = wordMatches[index] / wordCount if wordCount else 0.0
+            inScript = sum(scriptCounts[script] for script in language['scripts'])
+            scores[name] = {'words': wordScore, 'script': inScript / letterCount if letterCount else 0.0}
+        return scores
+
+    def detect(self, message):
+        # 基準を満たす言語のうち、一番割合が高いものの名前. どれも満たさなければ None
+        best = None
+        bestScore = 0.0
+        for name, score in self.score(message).items():
+            language = languages[name]
+            if score['script'] * 100 < language['scriptPercentage']:
+                continue
+            if score['words'] is not None and score['words'] * 100 < language['wordPercentage']:
+                continue
+            combined = score['script'] if score['words'] is None else (score['words'] + score['script']) / 2
+            if best is None or combined > bestScore:
+                best = name
+                bestScore = combined
+        return best
+
+def getDetector(names=None):
+    # 同じ言語の組み合わせの判定器は使い回す
+    if names is None:
+        names = sorted(languages)
+    key = tuple(names)
+    if key not in detectors:
+        detectors[key] = Detector(key)
+    return detectors[key]
+
+def detectLanguage(message, names=None):
+    return getDetector(names).detect(message)
+
+if __name__ == '__main__':
+    main()
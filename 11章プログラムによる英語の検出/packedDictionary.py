@@ -0,0 +1,124 @@
+import array, mmap, os, sys
+import fileUtil
+
+# dictionary.txt の単語を辞書順に並べて1つのバイト列に詰め、各単語の始まりの位置を配列にしたもの.
+# ファイル dictionary.words に書いておき、mmap でそのまま開くので、
+# 何十ものプロセスで使ってもページキャッシュを共有するだけで、プロセスごとのメモリはほとんど増えない.
+# word in words は、頭の2バイトが同じ単語の範囲（開くときに作る小さな表）の中を二分探索して調べる.
+# 単語の一覧を回すこともできる.
+# ファイルの形: MAGIC, b'<単語数> <詰めた単語のバイト数>\n', 位置の配列（リトルエンディアンの 32 ビット, 単語数 + 1 個）, 詰めた単語.
+
+DICTIONARY_FILE = 'dictionary.txt'
+PACKED_FILE = 'dictionary.words'
+MAGIC = b'WORDS1\n'
+
+class PackedWords:
+    def __init__(self, data, offsets, base, count):
+        # data は mmap か bytes. 単語 i は data[base + offsets[i]:base + offsets[i + 1]]
+        self.data = data
+        self.offsets = offsets
+        self.base = base
+        self.count = count
+        self.ranges = self.getPrefixRanges()
+
+    def getPrefixRanges(self):
+        # 頭の2バイト -> その単語が並んでいる [low, high). 2バイトに満たない単語はその全体で引く
+        ranges = {}
+        for index in range(self.count):
+            prefix = self.data[self.base + self.offsets[index]:self.base + min(self.offsets[index] + 2, self.offsets[index + 1])]
+            if prefix in ranges:
+                ranges[prefix][1] = index + 1
+            else:
+                ranges[prefix] = [index, index + 1]
+        return dict((prefix, tuple(bounds)) for prefix, bounds in ranges.items())
+
+    def getWord(self, index):
+        return self.data[self.base + self.offsets[index]:self.base + self.offsets[index + 1]]
+
+    def __contains__(self, word):
+        if not isinstance(word, str):
+            return False
+        target = word.encode('utf-8', 'surrogatepass')
+        bounds = self.ranges.get(target[:2])
+        if bounds is None:
+            return False
+        low, high = bounds
+        data = self.data
+        offsets = self.offsets
+        base = self.base
+        while low < high:
+            middle = (low + high) // 2
+            candidate = data[base + offsets[middle]:base + offsets[middle + 1]]
+            if candidate < target:
+                low = middle + 1
+            elif candidate > target:
+                high = middle
+            else:
+                return True
+        return False
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self.getWord(index).decode('utf-8', 'surrogatepass')
+
+def packWords(words):
+    # 重なりを除いて UTF-8 のバイト列の順に並べる. 探索もバイト列で比べるので順番がそろう
+    encoded = sorted(set(word.encode('utf-8', 'surrogatepass') for word in words))
+    offsets = array.array('I', [0])
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    return offsets, b''.join(encoded)
+
+def savePackedWords(words, filename):
+    offsets, blob = packWords(words)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    with fileUtil.openAtomically(filename, 'wb') as fileObj:
+        fileObj.write(MAGIC + b'%d %d\n' % (len(offsets) - 1, len(blob)))
+        fileObj.write(offsets.tobytes())
+        fileObj.write(blob)
+
+def readPackedWords(filename):
+    fileObj = open(filename, 'rb')
+    try:
+        if fileObj.readline() != MAGIC:
+            raise ValueError('%s is not a packed word file' % (filename))
+        count, blobSize = [int(number) for number in fileObj.readline().split()]
+        offsetsStart = fileObj.tell()
+        data = mmap.mmap(fileObj.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        fileObj.close()
+
+    offsetsSize = (count + 1) * 4
+    base = offsetsStart + offsetsSize
+    if len(data) != base + blobSize:
+        data.close()
+        raise ValueError('%s is truncated' % (filename))
+
+    if sys.byteorder == 'little':
+        # 位置の配列もコピーせずに mmap の上で読む
+        offsets = memoryview(data)[offsetsStart:base].cast('I')
+    else:
+        offsets = array.array('I')
+        offsets.frombytes(data[offsetsStart:base])
+        offsets.byteswap()
+    return PackedWords(data, offsets, base, count)
+
+def loadPackedWords(dictionaryFilename=DICTIONARY_FILE, packedFilename=PACKED_FILE):
+    # 詰めたファイルが辞書より新しければそれを開き、そうでなければ作り直す
+    if os.path.exists(packedFilename) and os.path.getmtime(packedFilename) >= os.path.getmtime(dictionaryFilename):
+        try:
+            return readPackedWords(packedFilename)
+        except ValueError:
+            pass
+
+    dictionaryFile = open(dictionaryFilename)
+    words = dictionaryFile.read().split('\n')
+    dictionaryFile.close()
+
+    savePackedWords(words, packedFilename)
+    return readPackedWords(packedFilename)
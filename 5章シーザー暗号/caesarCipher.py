@@ -1,35 +1,65 @@
 # シーザー暗号
 import pyperclip
 
-# 暗号化・復号する文字列
-message = "drs3Gs3Gw9G3om2o4Gwo33kqoJ"
+SYMBOLS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz123456789 !?."
 
-key = int(input("鍵を入力してください"))
-# プログラムが暗号化するか複合化するか
-mode = input("encryptかdecryptかを選択してください")
+# (key, mode)ごとの変換表を保持する
+translationTables = {}
+byteTranslationTables = {}
 
-Symbols = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz123456789 !?."
+def main():
+    # 暗号化・復号する文字列
+    message = "drs3Gs3Gw9G3om2o4Gwo33kqoJ"
 
-translated = ""
+    key = int(input("鍵を入力してください"))
+    # プログラムが暗号化するか複合化するか
+    mode = input("encryptかdecryptかを選択してください")
 
-for symbol in message:
-    if symbol in Symbols:
-        symbol_index = Symbols.find(symbol)
+    translated = translateMessage(key, message, mode)
 
-        if mode == "encrypt":
-            translated_index = symbol_index + key
-        elif mode == "decrypt":
-            translated_index = symbol_index - key
-        
-        if translated_index > len(Symbols):
-            translated_index = translated_index - len(Symbols)
-        elif translated_index < 0:
-            translated_index = translated_index + len(Symbols)
-        
-        translated = translated + Symbols[translated_index]
+    print(translated)
+    pyperclip.copy(translated)
 
+def getTranslationTable(key, mode):
+    if (key, mode) in translationTables:
+        return translationTables[(key, mode)]
+
+    if mode == "encrypt":
+        shift = key
+    elif mode == "decrypt":
+        shift = -key
     else:
-        translated = translated + symbol
+        raise ValueError("mode must be 'encrypt' or 'decrypt', not %r" % (mode,))
+
+    # 記号の並びをずらしたものと対応させ、str.translateで一度に置き換える
+    shifted = [SYMBOLS[(index + shift) % len(SYMBOLS)] for index in range(len(SYMBOLS))]
+    table = str.maketrans(SYMBOLS, ''.join(shifted))
+
+    translationTables[(key, mode)] = table
+    return table
+
+def getByteTranslationTable(key, mode):
+    if (key, mode) in byteTranslationTables:
+        return byteTranslationTables[(key, mode)]
+
+    # 文字列用の変換表と同じ対応をバイト列用の256バイトの表にする
+    shifted = SYMBOLS.translate(getTranslationTable(key, mode))
+    table = bytes.maketrans(SYMBOLS.encode('ascii'), shifted.encode('ascii'))
+
+    byteTranslationTables[(key, mode)] = table
+    return table
+
+def translateMessage(key, message, mode):
+    if not isinstance(message, str):
+        return translateBytes(key, message, mode)
+    return message.translate(getTranslationTable(key, mode))
+
+def translateBytes(key, data, mode):
+    # bytes / bytearray はそのまま bytes.translate に渡し、memoryview などは bytes にしてから変換する
+    table = getByteTranslationTable(key, mode)
+    if isinstance(data, (bytes, bytearray)):
+        return data.translate(table)
+    return bytes(data).translate(table)
 
-print(translated)
-pyperclip.copy(translated)
+if __name__ == '__main__':
+    main()
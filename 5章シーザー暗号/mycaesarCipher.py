@@ -1,13 +1,11 @@
 #ASCIIコード48~122
+# 1文字ずつ再帰して文字列をつなぎ直すと長さの2乗の時間がかかり、再帰の上限で長さも限られるので、
+# cur_index から length までをまとめて変換し、最後に一度だけつなぐ
 def get_encrypt(target, key, cur_index, length, encrypted_target):
-    if length <= cur_index:
-        return encrypted_target
-    return get_encrypt(target, key, cur_index + 1, length, encrypted_target + chr(ord(target[cur_index]) + key))
+    return encrypted_target + ''.join([chr(ord(symbol) + key) for symbol in target[cur_index:length]])
 
 def get_decrypt(target, key, cur_index, length, decrypted_target):
-    if length <= cur_index:
-        return decrypted_target
-    return get_decrypt(target, key, cur_index + 1, length, decrypted_target + chr(ord(target[cur_index]) - key))
+    return decrypted_target + ''.join([chr(ord(symbol) - key) for symbol in target[cur_index:length]])
 
 if __name__ == '__main__':  
     target = input("暗号化もしくは復号化する対象を入力してください：　")
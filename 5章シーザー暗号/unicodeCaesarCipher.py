@@ -0,0 +1,88 @@
+# 文字コードの範囲で決めた文字の並び（アルファベット）の中でずらすシーザー暗号
+import functools
+import pyperclip
+
+# アルファベットの名前 -> 文字コードの範囲 (最初, 最後) の並び. 範囲をつないだ並びを1つの輪としてずらす
+ALPHABETS = {
+    'hiragana': [(0x3041, 0x3096)],
+    'katakana': [(0x30A1, 0x30FA)],
+    'fullwidth': [(0xFF01, 0xFF5E)],
+    'ascii': [(0x20, 0x7E)],
+    'latin': [(0x41, 0x5A), (0x61, 0x7A)],
+    # mycaesarCipher.py のコメントにある ASCII コード 48〜122
+    'mycaesar': [(48, 122)],
+}
+DEFAULT_ALPHABETS = ('hiragana', 'katakana', 'fullwidth')
+
+# 変換表は1つで数万要素になるので、最近使った TABLE_CACHE_SIZE 個だけ残す
+TABLE_CACHE_SIZE = 16
+# 変換表の元になる 0, 1, 2, ... のリスト. 表どうしで整数のオブジェクトを共有してメモリを節約する
+identity = []
+
+def main():
+    # 暗号化・復号する文字列
+    message = "これはテストです。ＡＢＣも入っています！"
+
+    key = int(input("鍵を入力してください"))
+    # プログラムが暗号化するか複合化するか
+    mode = input("encryptかdecryptかを選択してください")
+
+    translated = translateMessage(key, message, mode)
+
+    print(translated)
+    pyperclip.copy(translated)
+
+def getCodes(alphabet):
+    # アルファベットの名前・範囲の並び・文字列のどれでも受け取り、文字コードの並びにする
+    if isinstance(alphabet, str) and alphabet in ALPHABETS:
+        alphabet = ALPHABETS[alphabet]
+    if isinstance(alphabet, str):
+        return [ord(symbol) for symbol in alphabet]
+    codes = []
+    for first, last in alphabet:
+        codes.extend(range(first, last + 1))
+    return codes
+
+@functools.lru_cache(maxsize=TABLE_CACHE_SIZE)
+def getRings(alphabets):
+    # アルファベットごとの文字コードの並び. アルファベットどうしで文字が重なっていれば ValueError
+    rings = tuple(tuple(getCodes(alphabet)) for alphabet in alphabets)
+    seen = set()
+    for codes in rings:
+        if len(set(codes)) != len(codes) or seen.intersection(codes):
+            raise ValueError('alphabets must not share characters')
+        seen.update(codes)
+    return rings
+
+def getTranslationTable(key, mode, alphabets=DEFAULT_ALPHABETS):
+    # 文字コードを添字にしたリスト. str.translate はリストの外の文字をそのまま残すので、
+    # 表は一番大きな文字コードまでで済み、辞書を引くより速い
+    alphabets = tuple(alphabet if isinstance(alphabet, str) else tuple(alphabet) for alphabet in alphabets)
+    if mode == "encrypt":
+        shift = key
+    elif mode == "decrypt":
+        shift = -key
+    else:
+        raise ValueError("mode must be 'encrypt' or 'decrypt', not %r" % (mode,))
+
+    # アルファベットごとにその長さで割った余りにそろえ、同じずらし方になる鍵で表を使い回す
+    rings = getRings(alphabets)
+    return buildTable(tuple(shift % len(codes) if codes else 0 for codes in rings), alphabets)
+
+@functools.lru_cache(maxsize=TABLE_CACHE_SIZE)
+def buildTable(shifts, alphabets):
+    rings = getRings(alphabets)
+    size = max(max(codes) for codes in rings if codes) + 1 if any(rings) else 0
+    if len(identity) < size:
+        identity.extend(range(len(identity), size))
+    table = identity[:size]
+    for shift, codes in zip(shifts, rings):
+        for index, code in enumerate(codes):
+            table[code] = codes[(index + shift) % len(codes)]
+    return table
+
+def translateMessage(key, message, mode, alphabets=DEFAULT_ALPHABETS):
+    return message.translate(getTranslationTable(key, mode, alphabets))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# 各章の暗号と英語の検出の速さを測り、結果を JSON で保存する.
+# どこからでも実行できる（--output は実行した場所からの相対パス）: python benchmark.py --output bench.json
+import argparse, json, os, platform, sys, time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CHAPTER_DIRS = ['10章ファイルの暗号化と復号化', '11章プログラムによる英語の検出', '5章シーザー暗号']
+
+# 章のモジュールを読み込めるようにする
+for chapterDir in reversed(CHAPTER_DIRS):
+    sys.path.insert(0, os.path.join(ROOT, chapterDir))
+
+def inRoot(func, *args):
+    # detectEnglish は dictionary.txt を相対パスで開くので、その間だけ直下へ移る.
+    # 呼んだ側のカレントディレクトリは変えない（--output などの相対パスはそこから解決する）
+    previousDir = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        return func(*args)
+    finally:
+        os.chdir(previousDir)
+
+import caesarCipher, cipherPipeline, keywordTransposition, mycaesarCipher
+import transpositionEncrypt, transpositionDecrypt
+
+previousDir = os.getcwd()
+os.chdir(ROOT)
+try:
+    import detectEnglish
+finally:
+    os.chdir(previousDir)
+
+SYNTHETIC_SIZES = [10000, 100000, 1000000]
+MYCAESAR_SIZE = 500
+
+def readText(filename):
+    fileObj = open(os.path.join(ROOT, filename))
+    content = fileObj.read()
+    fileObj.close()
+    return content
+
+def makeSynthetic(text, size):
+    # 元の文章を繰り返して size 文字にする
+    return (text * (size // len(text) + 1))[:size]
+
+def percentile(sortedTimes, percent):
+    # 線形補間でのパーセンタイル
+    if len(sortedTimes) == 1:
+        return sortedTimes[0]
+    position = (len(sortedTimes) - 1) * percent / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sortedTimes) - 1)
+    return sortedTimes[lower] + (sortedTimes[upper] - sortedTimes[lower]) * (position - lower)
+
+def timeCall(func, args, warmup, repeat):
+    for i in range(warmup):
+        func(*args)
+
+    times = []
+    for i in range(repeat):
+        startTime = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - startTime)
+    return sorted(times)
+
+def summarize(name, corpus, size, times):
+    median = percentile(times, 50)
+    result = {
+        'name': name,
+        'corpus': corpus,
+        'size': size,
+        'runs': len(times),
+        'min': times[0],
+        'median': median,
+        'p90': percentile(times, 90),
+        'p99': percentile(times, 99),
+        'max': times[-1],
+    }
+    if size and median > 0:
+        result['charsPerSecond'] = size / median
+    return result
+
+def getCases():
+    # (名前, コーパス名, 文字数, 関数, 引数) の一覧
+    plaintext = readText('frankenstein.txt')
+    ciphertext = readText('frankenstein.encrypted.txt')
+
+    corpora = [('frankenstein.txt', plaintext, ciphertext)]
+    for size in SYNTHETIC_SIZES:
+        synthetic = makeSynthetic(plaintext, size)
+        corpora.append(('synthetic-%d' % size, synthetic, transpositionEncrypt.encryptMessage(10, synthetic)))
+
+    stages = [('caesar', 3, 'encrypt'), ('transposition', 8, 'encrypt'), ('transposition', 13, 'encrypt')]
+
+    cases = []
+    for corpus, text, encrypted in corpora:
+        size = len(text)
+        if corpus == 'frankenstein.txt':
+            encryptedCorpus = 'frankenstein.encrypted.txt'
+        else:
+            encryptedCorpus = corpus
+        textBytes = text.encode('utf-8')
+        cases += [
+            ('transpositionEncrypt.encryptMessage', corpus, size, transpositionEncrypt.encryptMessage, (10, text)),
+            ('transpositionDecrypt.decryptMessage', encryptedCorpus, len(encrypted), transpositionDecrypt.decryptMessage, (10, encrypted)),
+            ('transpositionEncrypt.encryptBytes', corpus, len(textBytes), transpositionEncrypt.encryptBytes, (10, textBytes)),
+            ('keywordTransposition.encryptMessage', corpus, size, keywordTransposition.encryptMessage, ('ZEBRAS', text)),
+            ('caesarCipher.translateMessage', corpus, size, caesarCipher.translateMessage, (13, text, 'encrypt')),
+            ('caesarCipher.translateBytes', corpus, len(textBytes), caesarCipher.translateBytes, (13, textBytes, 'encrypt')),
+            ('cipherPipeline.runPipeline', corpus, size, cipherPipeline.runPipeline, (stages, text)),
+            ('detectEnglish.getEnglishCount', corpus, size, detectEnglish.getEnglishCount, (text,)),
+            ('detectEnglish.isEnglish', corpus, size, detectEnglish.isEnglish, (text,)),
+        ]
+
+    # mycaesarCipher は1文字ごとに再帰するので、再帰の上限に収まる長さで測る
+    short = plaintext[:MYCAESAR_SIZE]
+    cases += [
+        ('mycaesarCipher.get_encrypt', 'frankenstein.txt[:%d]' % MYCAESAR_SIZE, len(short), mycaesarCipher.get_encrypt, (short, 3, 0, len(short), '')),
+        ('mycaesarCipher.get_decrypt', 'frankenstein.txt[:%d]' % MYCAESAR_SIZE, len(short), mycaesarCipher.get_decrypt, (short, 3, 0, len(short), '')),
+        ('detectEnglish.loadDictionary', 'dictionary.txt', os.path.getsize(os.path.join(ROOT, 'dictionary.txt')), inRoot, (detectEnglish.loadDictionary,)),
+    ]
+    return cases
+
+def runBenchmarks(warmup=2, repeat=10, pattern=''):
+    results = []
+    for name, corpus, size, func, args in getCases():
+        if pattern not in name:
+            continue
+        times = timeCall(func, args, warmup, repeat)
+        results.append(summarize(name, corpus, size, times))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ciphers and the English detector.')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    options = parser.parse_args()
+
+    results = runBenchmarks(options.warmup, max(options.repeat, 1), options.filter)
+    for result in results:
+        print('%-40s %-28s median %.6fs  p90 %.6fs  p99 %.6fs' % (result['name'], result['corpus'], result['median'], result['p90'], result['p99']))
+
+    if options.output:
+        report = {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'warmup': options.warmup,
+            'repeat': options.repeat,
+            'results': results,
+        }
+        outputFileObj = open(options.output, 'w')
+        json.dump(report, outputFileObj, indent=2)
+        outputFileObj.close()
+        print('Results written to %s.' % (options.output))
+
+if __name__ == '__main__':
+    main()
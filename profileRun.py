@@ -0,0 +1,118 @@
+# どのスクリプトでも書き換えずに cProfile と tracemalloc をかけて実行する.
+#   python profileRun.py [--output-dir DIR] [--top N] スクリプト.py [引数...]
+# 出力先は --output-dir か環境変数 CIPHER_PROFILE_DIR（無ければ profiles）で、次の3つを書く.
+#   <名前>.pstats     python -m pstats で読める cProfile の結果
+#   <名前>.collapsed  一定間隔でスタックを採ったもの. flamegraph.pl や speedscope にそのまま渡せる
+#   <名前>.memory.txt メモリ使用量が最大になったときの、行ごとの確保量の上位 N 件
+import argparse, cProfile, os, runpy, sys, threading, time, tracemalloc
+
+DEFAULT_DIR = 'profiles'
+SAMPLE_INTERVAL = 0.001
+THIS_FILE = os.path.abspath(__file__)
+
+class Sampler(threading.Thread):
+    # 対象のスレッドのスタックを定期的に採り、同じスタックの回数を数える.
+    # ついでに tracemalloc の使用量が前回より1割以上増えたらスナップショットを取り直し、最大時の内訳を残す
+    def __init__(self, threadId, interval):
+        threading.Thread.__init__(self, daemon=True)
+        self.threadId = threadId
+        self.interval = interval
+        self.stacks = {}
+        self.peakSnapshot = None
+        self.peakSize = 0
+        self.finished = threading.Event()
+
+    def run(self):
+        while not self.finished.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            if frame is not None:
+                self.recordStack(frame)
+            current, peak = tracemalloc.get_traced_memory()
+            if current > self.peakSize * 1.1:
+                self.peakSize = current
+                self.peakSnapshot = tracemalloc.take_snapshot()
+
+    def recordStack(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            if os.path.abspath(code.co_filename) == THIS_FILE:
+                break
+            names.append('%s (%s:%s)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+        stack = ';'.join(reversed(names))
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+def runScript(scriptPath, arguments, outputDir, top, interval):
+    scriptName = os.path.splitext(os.path.basename(scriptPath))[0]
+    prefix = os.path.join(outputDir, '%s-%s' % (scriptName, time.strftime('%Y%m%d-%H%M%S')))
+    os.makedirs(outputDir, exist_ok=True)
+
+    # python スクリプト.py と同じように、スクリプトのディレクトリを import の先頭にする
+    sys.argv = [scriptPath] + arguments
+    sys.path.insert(0, os.path.dirname(os.path.abspath(scriptPath)))
+
+    tracemalloc.start()
+    sampler = Sampler(threading.get_ident(), interval)
+    profiler = cProfile.Profile()
+    exitCode = 0
+
+    sampler.start()
+    profiler.enable()
+    try:
+        runpy.run_path(scriptPath, run_name='__main__')
+    except SystemExit as error:
+        if isinstance(error.code, int):
+            exitCode = error.code
+        elif error.code is not None:
+            exitCode = 1
+    finally:
+        profiler.disable()
+        sampler.stop()
+        current, peak = tracemalloc.get_traced_memory()
+        finalSnapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        profiler.dump_stats(prefix + '.pstats')
+        writeCollapsed(prefix + '.collapsed', sampler.stacks)
+        writeMemoryReport(prefix + '.memory.txt', sampler.peakSnapshot or finalSnapshot, peak, top)
+        print('Profile written to %s.{pstats,collapsed,memory.txt}' % (prefix), file=sys.stderr)
+
+    return exitCode
+
+def writeCollapsed(filename, stacks):
+    fileObj = open(filename, 'w')
+    for stack, count in sorted(stacks.items()):
+        fileObj.write('%s %s\n' % (stack, count))
+    fileObj.close()
+
+def writeMemoryReport(filename, snapshot, peak, top):
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    fileObj = open(filename, 'w')
+    fileObj.write('peak traced memory: %s bytes\n' % (peak))
+    fileObj.write('top %s lines by size at the largest snapshot:\n' % (top))
+    for statistic in snapshot.statistics('lineno')[:top]:
+        frame = statistic.traceback[0]
+        fileObj.write('%12s bytes %8s blocks  %s:%s\n' % (statistic.size, statistic.count, frame.filename, frame.lineno))
+    fileObj.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a script under cProfile and tracemalloc.')
+    parser.add_argument('--output-dir', default=os.environ.get('CIPHER_PROFILE_DIR', DEFAULT_DIR))
+    parser.add_argument('--top', type=int, default=20, help='number of lines in the memory report')
+    parser.add_argument('--interval', type=float, default=SAMPLE_INTERVAL, help='stack sampling interval in seconds')
+    parser.add_argument('script')
+    parser.add_argument('arguments', nargs=argparse.REMAINDER)
+    options = parser.parse_args()
+
+    sys.exit(runScript(options.script, options.arguments, options.output_dir, options.top, options.interval))
+
+if __name__ == '__main__':
+    main()
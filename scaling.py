@@ -0,0 +1,138 @@
+# 入力の長さを倍々に増やしながら各関数を測り、時間と長さの両対数の傾きから計算量を見積もる.
+# 宣言した計算量より傾きが大きい関数があれば終了コード 1 で終わる.
+# どこからでも実行できる（出力先は実行した場所からの相対パス）: python scaling.py
+import argparse, json, math, sys, time
+
+# 章のモジュールへのパスの設定は benchmark と同じものを使う
+import benchmark
+import caesarCipher, cipherPipeline, keywordTransposition, mycaesarCipher
+import transpositionEncrypt, transpositionDecrypt, detectEnglish
+
+# 計算量ごとの傾きの目安
+EXPONENTS = {'linear': 1.0, 'nlogn': 1.1, 'quadratic': 2.0}
+TOLERANCE = 0.3
+MIN_TIME = 0.005
+
+STAGES = [('caesar', 3, 'encrypt'), ('transposition', 8, 'encrypt'), ('transposition', 13, 'encrypt')]
+
+def getCases():
+    # (名前, 宣言した計算量, 長さ n の入力から引数を作る関数, 関数, 最大の長さ)
+    text = benchmark.readText('frankenstein.txt')
+
+    def makeText(size):
+        return (benchmark.makeSynthetic(text, size),)
+
+    return [
+        ('transpositionEncrypt.encryptMessage', 'linear', lambda n: (10,) + makeText(n), transpositionEncrypt.encryptMessage, None),
+        ('transpositionDecrypt.decryptMessage', 'linear', lambda n: (10,) + makeText(n), transpositionDecrypt.decryptMessage, None),
+        ('transpositionEncrypt.encryptBytes', 'linear', lambda n: (10, makeText(n)[0].encode('ascii')), transpositionEncrypt.encryptBytes, None),
+        ('transpositionDecrypt.decryptBytes', 'linear', lambda n: (10, makeText(n)[0].encode('ascii')), transpositionDecrypt.decryptBytes, None),
+        ('keywordTransposition.encryptMessage', 'linear', lambda n: ('ZEBRAS',) + makeText(n), keywordTransposition.encryptMessage, None),
+        ('keywordTransposition.decryptMessage', 'linear', lambda n: ('ZEBRAS',) + makeText(n), keywordTransposition.decryptMessage, None),
+        ('caesarCipher.translateMessage', 'linear', lambda n: (13,) + makeText(n) + ('encrypt',), caesarCipher.translateMessage, None),
+        ('caesarCipher.translateBytes', 'linear', lambda n: (13, makeText(n)[0].encode('ascii'), 'encrypt'), caesarCipher.translateBytes, None),
+        ('cipherPipeline.runPipeline', 'linear', lambda n: (STAGES,) + makeText(n), cipherPipeline.runPipeline, None),
+        ('detectEnglish.removeNonLetters', 'linear', makeText, detectEnglish.removeNonLetters, None),
+        ('detectEnglish.getEnglishCount', 'linear', makeText, detectEnglish.getEnglishCount, None),
+        ('detectEnglish.isEnglish', 'linear', makeText, detectEnglish.isEnglish, None),
+        # 以前は1文字ごとに再帰して文字列をつなぎ直していたので、長さの2乗で遅くなっていた
+        ('mycaesarCipher.get_encrypt', 'linear', lambda n: makeText(n) + (3, 0, n, ''), mycaesarCipher.get_encrypt, None),
+        ('mycaesarCipher.get_decrypt', 'linear', lambda n: makeText(n) + (3, 0, n, ''), mycaesarCipher.get_decrypt, None),
+    ]
+
+def getSizes(smallest, largest, factor):
+    sizes = []
+    size = smallest
+    while size <= largest:
+        sizes.append(size)
+        size *= factor
+    return sizes
+
+def measure(func, args, repeat):
+    # 短すぎる呼び出しは MIN_TIME を超えるまで繰り返して1回あたりの時間を出し、repeat 回のうち最小を取る
+    loops = 1
+    while True:
+        startTime = time.perf_counter()
+        for i in range(loops):
+            func(*args)
+        elapsed = time.perf_counter() - startTime
+        if elapsed >= MIN_TIME:
+            break
+        loops *= 2
+
+    best = elapsed / loops
+    for i in range(repeat - 1):
+        startTime = time.perf_counter()
+        for j in range(loops):
+            func(*args)
+        best = min(best, (time.perf_counter() - startTime) / loops)
+    return best
+
+def fitExponent(sizes, times):
+    # log(time) = exponent * log(size) + c の最小二乗
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(seconds, 1e-12)) for seconds in times]
+    meanX = sum(xs) / len(xs)
+    meanY = sum(ys) / len(ys)
+    numerator = sum((x - meanX) * (y - meanY) for x, y in zip(xs, ys))
+    denominator = sum((x - meanX) ** 2 for x in xs)
+    return numerator / denominator
+
+def checkScaling(smallest=16000, largest=1024000, factor=2, repeat=3, pattern='', tolerance=TOLERANCE):
+    results = []
+    for name, complexity, makeArgs, func, maxSize in getCases():
+        if pattern not in name:
+            continue
+
+        if maxSize is None:
+            sizes = getSizes(smallest, largest, factor)
+        else:
+            sizes = getSizes(max(maxSize // 2 ** 5, 1), maxSize, factor)
+        times = [measure(func, makeArgs(size), repeat) for size in sizes]
+
+        exponent = fitExponent(sizes, times)
+        limit = EXPONENTS[complexity] + tolerance
+        results.append({
+            'name': name,
+            'complexity': complexity,
+            'exponent': exponent,
+            'limit': limit,
+            'passed': exponent <= limit,
+            'sizes': sizes,
+            'times': times,
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit time/size exponents and flag superlinear regressions.')
+    parser.add_argument('--smallest', type=int, default=16000)
+    parser.add_argument('--largest', type=int, default=1024000)
+    parser.add_argument('--factor', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--filter', default='', help='only check functions whose name contains this')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    options = parser.parse_args()
+
+    results = checkScaling(options.smallest, options.largest, options.factor, max(options.repeat, 1), options.filter, options.tolerance)
+
+    failed = 0
+    for result in results:
+        if result['passed']:
+            status = 'ok'
+        else:
+            status = 'FAIL'
+            failed += 1
+        print('%-40s %-10s exponent %.2f (limit %.2f) %s' % (result['name'], result['complexity'], result['exponent'], result['limit'], status))
+
+    if options.output:
+        outputFileObj = open(options.output, 'w')
+        json.dump(results, outputFileObj, indent=2)
+        outputFileObj.close()
+
+    if failed:
+        print('%s function(s) grew faster than their declared complexity.' % (failed))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
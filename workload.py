@@ -0,0 +1,153 @@
+# 大きな入力で試すための、再現できる合成コーパスを作る.
+# frankenstein.txt の単語の並び（n-gram）を乱数で継ぎ合わせて英語らしい文章を作り、
+# 転置式暗号とシーザー暗号で暗号化したものも一緒に書き出す. 同じ seed なら同じファイルになる.
+# どこからでも実行できる（出力先は実行した場所からの相対パス）: python workload.py --size 100M --seed 1 --output-dir corpus
+import argparse, json, os, random
+
+# 章のモジュールへのパスの設定は benchmark と同じものを使う
+import benchmark
+import caesarCipher, transpositionEncrypt
+
+CHUNK_SIZE = 1024 * 1024
+LINE_WIDTH = 70
+MIN_RUN = 3
+MAX_RUN = 12
+
+sourceWords = None
+
+def getSourceWords():
+    global sourceWords
+    if sourceWords is None:
+        sourceWords = benchmark.readText('frankenstein.txt').split()
+    return sourceWords
+
+def parseSize(text):
+    # 10M や 2G のような書き方も受け付ける
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def generateText(seed, size, chunkSize=CHUNK_SIZE):
+    # ちょうど size 文字になるまで、chunkSize 文字ほどの文字列を順に返す
+    rng = random.Random(seed)
+    words = getSourceWords()
+    remaining = size
+    line = ''
+    pieces = []
+    piecesLength = 0
+
+    while remaining > 0:
+        start = rng.randrange(len(words))
+        run = ' '.join(words[start:start + rng.randint(MIN_RUN, MAX_RUN)])
+        if line:
+            line += ' ' + run
+        else:
+            line = run
+        if len(line) < LINE_WIDTH:
+            continue
+
+        line += '\n'
+        pieces.append(line)
+        piecesLength += len(line)
+        line = ''
+
+        if piecesLength >= chunkSize or piecesLength >= remaining:
+            chunk = ''.join(pieces)[:remaining]
+            remaining -= len(chunk)
+            pieces = []
+            piecesLength = 0
+            yield chunk
+
+def generateKeys(seed, count, maxKey):
+    rng = random.Random(seed)
+    return [rng.randint(2, maxKey) for i in range(count)]
+
+def writeText(filename, seed, size):
+    outputFileObj = open(filename, 'w', newline='\n')
+    for chunk in generateText(seed, size):
+        outputFileObj.write(chunk)
+    outputFileObj.close()
+
+def writeAt(fileObj, data, position):
+    # os.pwrite は Unix にしか無いので、無ければ seek してから書く
+    if not hasattr(os, 'pwrite'):
+        fileObj.seek(position)
+        fileObj.write(data)
+        return
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fileObj.fileno(), view, position)
+        view = view[written:]
+        position += written
+
+def writeTranspositionFile(inputFilename, outputFilename, key):
+    # 入力を頭から一度だけ読む. 読み込む単位を key の倍数にしておくと、どの塊でも列の位置が同じになり、
+    # 塊の列 column は暗号文の列 column の中で offset // key 番目からの続きになる.
+    # それぞれを getEncryptPlan の列の始まりから数えた位置へ writeAt で書くので、メモリに載るのは塊一つ分だけ.
+    # key が CHUNK_SIZE より大きければ、key 文字（1行）ずつ読む
+    chunkSize = max(key, CHUNK_SIZE - CHUNK_SIZE % key)
+    size = os.path.getsize(inputFilename)
+    columnStarts = transpositionEncrypt.getColumnStarts(key, size)
+
+    inputFileObj = open(inputFilename, 'rb')
+    outputFileObj = open(outputFilename, 'wb')
+    outputFileObj.truncate(size)
+    offset = 0
+    while True:
+        chunk = inputFileObj.read(chunkSize)
+        if not chunk:
+            break
+        for column in range(min(key, len(chunk))):
+            writeAt(outputFileObj, chunk[column::key], columnStarts[column] + offset // key)
+        offset += len(chunk)
+    inputFileObj.close()
+    outputFileObj.close()
+
+def writeCaesarFile(inputFilename, outputFilename, key):
+    inputFileObj = open(inputFilename, 'rb')
+    outputFileObj = open(outputFilename, 'wb')
+    while True:
+        chunk = inputFileObj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        outputFileObj.write(caesarCipher.translateBytes(key, chunk, 'encrypt'))
+    inputFileObj.close()
+    outputFileObj.close()
+
+def generateCorpus(outputDir, seed, size):
+    # 平文・暗号文と、使った鍵を書いた manifest.json を outputDir に作る
+    os.makedirs(outputDir, exist_ok=True)
+    transpositionKey, caesarKey = generateKeys(seed, 2, 60)
+
+    manifest = {
+        'seed': seed,
+        'size': size,
+        'plaintext': 'plaintext.txt',
+        'transposition': {'key': transpositionKey, 'file': 'transposition.encrypted.txt'},
+        'caesar': {'key': caesarKey % len(caesarCipher.SYMBOLS), 'file': 'caesar.encrypted.txt'},
+    }
+
+    plaintextFilename = os.path.join(outputDir, manifest['plaintext'])
+    writeText(plaintextFilename, seed, size)
+    writeTranspositionFile(plaintextFilename, os.path.join(outputDir, manifest['transposition']['file']), transpositionKey)
+    writeCaesarFile(plaintextFilename, os.path.join(outputDir, manifest['caesar']['file']), manifest['caesar']['key'])
+
+    manifestFileObj = open(os.path.join(outputDir, 'manifest.json'), 'w')
+    json.dump(manifest, manifestFileObj, indent=2)
+    manifestFileObj.close()
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a reproducible English-like corpus and its ciphertexts.')
+    parser.add_argument('--size', default='10M', help='number of characters, e.g. 500K, 10M, 2G')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default='corpus')
+    options = parser.parse_args()
+
+    manifest = generateCorpus(options.output_dir, options.seed, parseSize(options.size))
+    print('Wrote %s characters to %s (transposition key %s, Caesar key %s).' % (manifest['size'], options.output_dir, manifest['transposition']['key'], manifest['caesar']['key']))
+
+if __name__ == '__main__':
+    main()